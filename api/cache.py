@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from channels.models import TreeVersion
+
+
+class TreeVersions(object):
+    """
+    Versions of the trees, stored in the database by the writes that
+    change them, so every process sees the changes made by the others,
+    imports and commands included. They are read from the database
+    the request reads from, a replica replicates them with the rows,
+    so the versions match the rows the response is read from.
+    """
+    GLOBAL = TreeVersion.GLOBAL
+
+    def get_many(self, tree_ids=None):
+        """
+        Get the versions of some trees, with the global one
+        tree_ids: tree ids, all the versions stored if None
+        returns: dict of (version, time it changed) by key
+        """
+        return TreeVersion.objects.get_many(tree_ids)
+
+    def get(self, tree_id, versions=None):
+        """
+        Get the global and tree versions
+        versions: versions read by get_many, read now if None
+        """
+        if versions is None:
+            versions = self.get_many([tree_id])
+        return [versions[self.GLOBAL][0], versions[TreeVersion.key_for(tree_id)][0]]
+
+
+tree_versions = TreeVersions()
+
+
+class ResponseCache(object):
+    """
+    Cache of serialized responses, keyed by the tree id of the channel
+    they belong to and the versions of the tree, so the responses cached
+    before the tree changed are not used anymore, in every process.
+
+    The backend is the cache alias in settings.API_CACHE_ALIAS,
+    the cache is disabled if it is None. A per process backend, like
+    the local memory cache, is not shared but it is never stale.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'API_CACHE_ALIAS', None) is not None
+
+    @property
+    def cache(self):
+        return caches[settings.API_CACHE_ALIAS]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'API_CACHE_TIMEOUT', None)
+
+    def key(self, request, tree_id, versions=None):
+        """
+        Cache key for the response to a request
+        versions: versions of the tree read by the caller, if any
+        """
+        url = request.build_absolute_uri()
+        versions = tree_versions.get(tree_id, versions)
+        raw = '{}:{}:{}:{}'.format(tree_id, versions[0], versions[1], url)
+        return 'api:response:{}'.format(hashlib.md5(raw.encode()).hexdigest())
+
+    def get_or_set(self, request, tree_id, serialize, versions=None):
+        """
+        Get the cached response data for a request,
+        if it is not cached call serialize and cache its result.
+        versions: versions of the tree read by the caller, if any
+        """
+        if not self.enabled:
+            return serialize()
+        key = self.key(request, tree_id, versions)
+        data = self.cache.get(key)
+        if data is not None:
+            self.count(hit=True)
+            return data
+        self.count(hit=False)
+        data = serialize()
+        # serializer data keeps a reference to its serializer, cache plain data
+        data = OrderedDict(data) if isinstance(data, dict) else list(data)
+        self.cache.set(key, data, self.timeout)
+        return data
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """Hits and misses counted by this process"""
+        with self._lock:
+            return OrderedDict([('hits', self.hits), ('misses', self.misses)])
+
+
+response_cache = ResponseCache()
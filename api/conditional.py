@@ -0,0 +1,66 @@
+import hashlib
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from api.cache import tree_versions
+
+
+class ConditionalRequests(object):
+    """
+    ETag and Last-Modified validators of the responses, derived from
+    the versions of the trees stored in the database, so every process
+    sends the same validators and sees the changes made by the others.
+    Requests whose validators match are answered with 304 Not Modified
+    before the response is serialized.
+
+    Disabled if settings.API_CONDITIONAL_REQUESTS is false.
+    """
+    @property
+    def enabled(self):
+        return getattr(settings, 'API_CONDITIONAL_REQUESTS', False)
+
+    def validators(self, request, tree_id=None, versions=None):
+        """
+        Get the validators of the response to a request
+        tree_id: tree the response is read from, None if it is read from all
+        versions: versions of the tree read by the caller, if any
+        returns: the quoted etag and the last modified timestamp,
+        None if no tree changed yet
+        """
+        if versions is None:
+            versions = tree_versions.get_many(None if tree_id is None else [tree_id])
+        versions = sorted(versions.items())
+        raw = '{}:{}:{}'.format(
+            ':'.join('{}={}'.format(key, version) for key, (version, _) in versions),
+            request.build_absolute_uri(),
+            request.META.get('HTTP_ACCEPT', '')
+        )
+        etag = hashlib.md5(raw.encode()).hexdigest()
+        changes = [changed_at for _, (_, changed_at) in versions if changed_at is not None]
+        last_modified = int(max(changes).timestamp()) if changes else None
+        return quote_etag(etag), last_modified
+
+    def respond(self, request, tree_id, view, versions=None):
+        """
+        Answer with 304 Not Modified if the validators sent match,
+        otherwise call view and add the validators to its response
+        tree_id: tree the response is read from, None if it is read from all
+        view: function returning the response
+        versions: versions of the tree read by the caller, if any
+        """
+        if not self.enabled:
+            return view()
+        etag, last_modified = self.validators(request, tree_id, versions)
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=last_modified)
+        if response is not None:
+            return response
+        response = view()
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+conditional_requests = ConditionalRequests()
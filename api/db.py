@@ -0,0 +1,119 @@
+import random
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+
+# whether the reads of the current thread may go to a replica, the
+# replica they go to, whether the current request wrote to the primary
+# and the connections the request checked
+_state = threading.local()
+
+
+def replicas():
+    """Aliases of the read replicas of the primary database"""
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Send the reads of this thread to the replicas, or to the primary if not enabled"""
+    previous = getattr(_state, 'replicas', False)
+    _state.replicas = enabled
+    try:
+        yield
+    finally:
+        _state.replicas = previous
+
+
+class ReplicaRouter(object):
+    """
+    Send the reads made inside use_replicas to a replica of
+    settings.DATABASE_REPLICAS, chosen at random once per request so
+    a response is not read from replicas lagging by different amounts.
+    Everything else goes to the primary: writes, imports, commands,
+    and the reads after a write in the same request, so a request
+    reads its own writes.
+    """
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if aliases and getattr(_state, 'replicas', False) and not getattr(_state, 'wrote', False):
+            if getattr(_state, 'replica', None) not in aliases:
+                _state.replica = random.choice(aliases)
+            alias = _state.replica
+        else:
+            alias = DEFAULT_DB_ALIAS
+        check_connection(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        check_connection(DEFAULT_DB_ALIAS)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """The replicas have the same data as the primary"""
+        return True
+
+
+class ReplicaPinningMiddleware(object):
+    """
+    Read your writes across requests: the response to a request that
+    wrote to the primary sets a cookie pinning the reads of the client
+    to the primary for settings.DATABASE_REPLICA_PIN_SECONDS, which
+    should be longer than the replication lag. Only used with replicas.
+    """
+    cookie_name = 'pin_primary'
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.wrote = False
+        request.pin_primary = self.cookie_name in request.COOKIES
+        response = self.get_response(request)
+        if _state.wrote:
+            response.set_cookie(self.cookie_name, '1', httponly=True,
+                                max_age=settings.DATABASE_REPLICA_PIN_SECONDS)
+        return response
+
+
+class ReplicaViewMixin(object):
+    """Read from the replicas, unless the client is pinned to the primary"""
+    def dispatch(self, request, *args, **kwargs):
+        with use_replicas(not getattr(request, 'pin_primary', False)):
+            return super(ReplicaViewMixin, self).dispatch(request, *args, **kwargs)
+
+
+@receiver(request_started)
+def start_request(**kwargs):
+    """Forget the replica, the writes and the connections of the previous request of the thread"""
+    _state.replica = None
+    _state.wrote = False
+    _state.checked = set()
+
+
+def check_connection(alias):
+    """
+    Close the persistent connection (CONN_MAX_AGE) of a database that
+    stopped working, e.g. after a restart or failover, so the request
+    opens a new one instead of failing with the broken one. Only the
+    databases a request uses are checked, once, outside of requests
+    the connections are not checked.
+    """
+    checked = getattr(_state, 'checked', None)
+    if checked is None or alias in checked:
+        return
+    checked.add(alias)
+    connection = connections[alias]
+    if (connection.connection is not None and
+            connection.settings_dict['CONN_MAX_AGE'] and
+            not connection.in_atomic_block and
+            not connection.is_usable()):
+        connection.close()
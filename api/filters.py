@@ -0,0 +1,87 @@
+from django.db.models import Q
+from django.db.models.functions import Substr
+from rest_framework import filters
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from channels.models import Channel
+from channels.search import search_categories
+from channels.utils import normalize_path
+
+
+def query_field(name, title, description):
+    """Describe a query parameter for the API docs"""
+    return coreapi.Field(
+        name=name,
+        required=False,
+        location='query',
+        schema=coreschema.String(title=title, description=description)
+    )
+
+
+class CategorySearchFilter(filters.BaseFilterBackend):
+    """
+    Search categories by name, best matches first, e.g. ?search=laundry
+    optionally in a single channel, e.g. ?search=laundry&channel=foo
+    Keyset pages are in tree order, not best matches first, so the
+    search cannot be paginated with a cursor, use limit and offset.
+    """
+    search_param = api_settings.SEARCH_PARAM
+    channel_param = 'channel'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        channel_name = request.query_params.get(self.channel_param)
+        channel = None
+        if channel_name:
+            channel = Channel.objects.filter(name__iexact=channel_name).first()
+            if channel is None:
+                return queryset.none()
+        if not term:
+            if channel is not None:
+                return queryset.filter(tree_id=channel.tree_id)
+            return queryset
+        cursor_param = getattr(view.paginator, 'cursor_query_param', None)
+        if cursor_param is not None and cursor_param in request.query_params:
+            raise ValidationError({
+                cursor_param: 'Search results are paginated with limit and offset.'
+            })
+        offset, limit = 0, None
+        if view.paginator is not None:
+            offset = view.paginator.get_offset(request)
+            limit = view.paginator.get_limit(request)
+        return search_categories(queryset, term, channel, offset, limit)
+
+    def get_schema_fields(self, view):
+        return [
+            query_field(self.search_param, 'Search',
+                        'Text contained in the category name.'),
+            query_field(self.channel_param, 'Channel',
+                        'Name of the channel of the categories.'),
+        ]
+
+
+class PathPrefixFilter(filters.BaseFilterBackend):
+    """
+    Filter the categories in the subtree of a path, e.g. ?prefix=/Books
+    uses the path index instead of the MPTT fields.
+    """
+    prefix_param = 'prefix'
+
+    def filter_queryset(self, request, queryset, view):
+        prefix = request.query_params.get(self.prefix_param)
+        if not prefix:
+            return queryset
+        prefix = normalize_path(prefix)
+        # LIKE ignores the case on SQLite, comparing the start of
+        # the path keeps the filter case sensitive on every database
+        return (queryset
+                .filter(Q(path=prefix) | Q(path__startswith=prefix + '/'))
+                .annotate(path_start=Substr('path', 1, len(prefix)))
+                .filter(path_start=prefix))
+
+    def get_schema_fields(self, view):
+        return [
+            query_field(self.prefix_param, 'Prefix',
+                        'Path of the subtree of the categories, e.g. /Books.'),
+        ]
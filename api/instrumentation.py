@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from channels.utils import QueryCounter, Timer
+
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, percent):
+    """Nearest rank percentile of a sorted list"""
+    if not values:
+        return None
+    rank = max(int(round(percent / 100.0 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class RequestStats(object):
+    """
+    Recent measures of the requests, per view and action.
+    Only the last max_samples measures of each view are kept.
+    """
+    fields = ('total', 'db', 'queries', 'app', 'size')
+    percentiles = (50, 95, 99)
+
+    def __init__(self, max_samples=1000):
+        self._lock = threading.Lock()
+        self.max_samples = max_samples
+        self.samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self.counts = defaultdict(int)
+
+    def add(self, view, measures):
+        with self._lock:
+            self.samples[view].append(measures)
+            self.counts[view] += 1
+
+    def clear(self):
+        with self._lock:
+            self.samples.clear()
+            self.counts.clear()
+
+    def summary(self):
+        """Percentiles of each measure of each view"""
+        with self._lock:
+            samples = {view: list(values) for view, values in self.samples.items()}
+            counts = dict(self.counts)
+        summary = OrderedDict()
+        for view in sorted(samples):
+            stats = OrderedDict([('requests', counts[view])])
+            for field in self.fields:
+                values = sorted(sample[field] for sample in samples[view])
+                stats[field] = OrderedDict(
+                    ('p{}'.format(p), percentile(values, p)) for p in self.percentiles
+                )
+            summary[view] = stats
+        return summary
+
+
+request_stats = RequestStats()
+
+
+class RequestMetrics(object):
+    """Measures of a single request, attached to it by the middleware"""
+    def __init__(self, queries):
+        self.queries = queries
+        self.view = None
+        self.app = 0.0
+        self._view_start = None
+
+    def start_view(self):
+        """The view handler starts, after authentication and checks"""
+        self._view_start = (time.perf_counter(), self.queries.time)
+
+    def end_view(self):
+        """
+        The response is rendered, the time spent since the view started
+        outside of the database is the view, serialization and rendering
+        """
+        if self._view_start is None:
+            return
+        start, db_time = self._view_start
+        elapsed = time.perf_counter() - start
+        self.app = max(elapsed - (self.queries.time - db_time), 0.0)
+        self._view_start = None
+
+
+def view_name(view_func, method):
+    """Name of a view and action, e.g. ChannelViewSet.retrieve"""
+    cls = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None)
+    if cls is not None and actions:
+        return '{}.{}'.format(cls.__name__, actions.get(method.lower(), method.lower()))
+    return getattr(view_func, '__name__', view_func.__class__.__name__)
+
+
+class InstrumentationMiddleware(object):
+    """
+    Measure the wall time, number of queries, database time,
+    application time and response size of every request.
+    The measures are sent in the Server-Timing header, logged, and
+    aggregated per view in request_stats, served by the stats endpoint.
+    Enabled with settings.API_INSTRUMENTATION.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with Timer() as timer, QueryCounter() as queries:
+            request.metrics = RequestMetrics(queries)
+            response = self.get_response(request)
+            request.metrics.end_view()
+
+        metrics = request.metrics
+        if response.streaming:
+            size = 0
+        else:
+            size = len(response.content)
+        measures = {
+            'total': round(timer.elapsed * 1000, 3),
+            'db': round(queries.time * 1000, 3),
+            'queries': queries.count,
+            'app': round(metrics.app * 1000, 3),
+            'size': size,
+        }
+        response['Server-Timing'] = ', '.join([
+            'total;dur={}'.format(measures['total']),
+            'db;dur={};desc="{} queries"'.format(measures['db'], queries.count),
+            'app;dur={};desc="view, serialization and rendering"'.format(measures['app']),
+        ])
+        if metrics.view is not None:
+            request_stats.add(metrics.view, measures)
+            logger.info('%s %s %s total=%sms db=%sms queries=%s app=%sms size=%s',
+                        request.method, request.path, metrics.view,
+                        measures['total'], measures['db'], measures['queries'],
+                        measures['app'], measures['size'])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics.view = view_name(view_func, request.method)
+
+
+class InstrumentedViewMixin(object):
+    """Mark the start of the view handler for the middleware, which ends it once rendered"""
+    def initial(self, request, *args, **kwargs):
+        super(InstrumentedViewMixin, self).initial(request, *args, **kwargs)
+        metrics = getattr(request._request, 'metrics', None)
+        if metrics is not None:
+            metrics.start_view()
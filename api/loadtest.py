@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from itertools import count
+from urllib.parse import urlsplit
+from api.instrumentation import percentile
+
+
+class LoadTest(object):
+    """
+    Send GET requests to a running server from concurrency threads,
+    each with its own keep alive connection, and measure the requests
+    per second and the latency percentiles. Running it against the
+    WSGI and the ASGI deployments compares them under the same load.
+    """
+    percentiles = (50, 95, 99)
+
+    def __init__(self, paths, requests=1000, concurrency=16, timeout=30):
+        """paths: paths requested in turn, relative to the server url"""
+        self.paths = paths
+        self.requests = requests
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def run(self, url):
+        """Load a server, returns the results"""
+        server = urlsplit(url)
+        connection_class = HTTPSConnection if server.scheme == 'https' else HTTPConnection
+        prefix = server.path.rstrip('/')
+        sent = count()
+        lock = threading.Lock()
+        latencies = []
+        errors = []
+
+        def client():
+            connection = connection_class(server.netloc, timeout=self.timeout)
+            try:
+                while True:
+                    n = next(sent)
+                    if n >= self.requests:
+                        return
+                    path = prefix + self.paths[n % len(self.paths)]
+                    start = time.perf_counter()
+                    try:
+                        connection.request('GET', path)
+                        response = connection.getresponse()
+                        response.read()
+                        status = response.status
+                    except (OSError, HTTPException) as e:
+                        connection.close()
+                        status = e.__class__.__name__
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed * 1000)
+                        if status != 200:
+                            errors.append(status)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=client) for _ in range(self.concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        results = OrderedDict([
+            ('url', url),
+            ('requests', len(latencies)),
+            ('errors', len(errors)),
+            ('seconds', round(elapsed, 3)),
+            ('requests_per_second', round(len(latencies) / elapsed, 1)),
+        ])
+        for p in self.percentiles:
+            value = percentile(latencies, p)
+            results['p{}'.format(p)] = None if value is None else round(value, 3)
+        return results
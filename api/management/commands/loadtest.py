@@ -0,0 +1,72 @@
+import json
+from collections import OrderedDict
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.loadtest import LoadTest
+
+
+class Command(BaseCommand):
+    help = ('Load running servers with concurrent requests and compare their '
+            'requests per second and latency percentiles, e.g. the WSGI and '
+            'ASGI deployments, and write the results as JSON.')
+
+    def add_arguments(self, parser):
+        """Add the arguments this command accepts"""
+        parser.add_argument('urls',
+                            nargs='+',
+                            help='Base urls of the servers, e.g. http://127.0.0.1:8000.',
+                            type=str)
+
+        parser.add_argument('--path',
+                            dest='paths',
+                            action='append',
+                            help='Path requested, can be given many times to request '
+                                 'them in turn, default is /api/v1/channels/.',
+                            type=str)
+
+        parser.add_argument('--requests',
+                            dest='requests',
+                            default=1000,
+                            help='Number of requests sent to each server, default is 1000.',
+                            type=int)
+
+        parser.add_argument('--concurrency',
+                            dest='concurrency',
+                            default=16,
+                            help='Number of concurrent clients, default is 16.',
+                            type=int)
+
+        parser.add_argument('--output',
+                            dest='output',
+                            default=None,
+                            help='JSON results file, standard output if not given.',
+                            type=str)
+
+    def handle(self, *args, **options):
+        """Do the commands work"""
+        load_test = LoadTest(options['paths'] or ['/api/v1/channels/'],
+                             options['requests'], options['concurrency'])
+        runs = []
+        for url in options['urls']:
+            result = load_test.run(url)
+            runs.append(result)
+            self.stderr.write('{}: {} requests/s, p99 {}ms, {} errors'.format(
+                url, result['requests_per_second'], result['p99'], result['errors']
+            ))
+
+        results = OrderedDict([
+            ('date', timezone.now().isoformat()),
+            ('paths', load_test.paths),
+            ('requests', load_test.requests),
+            ('concurrency', load_test.concurrency),
+            ('servers', runs),
+        ])
+        output = json.dumps(results, indent=2)
+        if options['output'] is None:
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(
+                'Results written to {}.'.format(options['output'])
+            ))
@@ -0,0 +1,96 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from django.db.models import Q
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TreePagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination, or keyset pagination when the cursor
+    parameter is given, e.g. ?cursor= for the first page.
+
+    Keyset pages are ordered by (tree_id, lft) and start after the last
+    node of the previous page, so every page costs the same whatever its
+    position, and no count query is needed.
+    """
+    cursor_query_param = 'cursor'
+    cursor_query_description = 'The pagination cursor value, empty for the first page.'
+    ordering = ('tree_id', 'lft')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.position = None
+            return super(TreePagination, self).paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.position = self.decode_cursor(request)
+        queryset = queryset.order_by(*self.ordering)
+        if self.position:
+            tree_id, lft = self.position
+            queryset = queryset.filter(Q(tree_id__gt=tree_id) |
+                                       Q(tree_id=tree_id, lft__gt=lft))
+        # fetch one more node to know if there is a next page
+        page = list(queryset[:self.limit + 1])
+        self.has_next = len(page) > self.limit
+        self.page = page[:self.limit]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if self.position is None:
+            return super(TreePagination, self).get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_cursor_link()),
+            ('results', data)
+        ]))
+
+    def decode_cursor(self, request):
+        """
+        Get the (tree_id, lft) position from the cursor
+        returns: the position, or () for the first page
+        """
+        encoded = request.query_params[self.cursor_query_param]
+        if not encoded:
+            return ()
+        try:
+            tree_id, lft = b64decode(encoded.encode('ascii')).decode('ascii').split('.')
+            return int(tree_id), int(lft)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, node):
+        """node: model instance, or dict of values"""
+        if isinstance(node, dict):
+            position = '{}.{}'.format(node['tree_id'], node['lft'])
+        else:
+            position = '{}.{}'.format(node.tree_id, node.lft)
+        return b64encode(position.encode('ascii')).decode('ascii')
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.page[-1]))
+
+    def get_schema_fields(self, view):
+        fields = super(TreePagination, self).get_schema_fields(view)
+        fields.append(
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Cursor',
+                    description=self.cursor_query_description
+                )
+            )
+        )
+        return fields
@@ -0,0 +1,40 @@
+from rest_framework.compat import SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+
+
+# compact encoders by (encoder class, ensure_ascii, allow_nan), shared by
+# the renderers since DRF creates one renderer per request
+_encoders = {}
+
+
+def compact_encoder(encoder_class, ensure_ascii, allow_nan):
+    """The shared encoder for the compact output, built on first use"""
+    key = (encoder_class, ensure_ascii, allow_nan)
+    encoder = _encoders.get(key)
+    if encoder is None:
+        encoder = _encoders.setdefault(key, encoder_class(ensure_ascii=ensure_ascii,
+                                                          allow_nan=allow_nan,
+                                                          separators=SHORT_SEPARATORS))
+    return encoder
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer using an encoder shared by all the renderers for the
+    compact output, and escaping the line and paragraph separators only
+    when the output has them, which is rare and cheap to check. The
+    output is the same.
+    """
+    @property
+    def encoder(self):
+        return compact_encoder(self.encoder_class, self.ensure_ascii, not self.strict)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if data is None or indent is not None or not self.compact:
+            return super(FastJSONRenderer, self).render(data, accepted_media_type,
+                                                        renderer_context)
+        ret = self.encoder.encode(data)
+        if '\u2028' in ret or '\u2029' in ret:
+            ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode('utf-8')
@@ -1,8 +1,31 @@
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from itertools import islice
+from urllib.parse import quote
+from django.conf import settings
+from django.db.models import Manager
 from django.urls import reverse
-from channels.models import Channel, Category
+from django.utils.http import RFC3986_SUBDELIMS
+from channels.models import Channel, Category, ImportJob, Node
 from rest_framework import serializers
 
 
+def detail_url_builder(request, view_name, quote_lookup=False):
+    """
+    Get a function building the absolute detail urls of a view,
+    the url is reversed once and the lookup value is put in its place
+    quote_lookup: quote the lookup value as reverse does, for values
+    that may not be valid in urls, like the names of the channels
+    """
+    placeholder = 'lookup-placeholder'
+    url = request.build_absolute_uri(reverse(view_name, args=[placeholder]))
+    prefix, suffix = url.split(placeholder)
+    if quote_lookup:
+        safe = RFC3986_SUBDELIMS + '/~:@'
+        return lambda lookup: prefix + quote(lookup, safe=safe) + suffix
+    return lambda lookup: prefix + lookup + suffix
+
+
 class ChannelListSerializer(serializers.ModelSerializer):
     """Serializer for lists of channels"""
     class Meta:
@@ -16,6 +39,14 @@ class ChannelListSerializer(serializers.ModelSerializer):
         }
 
 
+class CategoryListSerializerList(serializers.ListSerializer):
+    """Fetch the channels of all the categories in one query"""
+    def to_representation(self, data):
+        categories = list(data.all() if isinstance(data, Manager) else data)
+        Category.objects.attach_channels(categories)
+        return super(CategoryListSerializerList, self).to_representation(categories)
+
+
 class CategoryListSerializer(serializers.ModelSerializer):
     """Serializer for lists of categories"""
     channel = serializers.HyperlinkedRelatedField(many=False,
@@ -26,6 +57,92 @@ class CategoryListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ('url', 'name', 'path', 'channel')
+        list_serializer_class = CategoryListSerializerList
+
+
+class CategoryBatchSerializer(CategoryListSerializer):
+    """Serializer for categories looked up in batch, with their parent"""
+    parent = serializers.SerializerMethodField()
+
+    class Meta(CategoryListSerializer.Meta):
+        fields = ('url', 'name', 'path', 'channel', 'parent')
+
+    def get_parent(self, obj):
+        if obj.level == 1:
+            return None
+        if not hasattr(self, '_parent_url'):
+            self._parent_url = detail_url_builder(self.context['request'],
+                                                  'category-detail')
+        return self._parent_url(obj.parent_id)
+
+
+class CategoryLookupSerializer(serializers.Serializer):
+    """Ids or full paths of the categories of a batch lookup"""
+    ids = serializers.ListField(child=serializers.CharField(), required=False)
+    paths = serializers.ListField(child=serializers.CharField(), required=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('paths' in attrs):
+            raise serializers.ValidationError('Give either ids or paths.')
+        field = 'ids' if 'ids' in attrs else 'paths'
+        # duplicated keys are looked up once, in the order given
+        keys = list(OrderedDict.fromkeys(attrs[field]))
+        max_size = settings.API_BATCH_MAX_SIZE
+        if len(keys) > max_size:
+            raise serializers.ValidationError({
+                field: 'At most {} categories per batch.'.format(max_size)
+            })
+        return {'field': field, 'keys': keys}
+
+
+class CategoryMoveSerializer(serializers.Serializer):
+    """New parent of a moved category, a category id or a channel name"""
+    parent = serializers.CharField(required=False)
+    channel = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        if ('parent' in attrs) == ('channel' in attrs):
+            raise serializers.ValidationError('Give either parent or channel.')
+        if 'parent' in attrs:
+            parent = Category.objects.filter(pk=attrs['parent']).first()
+            if parent is None:
+                raise serializers.ValidationError({'parent': 'Category not found.'})
+        else:
+            parent = Channel.objects.filter(name__iexact=attrs['channel']).first()
+            if parent is None:
+                raise serializers.ValidationError({'channel': 'Channel not found.'})
+        return {'parent': parent}
+
+
+class CategoryRenameSerializer(serializers.Serializer):
+    """New name of a renamed category"""
+    name = serializers.CharField(max_length=Node._meta.get_field('name').max_length)
+
+
+class ImportUploadSerializer(serializers.Serializer):
+    """File of categories uploaded to be imported into a channel"""
+    channel = serializers.CharField(max_length=Node._meta.get_field('name').max_length)
+    file = serializers.FileField()
+    separator = serializers.CharField(default=';', max_length=10, trim_whitespace=False)
+    sync = serializers.BooleanField(default=False)
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Status and progress of an import job"""
+    channel = serializers.HyperlinkedRelatedField(lookup_field='name',
+                                                  view_name='channel-detail',
+                                                  read_only=True)
+    elapsed = serializers.FloatField(read_only=True)
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = ('url', 'id', 'channel', 'status', 'sync', 'rows', 'categories',
+                  'error', 'created_at', 'started_at', 'finished_at', 'elapsed',
+                  'rows_per_second')
+        extra_kwargs = {
+            'url': {'view_name': 'import-detail'}
+        }
 
 
 class SubcategoryListSerializer(serializers.ModelSerializer):
@@ -35,9 +152,65 @@ class SubcategoryListSerializer(serializers.ModelSerializer):
         fields = ('url', 'path',)
 
 
-class ChannelSerializer(serializers.ModelSerializer):
+class TreeParamsSerializer(serializers.Serializer):
+    """
+    Query parameters of the subcategories of a channel or category,
+    the number of levels of subcategories, 1 for the children only
+    """
+    # deeper than the trees imported, the level is a 32 bits integer
+    MAX_DEPTH = 1000
+
+    depth = serializers.IntegerField(required=False, min_value=1, max_value=MAX_DEPTH)
+
+
+class DetailParamsSerializer(TreeParamsSerializer):
+    """
+    Query parameters of the detail of a channel or category, the fields
+    to include, comma separated, the depth and the maximum number of
+    subcategories. The fields allowed are given in the context.
+    """
+    fields = serializers.CharField(required=False)
+    subcategories_limit = serializers.IntegerField(required=False, min_value=0)
+
+    def validate_fields(self, value):
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in self.context['fields']]
+        if unknown:
+            raise serializers.ValidationError(
+                'Unknown fields: {}.'.format(', '.join(unknown))
+            )
+        return fields
+
+
+class NodeDetailSerializerMixin(object):
+    """
+    Apply the DetailParamsSerializer data in context['params'], the
+    fields not asked are dropped and the subcategories are only read
+    if they are asked, down to depth and at most subcategories_limit
+    """
+    def __init__(self, *args, **kwargs):
+        super(NodeDetailSerializerMixin, self).__init__(*args, **kwargs)
+        fields = self.params.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @property
+    def params(self):
+        return self.context.get('params', {})
+
+    def get_subcategories(self, obj):
+        nodes = obj.get_subcategories(self.params.get('depth'),
+                                      self.params.get('subcategories_limit'))
+        if settings.API_FAST_SERIALIZATION:
+            nodes = nodes.values(*SubcategoryValuesSerializer.values)
+            return SubcategoryValuesSerializer(nodes, context=self.context).data
+        return SubcategoryListSerializer(nodes, many=True, context=self.context).data
+
+
+class ChannelSerializer(NodeDetailSerializerMixin, serializers.ModelSerializer):
     """Serializer for channel detail"""
-    subcategories = SubcategoryListSerializer(many=True)
+    subcategories = serializers.SerializerMethodField()
 
     class Meta:
         model = Channel
@@ -52,14 +225,14 @@ class ChannelSerializer(serializers.ModelSerializer):
         }
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(NodeDetailSerializerMixin, serializers.ModelSerializer):
     """Serializer for category detail"""
     channel = serializers.HyperlinkedRelatedField(view_name='channel-detail',
                                                   lookup_field='name',
                                                   many=False,
                                                   read_only=True)
     parent = serializers.SerializerMethodField()
-    subcategories = SubcategoryListSerializer(many=True)
+    subcategories = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
@@ -77,5 +250,252 @@ class CategorySerializer(serializers.ModelSerializer):
         if obj.level == 1:
             return None
         else:
-            url = reverse('category-detail', args=[obj.parent.pk])
+            url = reverse('category-detail', args=[obj.parent_id])
             return self.context['request'].build_absolute_uri(url)
+
+
+class ValuesListSerializer(metaclass=ABCMeta):
+    """
+    Serializer for lists of nodes read with .values() instead of model
+    instances, with the same output as the ModelSerializer it replaces.
+    The urls are built from a prefix reversed once per list. values are
+    the fields read, with the tree position used by the pagination.
+    """
+    values = ('id', 'tree_id', 'lft')
+
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+
+    @abstractmethod
+    def to_representation(self, rows, request):
+        """rows: list of the values dicts, returns the serialized list"""
+
+    @property
+    def data(self):
+        return self.to_representation(list(self.rows), self.context['request'])
+
+
+class ChannelValuesSerializer(ValuesListSerializer):
+    """Same output as ChannelListSerializer"""
+    values = ('name', 'tree_id', 'lft')
+
+    def to_representation(self, rows, request):
+        channel_url = detail_url_builder(request, 'channel-detail', quote_lookup=True)
+        return [OrderedDict([
+            ('url', channel_url(row['name'])),
+            ('name', row['name']),
+        ]) for row in rows]
+
+
+class CategoryValuesSerializer(ValuesListSerializer):
+    """Same output as CategoryListSerializer, the channels are read in one query"""
+    values = ('id', 'name', 'path', 'tree_id', 'lft')
+
+    def to_representation(self, rows, request):
+        category_url = detail_url_builder(request, 'category-detail')
+        channel_url = detail_url_builder(request, 'channel-detail', quote_lookup=True)
+        tree_ids = {row['tree_id'] for row in rows}
+        channels = {}
+        if tree_ids:
+            channels = {tree_id: channel_url(name) for tree_id, name in
+                        Channel.objects.filter(tree_id__in=tree_ids)
+                        .values_list('tree_id', 'name')}
+        return [OrderedDict([
+            ('url', category_url(row['id'])),
+            ('name', row['name']),
+            ('path', row['path']),
+            ('channel', channels[row['tree_id']]),
+        ]) for row in rows]
+
+
+class SubcategoryValuesSerializer(ValuesListSerializer):
+    """Same output as SubcategoryListSerializer"""
+    values = ('id', 'path', 'tree_id', 'lft')
+
+    def to_representation(self, rows, request):
+        category_url = detail_url_builder(request, 'category-detail')
+        return [OrderedDict([
+            ('url', category_url(row['id'])),
+            ('path', row['path']),
+        ]) for row in rows]
+
+
+class CategoryTreeSerializer(object):
+    """
+    Serializer for the nested tree of a channel or category.
+    The nodes are read with a single query ordered by lft and the
+    tree is built in one pass, the parent of each node is the last
+    node read in the level above it.
+    """
+    def __init__(self, root, depth=None, context=None):
+        """
+        root: channel or category at the top of the tree
+        depth: optional number of levels below the root
+        """
+        self.root = root
+        self.depth = depth
+        self.context = context or {}
+
+    def get_nodes(self):
+        """Values of the descendants of the root, in tree order"""
+        nodes = Node.objects.filter(tree_id=self.root.tree_id,
+                                    lft__gt=self.root.lft,
+                                    lft__lt=self.root.rght)
+        if self.depth is not None:
+            nodes = nodes.filter(level__lte=self.root.level + self.depth)
+        return (nodes
+                .order_by('lft')
+                .values_list('id', 'name', 'path', 'level')
+                .iterator())
+
+    @property
+    def data(self):
+        request = self.context['request']
+        category_url = detail_url_builder(request, 'category-detail')
+        if self.root.is_root_node():
+            url = request.build_absolute_uri(
+                reverse('channel-detail', args=[self.root.name])
+            )
+        else:
+            url = category_url(self.root.pk)
+
+        tree = OrderedDict([
+            ('url', url),
+            ('name', self.root.name),
+            ('path', self.root.path),
+            ('subcategories', []),
+        ])
+        # subcategories list of the last node read in each level
+        levels = [tree['subcategories']]
+        for pk, name, path, level in self.get_nodes():
+            subcategories = []
+            del levels[level - self.root.level:]
+            levels[-1].append(OrderedDict([
+                ('url', category_url(pk)),
+                ('name', name),
+                ('path', path),
+                ('subcategories', subcategories),
+            ]))
+            levels.append(subcategories)
+        return tree
+
+
+class BreadcrumbSerializer(object):
+    """
+    Serializer for the chain of nodes from a channel to one of its
+    categories, with the siblings of each category if they were read.
+    """
+    def __init__(self, nodes, category_id, siblings=False, context=None):
+        """
+        nodes: (id, name, path, parent id) of the chain and of the siblings
+        category_id: id of the category at the end of the chain
+        """
+        self.nodes = nodes
+        self.category_id = category_id
+        self.siblings = siblings
+        self.context = context or {}
+
+    @property
+    def data(self):
+        request = self.context['request']
+        category_url = detail_url_builder(request, 'category-detail')
+        nodes = OrderedDict((node[0], node) for node in self.nodes)
+        children = {}
+        for pk, name, path, parent_id in nodes.values():
+            children.setdefault(parent_id, []).append(pk)
+
+        chain = [self.category_id]
+        while nodes[chain[-1]][3] is not None:
+            chain.append(nodes[chain[-1]][3])
+        chain.reverse()
+
+        def item(pk):
+            return OrderedDict([
+                ('url', category_url(pk)),
+                ('name', nodes[pk][1]),
+                ('path', nodes[pk][2]),
+            ])
+
+        channel = nodes[chain[0]]
+        breadcrumb = [OrderedDict([
+            ('url', request.build_absolute_uri(
+                reverse('channel-detail', args=[channel[1]]))),
+            ('name', channel[1]),
+            ('path', channel[2]),
+        ])]
+        for pk in chain[1:]:
+            data = item(pk)
+            if self.siblings:
+                data['siblings'] = [item(sibling) for sibling in children[nodes[pk][3]]
+                                    if sibling != pk]
+            breadcrumb.append(data)
+        return breadcrumb
+
+
+class SnapshotSerializer(object):
+    """
+    Serializer for channel and category detail read from a tree
+    snapshot instead of the database, the output is the same as
+    ChannelSerializer and CategorySerializer, with the same params.
+    """
+    def __init__(self, snapshot, index=0, context=None):
+        """index: position of the node in the snapshot, 0 for the channel"""
+        self.snapshot = snapshot
+        self.index = index
+        self.context = context or {}
+
+    def get_subcategories(self, category_url):
+        snapshot, i = self.snapshot, self.index
+        params = self.context.get('params', {})
+        depth = params.get('depth')
+        if depth == 1:
+            indexes = snapshot.children(i)
+        else:
+            indexes = snapshot.descendants(i)
+            if depth is not None:
+                max_level = snapshot.level[i] + depth
+                indexes = (j for j in indexes if snapshot.level[j] <= max_level)
+        return [
+            OrderedDict([
+                ('url', category_url(snapshot.ids[j])),
+                ('path', snapshot.paths[j]),
+            ])
+            for j in islice(indexes, params.get('subcategories_limit'))
+        ]
+
+    @property
+    def data(self):
+        snapshot, i = self.snapshot, self.index
+        request = self.context['request']
+        fields = self.context.get('params', {}).get('fields')
+        category_url = detail_url_builder(request, 'category-detail')
+        channel_url = request.build_absolute_uri(
+            reverse('channel-detail', args=[snapshot.name])
+        )
+        if fields is None or 'subcategories' in fields:
+            subcategories = self.get_subcategories(category_url)
+        else:
+            subcategories = None
+        if i == 0:
+            data = OrderedDict([
+                ('url', channel_url),
+                ('name', snapshot.name),
+                ('subcategories_count', snapshot.count(i)),
+                ('subcategories', subcategories),
+            ])
+        else:
+            parent = snapshot.parents[i]
+            data = OrderedDict([
+                ('url', category_url(snapshot.ids[i])),
+                ('name', snapshot.names[i]),
+                ('path', snapshot.paths[i]),
+                ('channel', channel_url),
+                ('parent', category_url(snapshot.ids[parent]) if parent else None),
+                ('subcategories_count', snapshot.count(i)),
+                ('subcategories', subcategories),
+            ])
+        if fields is not None:
+            data = OrderedDict((key, value) for key, value in data.items()
+                               if key in fields)
+        return data
@@ -0,0 +1,230 @@
+import sys
+import threading
+from array import array
+from django.conf import settings
+from channels.models import Node, TreeVersion
+from api.cache import tree_versions
+from api.db import use_replicas
+
+
+class TreeSnapshot(object):
+    """
+    Immutable copy of the nodes of a channel, in parallel arrays
+    indexed by the position of the node in tree order, the channel
+    is at index 0. The descendants of a node follow it, so they are
+    answered without walking the tree. versions are the global and tree
+    versions it was loaded with, set by the forest.
+    """
+    def __init__(self, tree_id, rows):
+        """rows: (id, name, path, lft, rght, level) of the nodes, ordered by lft"""
+        self.tree_id = tree_id
+        self.versions = None
+        self.ids = []
+        self.names = []
+        self.paths = []
+        self.parents = array('l')
+        self.lft = array('l')
+        self.rght = array('l')
+        self.level = array('l')
+        self.by_id = {}
+        self.by_path = {}
+        # indexes of the ancestors of the node being read
+        stack = []
+        for pk, name, path, lft, rght, level in rows:
+            i = len(self.ids)
+            while stack and self.rght[stack[-1]] < lft:
+                stack.pop()
+            self.ids.append(pk)
+            self.names.append(sys.intern(name))
+            self.paths.append(path)
+            self.parents.append(stack[-1] if stack else -1)
+            self.lft.append(lft)
+            self.rght.append(rght)
+            self.level.append(level)
+            self.by_id[pk] = i
+            self.by_path[path] = i
+            stack.append(i)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def name(self):
+        """Name of the channel"""
+        return self.names[0]
+
+    def count(self, i):
+        """Number of descendants of a node"""
+        return (self.rght[i] - self.lft[i] - 1) // 2
+
+    def descendants(self, i):
+        """Indexes of the descendants of a node, in tree order"""
+        return range(i + 1, i + 1 + self.count(i))
+
+    def children(self, i):
+        """Indexes of the children of a node, in tree order"""
+        child, end = i + 1, i + 1 + self.count(i)
+        while child < end:
+            yield child
+            child += self.count(child) + 1
+
+    def ancestors(self, i):
+        """Indexes of the ancestors of a node, the channel first"""
+        ancestors = []
+        parent = self.parents[i]
+        while parent != -1:
+            ancestors.append(parent)
+            parent = self.parents[parent]
+        ancestors.reverse()
+        return ancestors
+
+    def breadcrumb(self, i, siblings=False):
+        """
+        Get a node and its ancestors, and their siblings if asked
+        returns: (id, name, path, parent id) of the nodes, in tree order
+        """
+        indexes = self.ancestors(i) + [i]
+        if siblings:
+            indexes += [child for parent in indexes[:-1]
+                        for child in self.children(parent)]
+        return [(self.ids[j], self.names[j], self.paths[j],
+                 self.ids[self.parents[j]] if j else None)
+                for j in sorted(set(indexes))]
+
+
+class Forest(object):
+    """
+    Snapshots of all channels, with the lookups of channels and categories,
+    and the tree versions they were loaded with, by TreeVersion key
+    """
+    def __init__(self, versions=None):
+        self.versions = dict(versions or {})
+        self.trees = {}
+        self.tree_ids = {}
+        self.channels = {}
+
+    def add(self, tree_id, snapshot, version):
+        key = TreeVersion.key_for(tree_id)
+        self.trees[tree_id] = snapshot
+        self.versions[key] = version
+        snapshot.versions = {TreeVersion.GLOBAL: self.versions[TreeVersion.GLOBAL],
+                             key: version}
+        self.tree_ids.update(dict.fromkeys(snapshot.ids, tree_id))
+        self.channels[snapshot.name.lower()] = tree_id
+
+    def replace(self, trees, versions):
+        """
+        Get a copy of the forest with the snapshots of some trees replaced,
+        a tree without snapshot was deleted
+        """
+        forest = Forest({TreeVersion.GLOBAL: self.versions[TreeVersion.GLOBAL]})
+        for tree_id, snapshot in self.trees.items():
+            if tree_id not in trees:
+                forest.add(tree_id, snapshot, self.versions[TreeVersion.key_for(tree_id)])
+        for tree_id, snapshot in trees.items():
+            if snapshot is not None:
+                forest.add(tree_id, snapshot, versions[TreeVersion.key_for(tree_id)])
+        return forest
+
+
+class SnapshotStore(object):
+    """
+    Snapshots of all channels, for serving reads without the database.
+    The snapshots are loaded on first use and reloaded when the version
+    of their tree in the database changes, so the changes made by other
+    processes, imports and commands are seen by every web worker.
+    Enabled with settings.API_SNAPSHOT.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'API_SNAPSHOT', False)
+
+    def clear(self):
+        self.forest = Forest()
+
+    def load(self, tree_id=None):
+        """
+        Read the snapshots of a tree, or of all trees
+        returns: dict of snapshots by tree id
+        """
+        nodes = Node.objects.order_by('tree_id', 'lft')
+        if tree_id is not None:
+            nodes = nodes.filter(tree_id=tree_id)
+        rows = {}
+        for row in nodes.values_list('tree_id', 'id', 'name', 'path',
+                                     'lft', 'rght', 'level').iterator():
+            rows.setdefault(row[0], []).append(row[1:])
+        return {tree_id: TreeSnapshot(tree_id, tree_rows)
+                for tree_id, tree_rows in rows.items()}
+
+    def refresh(self):
+        """
+        Reload the snapshots whose tree version changed
+        returns: the current forest, it is replaced and never changed
+        so lookups are consistent while other threads reload it
+        """
+        # the versions and the trees are read from the primary, a lagging
+        # replica would keep old trees in the snapshots until the next change
+        forest = self.forest
+        with use_replicas(False):
+            if tree_versions.get_many(list(forest.trees)) == forest.versions:
+                return forest
+        with self._lock, use_replicas(False):
+            forest = self.forest
+            versions = tree_versions.get_many(list(forest.trees))
+            if versions[TreeVersion.GLOBAL] != forest.versions.get(TreeVersion.GLOBAL):
+                # the tree ids may have changed, load everything again,
+                # the versions are read first so changes made while
+                # loading are seen on the next refresh
+                versions = tree_versions.get_many()
+                forest = Forest({TreeVersion.GLOBAL: versions.get(TreeVersion.GLOBAL,
+                                                                  (0, None))})
+                for tree_id, snapshot in self.load().items():
+                    forest.add(tree_id, snapshot,
+                               versions.get(TreeVersion.key_for(tree_id), (0, None)))
+            else:
+                stale = [tree_id for tree_id in forest.trees
+                         if versions[TreeVersion.key_for(tree_id)] !=
+                         forest.versions[TreeVersion.key_for(tree_id)]]
+                trees = {tree_id: self.load(tree_id).get(tree_id) for tree_id in stale}
+                forest = forest.replace(trees, versions)
+            self.forest = forest
+            return forest
+
+    def channel(self, name):
+        """
+        Get the snapshot of a channel by its case insensitive name
+        returns: the snapshot, or None if there is no such channel
+        """
+        forest = self.refresh()
+        return forest.trees.get(forest.channels.get(name.lower()))
+
+    def category(self, pk):
+        """
+        Get a category by id
+        returns: the snapshot of its channel and its index, or (None, None)
+        """
+        forest = self.refresh()
+        snapshot = forest.trees.get(forest.tree_ids.get(pk))
+        if snapshot is None or snapshot.by_id[pk] == 0:
+            return None, None
+        return snapshot, snapshot.by_id[pk]
+
+    def category_by_path(self, path):
+        """
+        Get a category by its full path
+        returns: the snapshot of its channel and its index, or (None, None)
+        """
+        forest = self.refresh()
+        for snapshot in forest.trees.values():
+            i = snapshot.by_path.get(path)
+            if i:
+                return snapshot, i
+        return None, None
+
+
+tree_snapshots = SnapshotStore()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+from django.core.handlers.wsgi import WSGIHandler
+from django.http import parse_cookie
+from django.test import LiveServerTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from channels.models import Channel
+from api.loadtest import LoadTest
+from work_at_olist.asgi import ASGIHandler
+
+
+def http_scope(path, query_string=b'', method='GET', headers=()):
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'query_string': query_string,
+        'root_path': '',
+        'headers': [(b'host', b'testserver')] + list(headers),
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+
+
+async def call(application, scope, body=b''):
+    """Send a request to an ASGI application, returns the status, headers and body"""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    start = messages[0]
+    content = b''.join(message['body'] for message in messages[1:])
+    return start['status'], dict(start['headers']), content
+
+
+@override_settings(API_CACHE_ALIAS=None)
+class ASGIHandlerTestCase(TransactionTestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        self.channel.add_category(['Books', 'Computers'])
+        self.application = ASGIHandler(WSGIHandler(), max_threads=4)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.application.executor.shutdown()
+
+    def request(self, *args, **kwargs):
+        return self.loop.run_until_complete(
+            call(self.application, http_scope(*args, **kwargs))
+        )
+
+    def test_same_response_as_wsgi(self):
+        url = reverse('channel-detail', args=['foo'])
+        status, headers, content = self.request(url)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        self.assertEqual(content, self.client.get(url).content)
+
+    def test_query_string(self):
+        url = reverse('category-list')
+        status, _, content = self.request(url, b'search=computers')
+        paths = [category['path'] for category in json.loads(content.decode())['results']]
+        self.assertEqual(paths, ['/foo/Books/Computers'])
+
+    def test_concurrent_requests(self):
+        urls = [(reverse('channel-detail', args=['foo']), b''),
+                (reverse('category-path'), b'path=/foo/Books'),
+                (reverse('channel-list'), b'')] * 4
+        requests = [call(self.application, http_scope(path, query_string))
+                    for path, query_string in urls]
+        responses = self.loop.run_until_complete(asyncio.gather(*requests, loop=self.loop))
+        self.assertEqual([status for status, _, _ in responses], [200] * len(urls))
+
+    def test_repeated_headers(self):
+        environ = self.application.environ(http_scope('/', headers=[
+            (b'cookie', b'a=1'), (b'cookie', b'b=2'),
+            (b'accept', b'text/html'), (b'accept', b'application/json'),
+        ]), b'')
+        self.assertEqual(parse_cookie(environ['HTTP_COOKIE']), {'a': '1', 'b': '2'})
+        self.assertEqual(environ['HTTP_ACCEPT'], 'text/html,application/json')
+
+    def test_not_found(self):
+        status, _, _ = self.request(reverse('channel-detail', args=['bar']))
+        self.assertEqual(status, 404)
+
+    def test_streaming_response(self):
+        url = reverse('channel-export', args=['foo'])
+        status, _, content = self.request(url)
+        self.assertEqual(status, 200)
+        self.assertEqual(content, b''.join(self.client.get(url).streaming_content))
+
+
+class LoadTestTestCase(LiveServerTestCase):
+    def setUp(self):
+        Channel.objects.create(name='foo')
+
+    def test_load_test(self):
+        load_test = LoadTest(['/api/v1/channels/', '/api/v1/channels/foo/',
+                              '/api/v1/channels/bar/'],
+                             requests=30, concurrency=3)
+        results = load_test.run(self.live_server_url)
+        self.assertEqual(results['requests'], 30)
+        # the requests of the missing channel
+        self.assertEqual(results['errors'], 10)
+        self.assertGreater(results['requests_per_second'], 0)
+        self.assertLessEqual(results['p50'], results['p99'])
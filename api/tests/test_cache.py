@@ -0,0 +1,100 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from channels.models import Channel, Category, Node, TreeVersion
+from channels.importer import bulk_add_categories
+from api.cache import response_cache
+
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-cache-tests',
+    }
+}
+
+
+@override_settings(CACHES=TEST_CACHES, API_CACHE_ALIAS='default')
+class ResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        response_cache.cache.clear()
+        self.channel = Channel.objects.create(name='foo')
+        self.category = self.channel.add_category(['Home & Garden'])
+        self.url = reverse('channel-detail', args=['foo'])
+
+    def hits(self):
+        return response_cache.stats()['hits']
+
+    def test_second_request_is_cached(self):
+        hits = self.hits()
+        first = self.client.get(self.url)
+        with self.assertNumQueries(2):  # only the channel lookup and versions
+            second = self.client.get(self.url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(self.hits(), hits + 1)
+
+    def test_category_detail_is_cached(self):
+        url = reverse('category-detail', args=[self.category.pk])
+        first = self.client.get(url)
+        with self.assertNumQueries(2):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+
+    def test_node_save_invalidates(self):
+        self.client.get(self.url)
+        self.channel.add_category(['Books'])
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['subcategories_count'], 2)
+
+    def test_node_delete_invalidates(self):
+        self.client.get(self.url)
+        Category.objects.get(pk=self.category.pk).delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['subcategories_count'], 0)
+
+    def test_import_invalidates(self):
+        self.client.get(self.url)
+        bar = Channel.objects.create(name='bar')
+        bulk_add_categories(bar, [['Books', 'Computers']])
+        response = self.client.get(reverse('channel-detail', args=['bar']))
+        self.assertEqual(response.data['subcategories_count'], 2)
+        # creating bar shifted the tree id of foo
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['subcategories_count'], 1)
+
+    def test_change_in_other_process_invalidates(self):
+        url = reverse('category-detail', args=[self.category.pk])
+        self.assertEqual(self.client.get(url).data['name'], 'Home & Garden')
+        # another process renames the category, this one gets no signal,
+        # only the version of the tree stored with the change
+        Node.objects.filter(pk=self.category.pk).update(name='Garden')
+        TreeVersion.objects.bump(self.category.tree_id)
+        self.assertEqual(self.client.get(url).data['name'], 'Garden')
+
+    def test_workers_with_own_caches(self):
+        first = {'default': dict(TEST_CACHES['default'], LOCATION='worker-1')}
+        second = {'default': dict(TEST_CACHES['default'], LOCATION='worker-2')}
+        with self.settings(CACHES=first):
+            self.client.get(self.url)
+        with self.settings(CACHES=second):
+            self.channel.add_category(['Books'])
+        with self.settings(CACHES=first):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['subcategories_count'], 2)
+
+    def test_cache_stats(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, 403)
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_authenticate(admin)
+        response = self.client.get(reverse('cache-stats'))
+        self.assertIn('hits', response.data)
+        self.assertIn('misses', response.data)
+
+    @override_settings(API_CACHE_ALIAS=None)
+    def test_disabled_cache(self):
+        hits = self.hits()
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(self.hits(), hits)
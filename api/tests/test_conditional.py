@@ -0,0 +1,105 @@
+from django.urls import reverse
+from django.utils.http import http_date
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from channels.models import Channel, TreeVersion
+
+
+@override_settings(API_CACHE_ALIAS=None)
+class ConditionalRequestsTestCase(APITestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        self.category = self.channel.add_category(['Books', 'Computers'])
+        self.other = Channel.objects.create(name='bar')
+        self.other.add_category(['Music'])
+        self.channel.refresh_from_db()
+        self.other.refresh_from_db()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_validators(self):
+        response = self.client.get(reverse('channel-detail', args=['foo']))
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('GMT', response['Last-Modified'])
+
+    def test_not_modified(self):
+        urls = [
+            reverse('channel-detail', args=['foo']),
+            reverse('channel-list'),
+            reverse('channel-subcategories', args=['foo']),
+            reverse('channel-tree', args=['foo']),
+            reverse('category-detail', args=[self.category.pk]),
+            reverse('category-list'),
+            reverse('category-ancestors', args=[self.category.pk]),
+            reverse('category-path') + '?path=/foo/Books',
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.revalidate(url, response).status_code,
+                             status.HTTP_304_NOT_MODIFIED, url)
+
+    def test_not_modified_without_serializing(self):
+        url = reverse('channel-detail', args=['foo'])
+        response = self.client.get(url)
+        with self.assertNumQueries(2):  # the channel and its versions
+            self.revalidate(url, response)
+
+    def test_if_modified_since(self):
+        url = reverse('channel-detail', args=['foo'])
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_modified_when_the_channel_changes(self):
+        url = reverse('channel-detail', args=['foo'])
+        other_url = reverse('channel-detail', args=['bar'])
+        response = self.client.get(url)
+        other = self.client.get(other_url)
+        self.channel.add_category(['Games'])
+        self.assertEqual(self.revalidate(url, response).status_code, status.HTTP_200_OK)
+        # other channels and lists
+        self.assertEqual(self.revalidate(other_url, other).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+    def test_modified_by_other_process(self):
+        url = reverse('channel-detail', args=['foo'])
+        response = self.client.get(url)
+        # another process changed the channel, only its version is seen here
+        TreeVersion.objects.bump(self.channel.tree_id)
+        self.assertEqual(self.revalidate(url, response).status_code, status.HTTP_200_OK)
+
+    def test_same_validators_in_every_worker(self):
+        url = reverse('channel-detail', args=['foo'])
+        first = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                             'LOCATION': 'worker-1'}}
+        second = dict(first, default=dict(first['default'], LOCATION='worker-2'))
+        with self.settings(CACHES=first):
+            response = self.client.get(url)
+        with self.settings(CACHES=second):
+            other = self.client.get(url)
+            self.assertEqual(self.revalidate(url, response).status_code,
+                             status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], other['ETag'])
+        # the last change of the channel or of all the tree ids
+        versions = TreeVersion.objects.get_many([self.channel.tree_id]).values()
+        changed_at = max(changed_at for _, changed_at in versions if changed_at)
+        self.assertEqual(response['Last-Modified'], http_date(changed_at.timestamp()))
+
+    def test_list_modified_when_any_channel_changes(self):
+        url = reverse('category-list')
+        response = self.client.get(url)
+        self.other.add_category(['Games'])
+        self.assertEqual(self.revalidate(url, response).status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_the_url(self):
+        first = self.client.get(reverse('category-list'))
+        second = self.client.get(reverse('category-list') + '?limit=1')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    @override_settings(API_CONDITIONAL_REQUESTS=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('channel-detail', args=['foo']))
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,200 @@
+from unittest import mock
+from django.core.management import call_command
+from django.db import connections
+from django.db.utils import ConnectionDoesNotExist
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from channels.models import Channel, Node, TreeVersion
+from channels.utils import QueryCounter
+from api.db import (ReplicaPinningMiddleware, ReplicaRouter, _state,
+                    start_request, use_replicas)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], API_CACHE_ALIAS=None,
+                   API_CONDITIONAL_REQUESTS=False)
+class ReplicaRouterTestCase(TestCase):
+    def setUp(self):
+        Channel.objects.create(name='foo')
+        # a new request, that did not write yet, the connections
+        # to the replicas that do not exist are not checked
+        _state.wrote, _state.checked = False, None
+
+    def test_reads_from_primary_by_default(self):
+        self.assertEqual(Channel.objects.all().db, 'default')
+
+    def test_reads_from_replica(self):
+        with use_replicas():
+            self.assertEqual(Channel.objects.all().db, 'replica')
+            with use_replicas(False):
+                self.assertEqual(Channel.objects.all().db, 'default')
+        self.assertEqual(Channel.objects.all().db, 'default')
+
+    def test_reads_own_writes(self):
+        with use_replicas():
+            ReplicaRouter().db_for_write(Channel)
+            self.assertEqual(Channel.objects.all().db, 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        with use_replicas():
+            self.assertEqual(Channel.objects.all().db, 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica', 'other'])
+    def test_one_replica_per_request(self):
+        with use_replicas(), mock.patch('api.db.check_connection'), \
+                mock.patch('api.db.random.choice', side_effect=['other', 'replica']):
+            start_request()
+            self.assertEqual({Channel.objects.all().db for _ in range(5)}, {'other'})
+            start_request()
+            self.assertEqual(Channel.objects.all().db, 'replica')
+
+    def test_views_read_from_replica(self):
+        # there is no replica in the tests, the view fails trying to reach it
+        with self.assertRaises(ConnectionDoesNotExist):
+            self.client.get(reverse('channel-detail', args=['foo']))
+
+    def test_pinned_client_reads_from_primary(self):
+        self.client.cookies[ReplicaPinningMiddleware.cookie_name] = '1'
+        response = self.client.get(reverse('channel-detail', args=['foo']))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=['lagging'], API_SNAPSHOT=False)
+class LaggingReplicaTestCase(TestCase):
+    """
+    The tree versions are replicated with the rows, the cached responses
+    and the validators of a lagging replica are keyed on its versions
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(LaggingReplicaTestCase, cls).setUpClass()
+        connections.databases['lagging'] = {'ENGINE': 'django.db.backends.sqlite3',
+                                            'NAME': ':memory:'}
+        call_command('migrate', database='lagging', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['lagging'].close()
+        del connections['lagging']
+        del connections.databases['lagging']
+        super(LaggingReplicaTestCase, cls).tearDownClass()
+
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        self.books = self.channel.add_category(['Books'])
+        # the replica got the channel and its first category only
+        self.replicate()
+        self.books.move(name='Novels')
+        self.channel.add_category(['Games'])
+        _state.wrote = False
+
+    def tearDown(self):
+        Node._base_manager.using('lagging').all().delete()
+        TreeVersion.objects.using('lagging').all().delete()
+
+    def replicate(self):
+        """Copy the rows of the primary to the replica"""
+        self.tearDown()
+        Node._base_manager.using('lagging').bulk_create(Node._base_manager.all())
+        TreeVersion.objects.using('lagging').bulk_create(TreeVersion.objects.all())
+
+    def get(self, url, **extra):
+        with QueryCounter('lagging') as replica_queries:
+            response = self.client.get(url, **extra)
+        # the response was read from the replica only
+        self.assertGreater(replica_queries.count, 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        return response
+
+    def paths(self, nodes):
+        return sorted(node['path'] for node in nodes)
+
+    def test_detail_read_from_the_replica(self):
+        with QueryCounter('default') as primary_queries:
+            for _ in range(2):  # cached, then from the cache
+                response = self.get(reverse('channel-detail', args=['foo']))
+                self.assertEqual(self.paths(response.data['subcategories']), ['/foo/Books'])
+                response = self.get(reverse('category-detail', args=[self.books.pk]))
+                self.assertEqual(response.data['path'], '/foo/Books')
+        self.assertEqual(primary_queries.count, 0)
+
+    def test_lists_read_from_the_replica(self):
+        response = self.get(reverse('channel-subcategories', args=['foo']))
+        self.assertEqual(self.paths(response.data['results']), ['/foo/Books'])
+        response = self.get(reverse('category-ancestors', args=[self.books.pk]))
+        self.assertEqual(response.data[-1]['name'], 'Books')
+
+    def test_cached_apart_from_the_primary(self):
+        url = reverse('category-detail', args=[self.books.pk])
+        self.get(url)
+        self.client.cookies[ReplicaPinningMiddleware.cookie_name] = '1'
+        self.assertEqual(self.client.get(url).data['name'], 'Novels')
+        del self.client.cookies[ReplicaPinningMiddleware.cookie_name]
+        self.assertEqual(self.get(url).data['name'], 'Books')
+
+    def test_validators_follow_the_replica(self):
+        url = reverse('category-detail', args=[self.books.pk])
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.replicate()
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['name'], 'Novels')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_REPLICA_PIN_SECONDS=10)
+class ReplicaPinningMiddlewareTestCase(TestCase):
+    def get_response(self, view):
+        middleware = ReplicaPinningMiddleware(lambda request: view() or HttpResponse())
+        return middleware(RequestFactory().post('/'))
+
+    def test_write_pins_client(self):
+        response = self.get_response(lambda: Channel.objects.create(name='foo') and None)
+        cookie = response.cookies[ReplicaPinningMiddleware.cookie_name]
+        self.assertEqual(cookie['max-age'], 10)
+
+    def test_read_does_not_pin_client(self):
+        response = self.get_response(lambda: list(Channel.objects.all()) and None)
+        self.assertNotIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ConnectionHealthCheckTestCase(TestCase):
+    def fake_connection(self, usable, max_age=60):
+        connection = mock.Mock(settings_dict={'CONN_MAX_AGE': max_age},
+                               in_atomic_block=False)
+        connection.is_usable.return_value = usable
+        return connection
+
+    def route(self, connections):
+        """Route reads to the replica and a write, twice in each of two requests"""
+        router = ReplicaRouter()
+        with mock.patch('api.db.connections', connections), use_replicas():
+            for _ in range(2):
+                start_request()
+                for _ in range(2):
+                    router.db_for_read(Channel)
+                router.db_for_write(Channel)
+
+    def test_closes_broken_persistent_connections(self):
+        broken = self.fake_connection(usable=False)
+        working = self.fake_connection(usable=True)
+        self.route({'replica': broken, 'default': working})
+        # once per request
+        self.assertEqual(broken.close.call_count, 2)
+        self.assertEqual(working.is_usable.call_count, 2)
+        working.close.assert_not_called()
+
+    def test_checks_persistent_connections_only(self):
+        not_persistent = self.fake_connection(usable=False, max_age=0)
+        self.route({'replica': not_persistent, 'default': not_persistent})
+        not_persistent.is_usable.assert_not_called()
+
+    def test_checks_the_connections_used_only(self):
+        unused = self.fake_connection(usable=False)
+        used = self.fake_connection(usable=True)
+        with mock.patch('api.db.connections', {'default': used, 'other': unused}):
+            start_request()
+            Channel.objects.exists()
+        unused.is_usable.assert_not_called()
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+from channels.jobs import ImportQueue
+from channels.models import Category, Channel, ImportJob, TreeVersion
+from channels.reader import CategoryReader
+
+
+CSV = 'Books\nBooks;Computers\nBooks;Computers;Databases\nGames\n'
+
+
+@override_settings(IMPORT_WORKERS=0, API_CACHE_ALIAS=None, API_CONDITIONAL_REQUESTS=False)
+class ImportJobAPITestCase(APITestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_authenticate(admin)
+
+    def upload(self, content, **data):
+        data.setdefault('channel', 'foo')
+        data['file'] = SimpleUploadedFile('categories.csv', content.encode('utf-8'))
+        return self.client.post(reverse('import-list'), data, format='multipart')
+
+    def test_import(self):
+        response = self.upload(CSV)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response['Location'], response.data['url'])
+        self.assertEqual(response.data['status'], ImportJob.DONE)
+        self.assertEqual(response.data['rows'], 4)
+        self.assertEqual(response.data['categories'], 4)
+        self.assertGreaterEqual(response.data['rows_per_second'], 0)
+
+        channel = Channel.objects.get(name='foo')
+        self.assertEqual(channel.subcategories_count, 4)
+        self.assertTrue(Category.objects.filter(path='/foo/Books/Computers/Databases').exists())
+        # the uploaded file is removed once imported
+        self.assertFalse(os.path.exists(ImportJob.objects.get().file))
+
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.data['status'], ImportJob.DONE)
+        self.assertTrue(response.data['channel'].endswith(
+            reverse('channel-detail', args=['foo'])
+        ))
+        self.assertEqual(self.client.get(reverse('import-list')).data['count'], 1)
+
+    def test_import_replaces_or_syncs(self):
+        self.upload(CSV)
+        books = Category.objects.get(path='/foo/Books')
+        response = self.upload('Books\nMusic\n', channel='FOO', separator=',', sync=True)
+        self.assertEqual(response.data['categories'], 2)
+        self.assertEqual(Category.objects.get(path='/foo/Books').pk, books.pk)
+
+        self.upload('Music\n')
+        self.assertEqual([c.path for c in Channel.objects.get(name='foo').subcategories],
+                         ['/foo/Music'])
+
+    def test_failed_import_keeps_categories(self):
+        self.upload(CSV)
+        response = self.upload('Books;;Music\n')
+        self.assertEqual(response.data['status'], ImportJob.FAILED)
+        self.assertIn('cannot be empty', response.data['error'])
+        self.assertEqual(Channel.objects.get(name='foo').subcategories_count, 4)
+
+    def test_invalid_upload(self):
+        response = self.client.post(reverse('import-list'), {'channel': 'foo'},
+                                    format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file', response.data)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.upload(CSV).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(reverse('import-list')).status_code,
+                         status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(IMPORT_WORKERS=1, IMPORT_PROGRESS_ROWS=2, API_CACHE_ALIAS=None)
+class ImportJobProgressTestCase(APITransactionTestCase):
+    """A job run by the queue in a worker thread, polled while it runs"""
+    def setUp(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_authenticate(admin)
+
+    def wait_until_finished(self, pk, timeout=10):
+        """
+        Poll the status of the job, read from its table only since the
+        in memory SQLite test database locks the tables being imported
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if ImportJob.objects.filter(pk=pk, finished_at__isnull=False).exists():
+                return
+            time.sleep(0.02)
+        self.fail('The job did not finish')
+
+    def test_progress(self):
+        paused, resume = threading.Event(), threading.Event()
+
+        class PausingReader(CategoryReader):
+            """Stops before the fifth row until resumed"""
+            def __iter__(self):
+                for path in super(PausingReader, self).__iter__():
+                    if self.rows == 5:
+                        paused.set()
+                        resume.wait(10)
+                    yield path
+
+        content = 'Books\nBooks;Computers\nBooks;Music\nGames\nGames;Cards\nToys\n'
+        with mock.patch('channels.jobs.CategoryReader', PausingReader):
+            response = self.client.post(reverse('import-list'), {
+                'channel': 'foo',
+                'file': SimpleUploadedFile('categories.csv', content.encode('utf-8')),
+            }, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            url = response['Location']
+            self.assertTrue(paused.wait(10))
+            # the rows read are saved every IMPORT_PROGRESS_ROWS rows
+            job = self.client.get(url).data
+            self.assertEqual(job['status'], ImportJob.RUNNING)
+            self.assertEqual(job['rows'], 4)
+            self.assertIsNone(job['finished_at'])
+            resume.set()
+            self.wait_until_finished(job['id'])
+
+        job = self.client.get(url).data
+        self.assertEqual(job['status'], ImportJob.DONE)
+        self.assertEqual(job['rows'], 6)
+        self.assertEqual(job['categories'], 6)
+        # the version of the channel changed for every process
+        channel = Channel.objects.get(name='foo')
+        versions = TreeVersion.objects.get_many([channel.tree_id])
+        self.assertGreater(versions[str(channel.tree_id)][0], 0)
+
+
+class ImportQueueTestCase(TestCase):
+    @override_settings(IMPORT_WORKERS=2)
+    def test_bounded_concurrency(self):
+        running = []
+        most = []
+        lock = threading.Lock()
+
+        def run(pk):
+            with lock:
+                running.append(pk)
+                most.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(pk)
+
+        queue = ImportQueue()
+        jobs = [mock.Mock(pk=i) for i in range(6)]
+        # the jobs are submitted once the transaction commits
+        with mock.patch('channels.jobs.transaction.on_commit', lambda func: func()), \
+                mock.patch('channels.jobs.run_import_in_thread', run):
+            for job in jobs:
+                queue.submit(job)
+            queue.executor.shutdown(wait=True)
+        self.assertEqual(len(most), 6)
+        self.assertEqual(max(most), 2)
@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+from django.db import connection, connections
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from channels.models import Channel
+from channels.utils import QueryCounter, QueryLog
+from api.instrumentation import percentile, request_stats
+
+
+@contextmanager
+def second_connection(alias):
+    """Another connection to the test database, as a replica would be"""
+    connections.databases[alias] = dict(connections.databases['default'])
+    try:
+        yield connections[alias]
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+
+class QueryCounterTestCase(TestCase):
+    def test_counts_every_connection(self):
+        with second_connection('replica') as replica:
+            with QueryCounter() as queries, QueryCounter('replica') as replica_queries:
+                Channel.objects.count()
+                with replica.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.execute('SELECT 2')
+            self.assertEqual(queries.count, 3)
+            self.assertEqual(replica_queries.count, 2)
+            self.assertEqual(len(replica.queries_log), 2)
+            # the logs are restored
+            self.assertNotIsInstance(replica.queries_log, QueryLog)
+            with replica.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        self.assertEqual(queries.count, 3)
+
+
+    def test_connection_queries(self):
+        with QueryCounter() as queries, CaptureQueriesContext(connection) as captured:
+            with self.assertNumQueries(1):
+                Channel.objects.count()
+            self.assertEqual(len(connection.queries), len(connection.queries_log))
+            self.assertIn('COUNT', connection.queries[-1]['sql'])
+        self.assertEqual(queries.count, 1)
+        self.assertEqual(len(captured), 1)
+
+
+class PercentileTestCase(SimpleTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+
+@override_settings(API_INSTRUMENTATION=True, API_CACHE_ALIAS=None)
+class InstrumentationTestCase(APITestCase):
+    def setUp(self):
+        request_stats.clear()
+        self.channel = Channel.objects.create(name='foo')
+        self.channel.add_category(['Books', 'Computers'])
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('channel-detail', args=['foo']))
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn('db;dur=', timing)
+        self.assertIn('app;dur=', timing)
+
+    def test_stats_per_view(self):
+        for _ in range(3):
+            self.client.get(reverse('channel-detail', args=['foo']))
+        self.client.get(reverse('category-list'))
+        self.assertEqual(self.client.get(reverse('requests-stats')).status_code, 403)
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_authenticate(admin)
+        stats = self.client.get(reverse('requests-stats')).data
+
+        retrieve = stats['ChannelViewSet.retrieve']
+        self.assertEqual(retrieve['requests'], 3)
+        self.assertEqual(set(retrieve['total']), {'p50', 'p95', 'p99'})
+        self.assertGreater(retrieve['queries']['p50'], 0)
+        self.assertGreater(retrieve['size']['p50'], 0)
+        self.assertGreaterEqual(retrieve['app']['p50'], 0)
+        self.assertEqual(stats['CategoryViewSet.list']['requests'], 1)
+
+    def test_disabled(self):
+        with self.settings(API_INSTRUMENTATION=False):
+            # the middleware is loaded by the first request of a client
+            response = self.client_class().get(reverse('channel-detail', args=['foo']))
+        self.assertFalse(response.has_header('Server-Timing'))
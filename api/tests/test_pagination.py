@@ -0,0 +1,78 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from channels.models import Channel, Category
+
+
+class TreePaginationTestCase(APITestCase):
+    def setUp(self):
+        for name in ('foo', 'bar'):
+            channel = Channel.objects.create(name=name)
+            channel.add_category(['Home & Garden', 'Household Appliances', 'Dryers'])
+            channel.add_category(['Home & Garden', 'Kitchen & Dining'])
+            channel.add_category(['Books'])
+
+    def walk(self, url):
+        """Follow the next links, returns the pages"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def test_cursor_pages_in_tree_order(self):
+        pages = self.walk(reverse('category-list') + '?cursor=&limit=4')
+        self.assertEqual([len(page['results']) for page in pages], [4, 4, 2])
+        paths = [c['path'] for page in pages for c in page['results']]
+        expected = list(Category.objects.order_by('tree_id', 'lft')
+                        .values_list('path', flat=True))
+        self.assertEqual(paths, expected)
+
+    def test_cursor_page_has_no_count(self):
+        response = self.client.get(reverse('category-list') + '?cursor=')
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_page_queries(self):
+        url = reverse('category-list') + '?cursor=&limit=4'
+        next_url = self.client.get(url).data['next']
+        # tree versions, page and channels of the page, no count
+        with self.assertNumQueries(3):
+            self.client.get(next_url)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('category-list') + '?cursor=foo')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_no_cursor_with_search(self):
+        """Keyset pages would lose the best matches first order"""
+        response = self.client.get(reverse('category-list') + '?cursor=&search=books')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cursor', response.data)
+        response = self.client.get(reverse('category-list') + '?search=books&limit=1')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_limit_offset_still_available(self):
+        response = self.client.get(reverse('category-list') + '?limit=4&offset=4')
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_channel_subcategories(self):
+        url = reverse('channel-subcategories', args=['FOO']) + '?cursor=&limit=2'
+        pages = self.walk(url)
+        paths = [c['path'] for page in pages for c in page['results']]
+        self.assertEqual(paths, [
+            '/foo/Books',
+            '/foo/Home & Garden',
+            '/foo/Home & Garden/Household Appliances',
+            '/foo/Home & Garden/Household Appliances/Dryers',
+            '/foo/Home & Garden/Kitchen & Dining',
+        ])
+
+    def test_category_subcategories(self):
+        category = Category.objects.get(path='/bar/Home & Garden')
+        url = reverse('category-subcategories', args=[category.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 3)
@@ -1,4 +1,6 @@
+from django.contrib.auth.models import User
 from django.urls import reverse
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 from channels.models import Channel, Category
@@ -175,3 +177,342 @@ class ChannelAPITestCase(APITestCase):
         """Root url page should redirect to api docs"""
         response = self.client.get('/', follow=True)
         self.assertRedirects(response, '/api/v1/docs/')
+
+
+@override_settings(API_CACHE_ALIAS=None)
+class QueryCountTestCase(APITestCase):
+    """The number of queries of each endpoint must not grow with the data"""
+    def setUp(self):
+        for name in ('foo', 'bar', 'baz'):
+            channel = Channel.objects.create(name=name)
+            channel.add_category(['Home & Garden',
+                                  'Household Appliances',
+                                  'Laundry Appliances',
+                                  'Dryers'])
+            channel.add_category(['Home & Garden', 'Kitchen & Dining'])
+        self.category = Category.objects.filter(level=3).first()
+
+    def test_channel_list_queries(self):
+        # tree versions, count and page
+        with self.assertNumQueries(3):
+            self.client.get(reverse('channel-list'))
+
+    def test_channel_detail_queries(self):
+        # channel, tree versions and subcategories
+        with self.assertNumQueries(3):
+            self.client.get(reverse('channel-detail', args=['foo']))
+
+    def test_category_list_queries(self):
+        # tree versions, count, page and channels of the page
+        with self.assertNumQueries(4):
+            self.client.get(reverse('category-list'))
+
+    def test_category_detail_queries(self):
+        # category, tree versions, channel and subcategories
+        with self.assertNumQueries(4):
+            self.client.get(reverse('category-detail', args=[self.category.pk]))
+
+
+class CategoryPathAPITestCase(APITestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        self.category = self.channel.add_category(['Books', 'Computers', 'Database'])
+        self.channel.add_category(['Books', 'Computers & Tablets'])
+        self.channel.add_category(['Games'])
+
+    def test_get_category_by_path(self):
+        url = reverse('category-path') + '?path=/foo/Books/Computers/Database'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Database')
+        self.assertEqual(response.data['path'], '/foo/Books/Computers/Database')
+
+    def test_get_category_by_path_not_found(self):
+        url = reverse('category-path') + '?path=/foo/Books/Cooking'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_categories_by_path_prefix(self):
+        url = reverse('category-list') + '?prefix=/foo/Books/Computers/'
+        response = self.client.get(url)
+        paths = {category['path'] for category in response.data['results']}
+        expected = {'/foo/Books/Computers', '/foo/Books/Computers/Database'}
+        self.assertEqual(paths, expected)
+
+    def test_path_prefix_is_case_sensitive(self):
+        url = reverse('category-list') + '?prefix=/foo/books'
+        self.assertEqual(self.client.get(url).data['count'], 0)
+        url = reverse('category-list') + '?prefix=/FOO/Books/Computers'
+        self.assertEqual(self.client.get(url).data['count'], 0)
+
+    def test_slash_in_name(self):
+        self.channel.add_category(['I/O Cards', 'Riser Cards'])
+        url = reverse('category-path') + '?path=/foo/I\\/O Cards/'
+        self.assertEqual(self.client.get(url).data['name'], 'I/O Cards')
+        url = reverse('category-list') + '?prefix=/foo/I\\/O Cards'
+        paths = [category['path'] for category in self.client.get(url).data['results']]
+        self.assertEqual(paths, ['/foo/I\\/O Cards', '/foo/I\\/O Cards/Riser Cards'])
+        url = reverse('category-list') + '?prefix=/foo/I'
+        self.assertEqual(self.client.get(url).data['count'], 0)
+
+
+class CategorySearchAPITestCase(APITestCase):
+    def setUp(self):
+        foo = Channel.objects.create(name='foo')
+        foo.add_category(['Home & Garden', 'Laundry Appliances'])
+        foo.add_category(['Appliances'])
+        bar = Channel.objects.create(name='bar')
+        bar.add_category(['Appliances'])
+
+    def test_search_ranked_by_relevance(self):
+        url = reverse('category-list') + '?search=appliances'
+        response = self.client.get(url)
+        names = [category['name'] for category in response.data['results']]
+        self.assertEqual(names, ['Appliances', 'Appliances', 'Laundry Appliances'])
+
+    def test_search_pages_are_ranked(self):
+        url = reverse('category-list') + '?search=appliances&limit=1&offset={}'
+        names = [self.client.get(url.format(offset)).data['results'][0]['name']
+                 for offset in range(3)]
+        self.assertEqual(names, ['Appliances', 'Appliances', 'Laundry Appliances'])
+
+    def test_search_in_channel(self):
+        url = reverse('category-list') + '?search=appliances&channel=BAR'
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_search_in_unknown_channel(self):
+        url = reverse('category-list') + '?search=appliances&channel=baz'
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'], [])
+
+
+class ChannelExportAPITestCase(APITestCase):
+    def setUp(self):
+        foo = Channel.objects.create(name='foo')
+        foo.add_category(['Home & Garden', 'Dryers'])
+        bar = Channel.objects.create(name='bar')
+        bar.add_category(['Books'])
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_channel_csv(self):
+        response = self.client.get(reverse('channel-export', args=['foo']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(self.content(response), 'Home & Garden\nHome & Garden;Dryers\n')
+
+    def test_export_channel_jsonl(self):
+        response = self.client.get(reverse('channel-export', args=['foo']) + '?type=jsonl')
+        lines = self.content(response).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('"path": "/foo/Home & Garden/Dryers"', lines[1])
+
+    def test_export_all_channels(self):
+        response = self.client.get(reverse('channel-export-all'))
+        self.assertEqual(len(self.content(response).splitlines()), 3)
+
+    def test_export_all_channels_csv_not_allowed(self):
+        response = self.client.get(reverse('channel-export-all') + '?type=csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(API_BATCH_MAX_SIZE=5)
+class CategoryBatchAPITestCase(APITestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        self.computers = self.channel.add_category(['Books', 'Computers'])
+        self.books = self.computers.parent
+        self.url = reverse('category-batch')
+
+    def test_batch_by_ids(self):
+        ids = [self.computers.pk, 'missing', self.books.pk, self.computers.pk]
+        response = self.client.post(self.url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([r['path'] for r in results],
+                         ['/foo/Books/Computers', '/foo/Books'])
+        self.assertTrue(results[0]['channel'].endswith(
+            reverse('channel-detail', args=['foo'])))
+        self.assertTrue(results[0]['parent'].endswith(
+            reverse('category-detail', args=[self.books.pk])))
+        self.assertIsNone(results[1]['parent'])
+        self.assertEqual(response.data['missing'], ['missing'])
+
+    def test_batch_by_paths(self):
+        paths = ['foo/Books/', '/foo/Books/Computers', '/foo/Music']
+        response = self.client.post(self.url, {'paths': paths}, format='json')
+        self.assertEqual([r['name'] for r in response.data['results']],
+                         ['Books', 'Computers'])
+        self.assertEqual(response.data['missing'], ['/foo/Music'])
+
+    def test_batch_queries_do_not_depend_on_size(self):
+        other = Channel.objects.create(name='bar')
+        paths = ['/foo/Books', '/foo/Books/Computers']
+        paths += [other.add_category([name]).path for name in 'abc']
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, {'paths': paths}, format='json')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_batch_size_is_capped(self):
+        response = self.client.post(self.url, {'ids': list('abcdef')}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ids', response.data)
+
+    def test_batch_needs_ids_or_paths(self):
+        for data in ({}, {'ids': ['a'], 'paths': ['/a']}):
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CategoryAncestorsAPITestCase(APITestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        self.databases = self.channel.add_category(['Books', 'Computers', 'Databases'])
+        self.channel.add_category(['Books', 'Computers', 'Networks'])
+        self.channel.add_category(['Books', 'Music'])
+        self.channel.add_category(['Games'])
+        self.url = reverse('category-ancestors', args=[self.databases.pk])
+
+    def test_ancestors(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([node['path'] for node in response.data],
+                         ['/foo', '/foo/Books', '/foo/Books/Computers',
+                          '/foo/Books/Computers/Databases'])
+        self.assertTrue(response.data[0]['url'].endswith(
+            reverse('channel-detail', args=['foo'])))
+        self.assertNotIn('siblings', response.data[1])
+
+    def test_ancestors_with_siblings(self):
+        response = self.client.get(self.url, {'siblings': 'true'})
+        siblings = [[sibling['name'] for sibling in node['siblings']]
+                    for node in response.data[1:]]
+        self.assertEqual(siblings, [['Games'], ['Music'], ['Networks']])
+
+    @override_settings(API_CACHE_ALIAS=None)
+    def test_ancestors_in_one_range_query(self):
+        # the category lookup, tree versions and the range query
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'siblings': 'true'})
+
+    def test_ancestors_of_unknown_category(self):
+        url = reverse('category-ancestors', args=['missing'])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(API_CACHE_ALIAS=None)
+class DetailParamsAPITestCase(APITestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        self.channel.add_category(['Books', 'Computers', 'Databases'])
+        self.channel.add_category(['Books', 'Music'])
+        self.channel.add_category(['Games'])
+        self.books = Category.objects.get(path='/foo/Books')
+        self.channel_url = reverse('channel-detail', args=['foo'])
+        self.books_url = reverse('category-detail', args=[self.books.pk])
+
+    def paths(self, response):
+        return [node['path'] for node in response.data['subcategories']]
+
+    def test_fields(self):
+        response = self.client.get(self.books_url, {'fields': 'name, subcategories_count'})
+        self.assertEqual(response.data, {'name': 'Books', 'subcategories_count': 3})
+
+    def test_unknown_fields(self):
+        response = self.client.get(self.channel_url, {'fields': 'name,path'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+
+    def test_depth(self):
+        response = self.client.get(self.channel_url, {'depth': 1})
+        self.assertEqual(self.paths(response), ['/foo/Books', '/foo/Games'])
+        response = self.client.get(self.channel_url, {'depth': 2})
+        self.assertEqual(self.paths(response), ['/foo/Books', '/foo/Books/Computers',
+                                                '/foo/Books/Music', '/foo/Games'])
+        response = self.client.get(self.books_url, {'depth': 1})
+        self.assertEqual(self.paths(response), ['/foo/Books/Computers', '/foo/Books/Music'])
+        # the count is still of all the subcategories
+        self.assertEqual(response.data['subcategories_count'], 3)
+
+    def test_subcategories_limit(self):
+        response = self.client.get(self.channel_url, {'subcategories_limit': 2})
+        self.assertEqual(self.paths(response), ['/foo/Books', '/foo/Books/Computers'])
+        self.assertEqual(response.data['subcategories_count'], 5)
+        response = self.client.get(self.channel_url, {'subcategories_limit': 0})
+        self.assertEqual(self.paths(response), [])
+
+    def test_invalid_params(self):
+        for params in ({'depth': 0}, {'depth': 'all'}, {'subcategories_limit': -1}):
+            response = self.client.get(self.books_url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_params_by_path(self):
+        response = self.client.get(reverse('category-path'),
+                                   {'path': '/foo/Books', 'depth': 1, 'fields': 'subcategories'})
+        self.assertEqual(self.paths(response), ['/foo/Books/Computers', '/foo/Books/Music'])
+        self.assertEqual(list(response.data), ['subcategories'])
+
+    def test_queries(self):
+        # category, tree versions, channel and children by parent_id
+        with self.assertNumQueries(4):
+            self.client.get(self.books_url, {'depth': 1})
+        # the count is computed from lft and rght, subcategories are not read
+        with self.assertNumQueries(2):
+            self.client.get(self.books_url, {'fields': 'name,subcategories_count'})
+        with self.assertNumQueries(2):
+            self.client.get(self.channel_url, {'fields': 'url,subcategories_count'})
+
+
+class CategoryMoveAPITestCase(APITestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        self.databases = self.channel.add_category(['Books', 'Computers', 'Databases'])
+        self.games = self.channel.add_category(['Games'])
+        Channel.objects.create(name='bar')
+        self.computers = Category.objects.get(path='/foo/Books/Computers')
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_authenticate(admin)
+
+    def test_move_under_category(self):
+        url = reverse('category-move', args=[self.computers.pk])
+        response = self.client.post(url, {'parent': self.games.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['path'], '/foo/Games/Computers')
+        self.assertEqual(Category.objects.get(pk=self.databases.pk).path,
+                         '/foo/Games/Computers/Databases')
+
+    def test_move_to_channel(self):
+        url = reverse('category-move', args=[self.computers.pk])
+        response = self.client.post(url, {'channel': 'BAR'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Category.objects.get(pk=self.databases.pk).path,
+                         '/bar/Computers/Databases')
+
+    def test_rename(self):
+        url = reverse('category-rename', args=[self.computers.pk])
+        response = self.client.post(url, {'name': ' Software '}, format='json')
+        self.assertEqual(response.data['path'], '/foo/Books/Software')
+        self.assertEqual(Category.objects.get(pk=self.databases.pk).path,
+                         '/foo/Books/Software/Databases')
+
+    def test_invalid_requests(self):
+        move = reverse('category-move', args=[self.computers.pk])
+        for data in ({}, {'parent': 'missing'}, {'channel': 'baz'},
+                     {'parent': self.databases.pk},
+                     {'parent': self.games.pk, 'channel': 'bar'}):
+            response = self.client.post(move, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+        self.channel.add_category(['Books', 'Music'])
+        response = self.client.post(reverse('category-rename', args=[self.computers.pk]),
+                                    {'name': 'Music'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Category.objects.get(pk=self.databases.pk).path,
+                         '/foo/Books/Computers/Databases')
+
+    def test_only_admins(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(reverse('category-rename', args=[self.computers.pk]),
+                                    {'name': 'Software'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,81 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from channels.models import Channel, Category
+from api.renderers import FastJSONRenderer
+from api.serializers import ValuesListSerializer
+
+
+@override_settings(API_CACHE_ALIAS=None, API_CONDITIONAL_REQUESTS=False)
+class ValuesSerializersTestCase(APITestCase):
+    def setUp(self):
+        for name in ('foo', 'Lojas Ação & Cia', "bar's+baz"):
+            channel = Channel.objects.create(name=name)
+            channel.add_category(['Books', 'Computers', 'Databases'])
+            channel.add_category(['Books', 'Música'])
+            channel.add_category(['Games   & Toys'])
+        self.category = Category.objects.get(path='/foo/Books')
+
+    def test_abstract_base(self):
+        with self.assertRaises(TypeError):
+            ValuesListSerializer([])
+
+    def get_both(self, url):
+        """Get a response with and without the fast serialization"""
+        fast = self.client.get(url)
+        with self.settings(API_FAST_SERIALIZATION=False):
+            slow = self.client.get(url)
+        return fast, slow
+
+    def test_same_output(self):
+        channel = reverse('channel-detail', args=['Lojas Ação & Cia'])
+        urls = [
+            reverse('channel-list'),
+            reverse('channel-list') + '?cursor=&limit=2',
+            reverse('channel-list') + '?search=cia',
+            reverse('category-list'),
+            reverse('category-list') + '?limit=4&offset=3',
+            reverse('category-list') + '?cursor=&limit=4',
+            reverse('category-list') + '?search=books',
+            reverse('category-list') + '?prefix=/foo/Books',
+            reverse('category-list') + '?channel=nope',
+            channel,
+            channel + '?depth=1&subcategories_limit=2',
+            reverse('channel-subcategories', args=["bar's+baz"]),
+            reverse('channel-subcategories', args=['foo']) + '?cursor=&limit=2',
+            reverse('category-detail', args=[self.category.pk]),
+            reverse('category-subcategories', args=[self.category.pk]),
+        ]
+        for url in urls:
+            fast, slow = self.get_both(url)
+            self.assertEqual(fast.status_code, 200, url)
+            self.assertEqual(fast.content, slow.content, url)
+
+    def test_next_cursor(self):
+        url = reverse('category-list') + '?cursor=&limit=4'
+        fast, slow = self.get_both(url)
+        self.assertIsNotNone(fast.data['next'])
+        fast, slow = self.get_both(fast.data['next'])
+        self.assertEqual(fast.content, slow.content)
+
+    def test_list_queries(self):
+        # count, page and channels of the page
+        with self.assertNumQueries(3):
+            self.client.get(reverse('category-list'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('channel-list'))
+
+
+class FastJSONRendererTestCase(TestCase):
+    def test_same_output(self):
+        data = {'results': [{'name': 'Música    ', 'count': 1, 'url': None}]}
+        for media_type in (None, 'application/json; indent=4'):
+            self.assertEqual(FastJSONRenderer().render(data, media_type),
+                             JSONRenderer().render(data, media_type))
+        self.assertEqual(FastJSONRenderer().render({'name': 'Música'}),
+                         JSONRenderer().render({'name': 'Música'}))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_encoder_shared_by_renderers(self):
+        self.assertIs(FastJSONRenderer().encoder, FastJSONRenderer().encoder)
@@ -0,0 +1,131 @@
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+from channels.models import Channel, Category, TreeVersion
+from channels.importer import bulk_add_categories
+from api.snapshot import TreeSnapshot, tree_snapshots
+
+
+class TreeSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        bulk_add_categories(self.channel, [['Books', 'Computers', 'Databases'],
+                                           ['Books', 'Music'],
+                                           ['Games']])
+        self.channel.refresh_from_db()
+        rows = (Category.objects.filter(tree_id=self.channel.tree_id)
+                .order_by('lft')
+                .values_list('id', 'name', 'path', 'lft', 'rght', 'level'))
+        root = (self.channel.pk, 'foo', '/foo', self.channel.lft,
+                self.channel.rght, 0)
+        self.snapshot = TreeSnapshot(self.channel.tree_id, [root] + list(rows))
+
+    def index(self, path):
+        return self.snapshot.by_path[path]
+
+    def paths(self, indexes):
+        return [self.snapshot.paths[i] for i in indexes]
+
+    def test_descendants_and_count(self):
+        books = self.index('/foo/Books')
+        self.assertEqual(self.snapshot.count(0), 5)
+        self.assertEqual(self.snapshot.count(books), 3)
+        self.assertEqual(self.paths(self.snapshot.descendants(books)),
+                         ['/foo/Books/Computers',
+                          '/foo/Books/Computers/Databases',
+                          '/foo/Books/Music'])
+
+    def test_children(self):
+        self.assertEqual(self.paths(self.snapshot.children(0)),
+                         ['/foo/Books', '/foo/Games'])
+
+    def test_ancestors(self):
+        databases = self.index('/foo/Books/Computers/Databases')
+        self.assertEqual(self.paths(self.snapshot.ancestors(databases)),
+                         ['/foo', '/foo/Books', '/foo/Books/Computers'])
+        self.assertEqual(self.snapshot.ancestors(0), [])
+
+
+@override_settings(API_SNAPSHOT=True, API_CACHE_ALIAS=None)
+class SnapshotAPITestCase(APITestCase):
+    def setUp(self):
+        tree_snapshots.clear()
+        self.channel = Channel.objects.create(name='foo')
+        self.category = self.channel.add_category(['Books', 'Computers'])
+        Channel.objects.create(name='bar').add_category(['Books'])
+
+    def get_both(self, url):
+        """Get a response from the snapshot and from the database"""
+        snapshot = self.client.get(url)
+        with self.settings(API_SNAPSHOT=False):
+            database = self.client.get(url)
+        return snapshot, database
+
+    def test_same_output_as_database(self):
+        urls = [
+            reverse('channel-detail', args=['FOO']),
+            reverse('category-detail', args=[self.category.pk]),
+            reverse('category-detail', args=[self.category.parent_id]),
+            reverse('category-path') + '?path=/foo/Books/Computers',
+            reverse('category-ancestors', args=[self.category.pk]) + '?siblings=1',
+            reverse('channel-detail', args=['foo']) + '?depth=1',
+            reverse('channel-detail', args=['foo']) + '?subcategories_limit=1',
+            reverse('channel-detail', args=['foo']) + '?fields=name,subcategories_count',
+            reverse('category-detail', args=[self.category.parent_id]) +
+            '?fields=url,parent,subcategories&depth=2&subcategories_limit=5',
+        ]
+        for url in urls:
+            snapshot, database = self.get_both(url)
+            self.assertEqual(snapshot.status_code, 200)
+            self.assertEqual(snapshot.content, database.content)
+
+    def test_not_found(self):
+        urls = [
+            reverse('channel-detail', args=['baz']),
+            reverse('category-detail', args=[self.channel.pk]),
+            reverse('category-path') + '?path=/foo/Music',
+            reverse('category-ancestors', args=['missing']),
+        ]
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_served_without_node_queries(self):
+        url = reverse('category-detail', args=[self.category.pk])
+        self.client.get(url)
+        # only the tree versions
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_breadcrumb(self):
+        self.channel.add_category(['Books', 'Music'])
+        self.channel.refresh_from_db()
+        snapshot = tree_snapshots.channel('foo')
+        computers = snapshot.by_path['/foo/Books/Computers']
+        self.assertEqual([node[2] for node in snapshot.breadcrumb(computers, True)],
+                         ['/foo', '/foo/Books', '/foo/Books/Computers',
+                          '/foo/Books/Music'])
+
+    def test_reloaded_when_the_channel_changes(self):
+        url = reverse('channel-detail', args=['foo'])
+        self.assertEqual(self.client.get(url).data['subcategories_count'], 2)
+        self.channel.refresh_from_db()
+        self.channel.add_category(['Music'])
+        self.assertEqual(self.client.get(url).data['subcategories_count'], 3)
+
+    def test_reloaded_when_another_process_changes_the_channel(self):
+        url = reverse('channel-detail', args=['foo'])
+        self.client.get(url)
+        # an import run by another worker writes the rows without
+        # the signals of this process, and bumps the version
+        Category.objects.filter(name='Computers').update(name='Laptops',
+                                                          path='/foo/Books/Laptops')
+        self.channel.refresh_from_db()
+        TreeVersion.objects.bump(self.channel.tree_id)
+        paths = [c['path'] for c in self.client.get(url).data['subcategories']]
+        self.assertEqual(paths, ['/foo/Books', '/foo/Books/Laptops'])
+
+    def test_new_channel_is_loaded(self):
+        self.client.get(reverse('channel-detail', args=['foo']))
+        Channel.objects.create(name='baz')
+        response = self.client.get(reverse('channel-detail', args=['baz']))
+        self.assertEqual(response.status_code, 200)
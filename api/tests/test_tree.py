@@ -0,0 +1,73 @@
+from django.urls import reverse
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from channels.models import Channel, Category
+
+
+def names(tree):
+    """Nested (name, subcategories) tuples of a tree"""
+    return [(node['name'], names(node))
+            for node in tree['subcategories']]
+
+
+@override_settings(API_CACHE_ALIAS=None)
+class ChannelTreeTestCase(APITestCase):
+    def setUp(self):
+        channel = Channel.objects.create(name='foo')
+        channel.add_category(['Home & Garden', 'Household Appliances', 'Dryers'])
+        channel.add_category(['Home & Garden', 'Kitchen & Dining'])
+        channel.add_category(['Books'])
+        self.url = reverse('channel-tree', args=['foo'])
+
+    def test_nested_tree(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'foo')
+        self.assertEqual(names(response.data), [
+            ('Books', []),
+            ('Home & Garden', [
+                ('Household Appliances', [('Dryers', [])]),
+                ('Kitchen & Dining', []),
+            ]),
+        ])
+
+    def test_node_urls(self):
+        response = self.client.get(self.url)
+        books = Category.objects.get(path='/foo/Books')
+        expected = response.wsgi_request.build_absolute_uri(
+            reverse('category-detail', args=[books.pk])
+        )
+        self.assertEqual(response.data['subcategories'][0]['url'], expected)
+
+    def test_depth(self):
+        response = self.client.get(self.url + '?depth=1')
+        self.assertEqual(names(response.data), [('Books', []), ('Home & Garden', [])])
+
+    def test_invalid_depth(self):
+        detail_url = reverse('channel-detail', args=['foo'])
+        for depth in ('0', 'x', '1001', '9' * 30):
+            with self.subTest(depth=depth):
+                response = self.client.get(self.url, {'depth': depth})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                # the same errors as the detail
+                self.assertEqual(response.data,
+                                 self.client.get(detail_url, {'depth': depth}).data)
+
+    def test_subtree(self):
+        root = Category.objects.get(path='/foo/Home & Garden')
+        response = self.client.get(self.url + '?root={}&depth=1'.format(root.pk))
+        self.assertEqual(response.data['path'], '/foo/Home & Garden')
+        self.assertEqual(names(response.data), [('Household Appliances', []),
+                                                ('Kitchen & Dining', [])])
+
+    def test_subtree_from_other_channel(self):
+        bar = Channel.objects.create(name='bar')
+        root = bar.add_category(['Books'])
+        response = self.client.get(self.url + '?root={}'.format(root.pk))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_queries(self):
+        # channel, tree versions and nodes
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
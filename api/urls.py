@@ -1,16 +1,20 @@
 from django.conf.urls import url, include
 from rest_framework import routers
 from rest_framework_swagger.views import get_swagger_view
-from api.views import ChannelViewSet, CategoryViewSet
+from api.views import (ChannelViewSet, CategoryViewSet, ImportJobViewSet,
+                       cache_stats, requests_stats)
 
 
 schema_view = get_swagger_view(title='Channels API')
 router = routers.DefaultRouter()
 router.register(r'channels', ChannelViewSet, 'channel')
 router.register(r'categories', CategoryViewSet, 'category')
+router.register(r'imports', ImportJobViewSet, 'import')
 
 urlpatterns = [
     url(r'^', include(router.urls)),
     url(r'^docs/', schema_view),
+    url(r'^stats/cache/$', cache_stats, name='cache-stats'),
+    url(r'^stats/requests/$', requests_stats, name='requests-stats'),
     url(r'^api-auth/', include('rest_framework.urls', namespace='rest_framework')),
 ]
@@ -1,19 +1,159 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.core.exceptions import ValidationError as ModelValidationError
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import viewsets, mixins, filters
+from rest_framework import viewsets, mixins, filters, permissions
+from rest_framework.decorators import api_view, detail_route, list_route, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
-from channels.models import Channel, Category
-from api.serializers import (CategorySerializer,
+from rest_framework.status import HTTP_202_ACCEPTED
+from channels.models import Channel, Category, ImportJob
+from channels.jobs import create_import_job, import_queue
+from channels.exporter import EXPORT_FORMATS, export_categories
+from channels.utils import normalize_path
+from api.cache import response_cache, tree_versions
+from api.conditional import conditional_requests
+from api.db import ReplicaViewMixin, use_replicas
+from api.instrumentation import InstrumentedViewMixin, request_stats
+from api.snapshot import tree_snapshots
+from api.filters import CategorySearchFilter, PathPrefixFilter
+from api.pagination import TreePagination
+from api.serializers import (BreadcrumbSerializer,
+                             CategoryBatchSerializer,
+                             CategoryLookupSerializer,
+                             CategoryMoveSerializer,
+                             CategoryRenameSerializer,
+                             CategorySerializer,
                              CategoryListSerializer,
                              ChannelSerializer,
-                             ChannelListSerializer)
+                             ChannelListSerializer,
+                             CategoryTreeSerializer,
+                             CategoryValuesSerializer,
+                             ChannelValuesSerializer,
+                             DetailParamsSerializer,
+                             ImportJobSerializer,
+                             ImportUploadSerializer,
+                             SnapshotSerializer,
+                             SubcategoryListSerializer,
+                             SubcategoryValuesSerializer,
+                             TreeParamsSerializer)
 
 
-class ChannelViewSet(mixins.RetrieveModelMixin,
+class SubcategoriesMixin(object):
+    """Paginated list of the subcategories of a node"""
+    def list_subcategories(self, request, node):
+        if settings.API_FAST_SERIALIZATION:
+            page = self.paginate_queryset(
+                node.subcategories.values(*SubcategoryValuesSerializer.values)
+            )
+            serializer = SubcategoryValuesSerializer(page, context={'request': request})
+        else:
+            page = self.paginate_queryset(node.subcategories)
+            serializer = SubcategoryListSerializer(page, many=True,
+                                                   context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
+
+class ValuesListMixin(object):
+    """
+    List from .values() rows with values_serializer_class, without
+    building model instances, if settings.API_FAST_SERIALIZATION
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.API_FAST_SERIALIZATION:
+            return super(ValuesListMixin, self).list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.values(*self.values_serializer_class.values))
+        serializer = self.values_serializer_class(page, context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
+
+class DetailParamsMixin(object):
+    """Query parameters selecting the fields and subcategories of a detail"""
+    def get_params(self, request, params_class, **context):
+        """
+        Validate the query parameters with params_class
+        returns: the validated parameters
+        """
+        params = params_class(data=request.query_params, context=context)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
+    def get_detail_context(self, request, serializer_class):
+        """
+        Validate the parameters for a detail serializer
+        returns: the context of the serializer, with the params
+        """
+        params = self.get_params(request, DetailParamsSerializer,
+                                 fields=serializer_class.Meta.fields)
+        return {'request': request, 'params': params}
+
+
+class ConditionalListMixin(object):
+    """Answer conditional requests for the list, which is read from all channels"""
+    def list(self, request, *args, **kwargs):
+        return conditional_requests.respond(
+            request, None,
+            lambda: super(ConditionalListMixin, self).list(request, *args, **kwargs)
+        )
+
+
+def tree_response(request, tree_id, serialize, versions=None):
+    """
+    Response with data read from a tree, answered with 304 Not Modified
+    or from the response cache if the tree did not change
+    serialize: function returning the data
+    versions: versions of the tree the data is read from, read if None
+    """
+    if versions is None and (conditional_requests.enabled or response_cache.enabled):
+        # read once for the validators and the cache key
+        versions = tree_versions.get_many([tree_id])
+    return conditional_requests.respond(
+        request, tree_id,
+        lambda: Response(response_cache.get_or_set(request, tree_id, serialize, versions)),
+        versions
+    )
+
+
+def snapshot_response(request, context, snapshot, index=0):
+    """Detail of a node read from the snapshot of its channel"""
+    if snapshot is None:
+        raise Http404
+    return tree_response(
+        request, snapshot.tree_id,
+        lambda: SnapshotSerializer(snapshot, index, context=context).data,
+        snapshot.versions
+    )
+
+
+def export_response(categories, export_type, filename):
+    """Stream exported categories in the requested type"""
+    lines, content_type = EXPORT_FORMATS[export_type]
+    response = StreamingHttpResponse(lines(categories), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(
+        filename, export_type
+    )
+    return response
+
+
+class ChannelViewSet(InstrumentedViewMixin,
+                     ReplicaViewMixin,
+                     ConditionalListMixin,
+                     ValuesListMixin,
+                     DetailParamsMixin,
+                     SubcategoriesMixin,
+                     mixins.RetrieveModelMixin,
                      mixins.ListModelMixin,
                      viewsets.GenericViewSet):
     """API endpoints for Channels, list, detail and search."""
     queryset = Channel.objects.all()
+    values_serializer_class = ChannelValuesSerializer
     lookup_field = 'name'
+    pagination_class = TreePagination
     filter_backends = (filters.SearchFilter,)
     search_fields = ('name',)
 
@@ -26,17 +166,85 @@ class ChannelViewSet(mixins.RetrieveModelMixin,
         return ChannelSerializer
 
     def retrieve(self, request, name=None):
-        """Get a Channel detail with case insensitive name."""
+        """
+        Get a Channel detail with case insensitive name. The fields
+        parameter selects the fields, comma separated, depth the levels
+        of subcategories and subcategories_limit their number.
+        """
+        context = self.get_detail_context(request, ChannelSerializer)
+        if tree_snapshots.enabled:
+            return snapshot_response(request, context, tree_snapshots.channel(name))
         channel = get_object_or_404(self.queryset, name__iexact=name)
-        serializer = ChannelSerializer(channel, context={'request': request})
-        return Response(serializer.data)
+        return tree_response(
+            request, channel.tree_id,
+            lambda: ChannelSerializer(channel, context=context).data
+        )
 
+    @detail_route(methods=['get'])
+    def subcategories(self, request, name=None):
+        """Get the subcategories of a Channel, paginated."""
+        channel = get_object_or_404(self.queryset, name__iexact=name)
+        return conditional_requests.respond(
+            request, channel.tree_id,
+            lambda: self.list_subcategories(request, channel)
+        )
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+    def get_export_type(self, request, allowed=tuple(EXPORT_FORMATS)):
+        export_type = request.query_params.get('type', allowed[0])
+        if export_type not in allowed:
+            raise ValidationError(
+                {'type': 'Must be one of: {}.'.format(', '.join(allowed))}
+            )
+        return export_type
+
+    @detail_route(methods=['get'])
+    def export(self, request, name=None):
+        """
+        Export the categories of a Channel, as CSV lines in the format
+        read by importcategories, or as JSON lines (type=jsonl).
+        """
+        channel = get_object_or_404(self.queryset, name__iexact=name)
+        export_type = self.get_export_type(request)
+        return export_response(export_categories(channel.tree_id),
+                               export_type, channel.name)
+
+    @list_route(methods=['get'], url_path='export', url_name='export-all')
+    def export_all(self, request):
+        """Export the categories of all Channels as JSON lines."""
+        export_type = self.get_export_type(request, allowed=('jsonl',))
+        return export_response(export_categories(), export_type, 'channels')
+
+    @detail_route(methods=['get'])
+    def tree(self, request, name=None):
+        """
+        Get the nested tree of the categories of a Channel,
+        optionally below a category (root) and limited in depth.
+        """
+        channel = get_object_or_404(self.queryset, name__iexact=name)
+        root = channel
+        if request.query_params.get('root'):
+            root = get_object_or_404(Category.objects.all(),
+                                     pk=request.query_params['root'],
+                                     tree_id=channel.tree_id)
+        depth = self.get_params(request, TreeParamsSerializer).get('depth')
+        return tree_response(
+            request, channel.tree_id,
+            lambda: CategoryTreeSerializer(root, depth, context={'request': request}).data
+        )
+
+
+class CategoryViewSet(InstrumentedViewMixin,
+                      ReplicaViewMixin,
+                      ConditionalListMixin,
+                      ValuesListMixin,
+                      DetailParamsMixin,
+                      SubcategoriesMixin,
+                      viewsets.ReadOnlyModelViewSet):
     """API endpoints for Categories, list, detail and search"""
     queryset = Category.objects.all()
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('name',)
+    values_serializer_class = CategoryValuesSerializer
+    pagination_class = TreePagination
+    filter_backends = (CategorySearchFilter, PathPrefixFilter)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -44,3 +252,177 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
         elif self.action == 'retrieve':
             return CategorySerializer
         return CategorySerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Get a Category detail, cached until its channel changes.
+        Takes the fields, depth and subcategories_limit parameters.
+        """
+        context = self.get_detail_context(request, CategorySerializer)
+        if tree_snapshots.enabled:
+            return snapshot_response(request, context,
+                                     *tree_snapshots.category(kwargs['pk']))
+        category = self.get_object()
+        return tree_response(
+            request, category.tree_id,
+            lambda: CategorySerializer(category, context=context).data
+        )
+
+    @detail_route(methods=['get'])
+    def subcategories(self, request, pk=None):
+        """Get the subcategories of a Category, paginated."""
+        category = self.get_object()
+        return conditional_requests.respond(
+            request, category.tree_id,
+            lambda: self.list_subcategories(request, category)
+        )
+
+    @detail_route(methods=['get'])
+    def ancestors(self, request, pk=None):
+        """
+        Get the chain of ancestors of a Category, from its channel to the
+        category, in one query. With siblings=true the other children of
+        the parent of each category are included, to render menus.
+        """
+        siblings = request.query_params.get('siblings', '').lower() in ('1', 'true')
+        if tree_snapshots.enabled:
+            snapshot, i = tree_snapshots.category(pk)
+            if snapshot is None:
+                raise Http404
+            tree_id, versions = snapshot.tree_id, snapshot.versions
+        else:
+            category = self.get_object()
+            tree_id, versions = category.tree_id, None
+
+        def serialize():
+            if tree_snapshots.enabled:
+                nodes = snapshot.breadcrumb(i, siblings)
+            else:
+                nodes = (category.get_breadcrumb(siblings)
+                         .values_list('id', 'name', 'path', 'parent_id'))
+            return BreadcrumbSerializer(nodes, pk, siblings,
+                                        context={'request': request}).data
+
+        return tree_response(request, tree_id, serialize, versions)
+
+    def update_category(self, request, serializer_class, update):
+        """
+        Validate the request data and update the category with it
+        update: function called with the category and the validated data
+        returns: the detail of the updated category
+        """
+        # the category is read from and written to the primary
+        with use_replicas(False):
+            data = serializer_class(data=request.data)
+            data.is_valid(raise_exception=True)
+            category = self.get_object()
+            try:
+                update(category, data.validated_data)
+            except ModelValidationError as e:
+                raise ValidationError(e.message_dict)
+            return Response(CategorySerializer(category, context={'request': request}).data)
+
+    @detail_route(methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def move(self, request, pk=None):
+        """
+        Move a Category, with its subcategories, under another category,
+        {"parent": id}, or to the top of a channel, {"channel": name}.
+        """
+        return self.update_category(
+            request, CategoryMoveSerializer,
+            lambda category, data: category.move(parent=data['parent'])
+        )
+
+    @detail_route(methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def rename(self, request, pk=None):
+        """Rename a Category, {"name": name}, the paths of its subcategories follow."""
+        return self.update_category(
+            request, CategoryRenameSerializer,
+            lambda category, data: category.move(name=data['name'])
+        )
+
+    @list_route(methods=['get'])
+    def path(self, request):
+        """Get a Category detail by its full path, e.g. ?path=/Books/Computers"""
+        path = normalize_path(request.query_params.get('path', ''))
+        context = self.get_detail_context(request, CategorySerializer)
+        if tree_snapshots.enabled:
+            return snapshot_response(request, context,
+                                     *tree_snapshots.category_by_path(path))
+        category = get_object_or_404(self.queryset, path=path)
+        return tree_response(
+            request, category.tree_id,
+            lambda: CategorySerializer(category, context=context).data
+        )
+
+    @list_route(methods=['post'])
+    def batch(self, request):
+        """
+        Get many Categories by their ids, {"ids": [...]}, or full paths,
+        {"paths": [...]}, in the order given. The keys not found are
+        listed in missing. The number of queries does not depend on
+        the number of categories.
+        """
+        lookup = CategoryLookupSerializer(data=request.data)
+        lookup.is_valid(raise_exception=True)
+        field, keys = lookup.validated_data['field'], lookup.validated_data['keys']
+        if field == 'paths':
+            keys = list(OrderedDict.fromkeys(normalize_path(path) for path in keys))
+            found = Category.objects.in_bulk_by('path', keys)
+        else:
+            found = Category.objects.in_bulk_by('id', keys)
+        categories = [found[key] for key in keys if key in found]
+        serializer = CategoryBatchSerializer(categories, many=True,
+                                             context={'request': request})
+        return Response(OrderedDict([
+            ('results', serializer.data),
+            ('missing', [key for key in keys if key not in found]),
+        ]))
+
+
+class ImportJobViewSet(mixins.RetrieveModelMixin,
+                       mixins.ListModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    API endpoints for import jobs. Upload a file of categories to import
+    it into a channel in the background, then poll the job for its status,
+    rows processed and throughput.
+    """
+    queryset = ImportJob.objects.select_related('channel')
+    serializer_class = ImportJobSerializer
+    permission_classes = (permissions.IsAdminUser,)
+    parser_classes = (MultiPartParser, FormParser)
+
+    def create(self, request):
+        """
+        Queue the import of a file into a channel, created if it does not
+        exist: multipart form with channel, file, and optionally separator
+        and sync to only insert new and delete vanished categories.
+        """
+        upload = ImportUploadSerializer(data=request.data)
+        upload.is_valid(raise_exception=True)
+        data = upload.validated_data
+        try:
+            job = create_import_job(data['channel'], data['file'],
+                                    data['separator'], data['sync'])
+        except ModelValidationError as e:
+            raise ValidationError(e.message_dict)
+        import_queue.submit(job)
+        job.refresh_from_db()
+        serializer = self.get_serializer(job)
+        return Response(serializer.data, status=HTTP_202_ACCEPTED,
+                        headers={'Location': serializer.data['url']})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def cache_stats(request):
+    """Hits and misses of the response cache in this process."""
+    return Response(response_cache.stats())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def requests_stats(request):
+    """Percentiles of the measures of the recent requests of each view."""
+    return Response(request_stats.summary())
@@ -0,0 +1,251 @@
+import functools
+import os
+import platform
+import statistics
+from collections import OrderedDict, deque
+import django
+from django.db import connection, transaction
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.http import urlencode
+from rest_framework.test import APIClient
+from channels.models import Channel, Category
+from channels.importer import CategoryTrie, bulk_add_tree, clear_categories, read_tree
+from channels.trees import TREE_BACKENDS
+from channels.utils import QueryCounter, Timer, join_path
+
+
+def wide_paths(size, fanout=1000):
+    """
+    Paths of a tree of size categories where every category
+    has fanout subcategories, filled level by level.
+    """
+    queue = deque([[]])
+    count = 0
+    while count < size:
+        parent = queue.popleft()
+        for _ in range(min(fanout, size - count)):
+            path = parent + ['Category {}'.format(count)]
+            queue.append(path)
+            count += 1
+            yield path
+
+
+def deep_paths(size, depth=100):
+    """
+    Paths of a tree of size categories made of
+    branches of depth nested categories each.
+    """
+    for branch in range(0, size, depth):
+        levels = min(depth, size - branch)
+        yield ['Category {}-{}'.format(branch, level) for level in range(levels)]
+
+
+SHAPES = OrderedDict([
+    ('wide', wide_paths),
+    ('deep', deep_paths),
+])
+
+
+class Dataset(object):
+    """Categories of a benchmark channel, from a file or synthetic"""
+    def __init__(self, name, trie, rows, source):
+        self.name = name
+        self.trie = trie
+        self.rows = rows
+        self.source = source
+
+    @classmethod
+    def from_file(cls, file, separator=';'):
+        with Timer() as timer:
+            trie, rows = read_tree(file, separator)
+        name = os.path.splitext(os.path.basename(file))[0]
+        dataset = cls(name, trie, rows, file)
+        dataset.parse_time = timer.elapsed
+        return dataset
+
+    @classmethod
+    def synthetic(cls, shape, size):
+        with Timer() as timer:
+            trie = CategoryTrie.from_paths(SHAPES[shape](size))
+        dataset = cls('{}-{}'.format(shape, size), trie, size, shape)
+        dataset.parse_time = timer.elapsed
+        return dataset
+
+
+class Benchmark(object):
+    """
+    Time the import of the categories of a dataset and the API
+    requests reading them. Every case is run repeat times, after a
+    warm up run for the requests, and the queries of its last run are
+    counted. Everything is rolled back once the dataset is measured,
+    so the database is left as it was.
+    """
+    def __init__(self, repeat=5, row_by_row=False, backends=False):
+        self.repeat = repeat
+        self.row_by_row = row_by_row
+        self.backends = backends
+
+    def measure(self, func, repeat=None, setup=None):
+        """Run func repeat times, returns the time and queries of the runs"""
+        times = []
+        for _ in range(repeat or self.repeat):
+            if setup is not None:
+                setup()
+            with Timer() as timer, QueryCounter() as queries:
+                func()
+            times.append(timer.elapsed * 1000)
+        return OrderedDict([
+            ('min', round(min(times), 3)),
+            ('median', round(statistics.median(times), 3)),
+            ('max', round(max(times), 3)),
+            ('queries', queries.count),
+        ])
+
+    def run(self, dataset):
+        """Measure a dataset, returns its results"""
+        results = OrderedDict([
+            ('name', dataset.name),
+            ('source', dataset.source),
+            ('rows', dataset.rows),
+            ('categories', len(dataset.trie)),
+        ])
+        cases = OrderedDict()
+        cases['parse'] = OrderedDict([('min', round(dataset.parse_time * 1000, 3))])
+        with transaction.atomic():
+            channel = Channel.objects.create(name='benchmark_{}'.format(dataset.name))
+            cases.update(self.run_import(channel, dataset))
+            cases.update(self.run_requests(channel))
+            cases.update(self.run_serialization(channel))
+            transaction.set_rollback(True)
+        if self.backends:
+            cases.update(self.run_backends(dataset))
+        results['cases'] = cases
+        return results
+
+    def run_import(self, channel, dataset):
+        cases = OrderedDict()
+
+        def clear():
+            clear_categories(channel)
+
+        if self.row_by_row:
+            paths = list(dataset.trie.leaf_paths())
+            cases['import.row_by_row'] = self.measure(
+                lambda: [channel.add_category(path) for path in paths],
+                repeat=1, setup=clear
+            )
+        cases['import.bulk'] = self.measure(
+            lambda: bulk_add_tree(channel, dataset.trie), setup=clear
+        )
+        return cases
+
+    def run_requests(self, channel):
+        channel.refresh_from_db()
+        categories = Category.objects.filter(tree_id=channel.tree_id)
+        deepest = categories.order_by('-level', 'lft').first()
+        count = categories.count()
+        client = APIClient()
+
+        def get(url):
+            def request():
+                response = client.get(url)
+                assert response.status_code == 200, response.status_code
+            return request
+
+        def list_url(**params):
+            params['channel'] = channel.name
+            return '{}?{}'.format(reverse('category-list'), urlencode(params))
+
+        requests = OrderedDict([
+            ('channel.detail', reverse('channel-detail', args=[channel.name])),
+            ('channel.subcategories',
+             reverse('channel-subcategories', args=[channel.name])),
+            ('category.detail', reverse('category-detail', args=[deepest.pk])),
+            ('category.list.first', list_url()),
+            ('category.list.offset', list_url(offset=count // 2)),
+            ('category.list.cursor', list_url(cursor='')),
+            ('category.search', list_url(search=deepest.name)),
+        ])
+        cases = OrderedDict()
+        # the response cache would only measure cache hits
+        with override_settings(ALLOWED_HOSTS=['testserver'], API_CACHE_ALIAS=None):
+            for name, url in requests.items():
+                request = get(url)
+                request()
+                cases[name] = self.measure(request)
+        return cases
+
+    def run_serialization(self, channel):
+        """
+        Compare the serialization of the lists from model instances and
+        from .values() rows, in serialized objects per second
+        """
+        count = Category.objects.filter(tree_id=channel.tree_id).count()
+        page = min(count, 1000)
+        requests = OrderedDict([
+            ('category.list', ('{}?{}'.format(reverse('category-list'), urlencode(
+                {'channel': channel.name, 'limit': page})), page)),
+            ('channel.detail', (reverse('channel-detail', args=[channel.name]), count)),
+        ])
+        client = APIClient()
+        cases = OrderedDict()
+        for mode, fast in (('models', False), ('values', True)):
+            with override_settings(ALLOWED_HOSTS=['testserver'], API_CACHE_ALIAS=None,
+                                   API_FAST_SERIALIZATION=fast):
+                for name, (url, objects) in requests.items():
+                    def request():
+                        response = client.get(url)
+                        assert response.status_code == 200, response.status_code
+                    request()
+                    result = self.measure(request)
+                    result['objects_per_second'] = round(objects / result['median'] * 1000)
+                    cases['serialize.{}.{}'.format(name, mode)] = result
+        return cases
+
+    def run_backends(self, dataset):
+        """
+        Compare the tree backends on the same dataset: bulk load,
+        inserts of single categories, and reads of the subcategories,
+        their count and the ancestors of the deepest category
+        """
+        cases = OrderedDict()
+        for name, backend in TREE_BACKENDS.items():
+            with transaction.atomic():
+                channel = backend.channel_class.objects.create(
+                    name='benchmark_{}'.format(name)
+                )
+                prefix = 'backend.{}.'.format(name)
+                cases[prefix + 'load'] = self.measure(
+                    lambda: backend.bulk_add_tree(channel, dataset.trie), repeat=1
+                )
+                # nested sets are renumbered by the load and the inserts
+                channel.refresh_from_db()
+                top_name = next(iter(dataset.trie.children.values())).name
+                deepest_path = max(dataset.trie.leaf_paths(), key=len)
+                inserted = iter(range(self.repeat))
+                cases[prefix + 'insert'] = self.measure(
+                    lambda: channel.add_category([top_name, 'Inserted {}'.format(next(inserted))])
+                )
+                top = backend.category_class.objects.get(
+                    path=join_path(channel.path, top_name)
+                )
+                deepest = backend.category_class.objects.get(
+                    path=functools.reduce(join_path, deepest_path, channel.path)
+                )
+                cases[prefix + 'descendants'] = self.measure(lambda: list(top.subcategories))
+                cases[prefix + 'count'] = self.measure(lambda: top.subcategories_count)
+                cases[prefix + 'ancestors'] = self.measure(
+                    lambda: list(deepest.get_ancestors())
+                )
+                transaction.set_rollback(True)
+        return cases
+
+
+def environment():
+    """Versions and database the benchmark ran with"""
+    return OrderedDict([
+        ('python', platform.python_version()),
+        ('django', django.get_version()),
+        ('database', connection.vendor),
+    ])
@@ -0,0 +1,82 @@
+import csv
+import json
+from collections import OrderedDict, namedtuple
+from channels.models import Node
+
+
+ExportedCategory = namedtuple('ExportedCategory',
+                              ['channel', 'names', 'id', 'parent', 'path', 'level'])
+
+
+def export_categories(tree_id=None):
+    """
+    Iterate over the categories of a channel, or of all channels,
+    in tree order. The nodes are read with a server side cursor
+    where the database supports it, so memory use is constant.
+    tree_id: optional tree id of the channel to export
+    yields: ExportedCategory, names is the path from the channel
+    """
+    nodes = Node.objects.order_by('tree_id', 'lft')
+    if tree_id is not None:
+        nodes = nodes.filter(tree_id=tree_id)
+    nodes = nodes.values_list('level', 'id', 'parent_id', 'name', 'path').iterator()
+
+    # names of the last node read in each level, the channel first
+    names = []
+    for level, pk, parent_id, name, path in nodes:
+        del names[level:]
+        names.append(name)
+        if level > 0:
+            yield ExportedCategory(channel=names[0],
+                                   names=names[1:],
+                                   id=pk,
+                                   parent=parent_id,
+                                   path=path,
+                                   level=level)
+
+
+class Echo(object):
+    """File like object returning what is written, for csv.writer"""
+    def write(self, value):
+        return value
+
+
+def csv_lines(categories, separator=';'):
+    """
+    Lines of the categories in the format read by importcategories,
+    the names in the path of each category separated by separator.
+    As CategoryReader does, a single character separator is written as
+    csv, quoting the names that contain it, and a longer one is joined,
+    it cannot be in the names.
+    raises: ValueError if a name contains a separator of many characters
+    """
+    if len(separator) == 1:
+        writer = csv.writer(Echo(), delimiter=separator, lineterminator='\n')
+        for category in categories:
+            yield writer.writerow(category.names)
+        return
+    for category in categories:
+        if any(separator in name for name in category.names):
+            raise ValueError('The path {} contains the separator {}.'.format(
+                category.path, separator
+            ))
+        yield separator.join(category.names) + '\n'
+
+
+def jsonl_lines(categories):
+    """Lines of the categories as JSON objects"""
+    for category in categories:
+        yield json.dumps(OrderedDict([
+            ('id', category.id),
+            ('channel', category.channel),
+            ('name', category.names[-1]),
+            ('path', category.path),
+            ('parent', category.parent),
+            ('level', category.level),
+        ])) + '\n'
+
+
+EXPORT_FORMATS = OrderedDict([
+    ('csv', (csv_lines, 'text/csv')),
+    ('jsonl', (jsonl_lines, 'application/x-ndjson')),
+])
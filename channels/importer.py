@@ -0,0 +1,287 @@
+from collections import namedtuple
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Case, Value, When
+from channels.models import Category, Node
+from channels.reader import CategoryReader
+from channels.signals import tree_changed
+from channels.utils import join_path
+
+
+class CategoryTrie(object):
+    """
+    In memory tree of category names, built from category paths.
+    Shared path segments are stored only once.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.children = {}
+
+    def __len__(self):
+        """Number of categories in the tree, excluding the root"""
+        count = 0
+        stack = list(self.children.values())
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children.values())
+        return count
+
+    def insert(self, path):
+        """
+        Insert a category in the tree
+        path: list containing the path to the category
+        """
+        node = self
+        for name in path:
+            name = name.strip()
+            if not name:
+                raise ValidationError(
+                    {'name': 'Category name cannot be empty.'}
+                )
+            child = node.children.get(name)
+            if child is None:
+                child = node.children[name] = CategoryTrie(name)
+            node = child
+
+    @classmethod
+    def from_paths(cls, paths):
+        """Build a tree from an iterable of category paths"""
+        trie = cls()
+        for path in paths:
+            trie.insert(path)
+        return trie
+
+    def build_nodes(self, channel, existing=None):
+        """
+        Create the nodes of the categories in this tree,
+        with the MPTT fields computed in a single preorder traversal.
+        Children are sorted by name, like MPTT order_insertion_by.
+        channel: the saved channel that will contain the categories
+        existing: optional dict of the channel's stored nodes keyed by
+        (parent id, name), matching nodes are reused and popped from it
+        returns: list of nodes in preorder and the right value for the channel
+        """
+        if existing is None:
+            existing = {}
+        new_id = Node._meta.pk.create_uuid
+        nodes = []
+        counter = channel.lft
+        # each stack entry is (trie, django node, children left to visit)
+        stack = [(self, channel, self.sorted_children())]
+        while stack:
+            trie, parent, children = stack[-1]
+            if children:
+                child = children.pop()
+                counter += 1
+                node = existing.pop((parent.pk, child.name), None)
+                if node is None:
+                    node = Node(id=new_id(),
+                                name=child.name,
+                                parent_id=parent.pk,
+                                tree_id=channel.tree_id)
+                node.path = join_path(parent.path, child.name)
+                node.level = parent.level + 1
+                node.lft = counter
+                nodes.append(node)
+                stack.append((child, node, child.sorted_children()))
+            else:
+                counter += 1
+                parent.rght = counter
+                stack.pop()
+        return nodes, channel.rght
+
+    def leaf_paths(self):
+        """Iterate over the paths of the categories without subcategories"""
+        stack = [([], self)]
+        while stack:
+            path, node = stack.pop()
+            if not node.children and path:
+                yield path
+            for child in node.children.values():
+                stack.append((path + [child.name], child))
+
+    def sorted_children(self):
+        """Children sorted by name in reverse, to be consumed by pop()"""
+        return sorted(self.children.values(),
+                      key=lambda c: c.name,
+                      reverse=True)
+
+
+def read_tree(file, separator=';'):
+    """
+    Read a category file into a CategoryTrie
+    returns: the tree and the number of rows read
+    """
+    with open(file, 'r', encoding='utf-8', newline='') as f:
+        reader = CategoryReader(f, separator)
+        return CategoryTrie.from_paths(reader), reader.rows
+
+
+SyncResult = namedtuple('SyncResult', ['added', 'removed', 'kept'])
+
+
+def batch_size_for(fields, objs, batch_size):
+    """Limit the batch size to what the database backend accepts"""
+    ops = connections[router.db_for_write(Node)].ops
+    return max(min(batch_size, ops.bulk_batch_size(fields, objs)), 1)
+
+
+def bulk_update_nodes(nodes, fields, batch_size=1000):
+    """
+    Update the given fields of many nodes, with one
+    UPDATE ... SET field = CASE pk WHEN ... query per batch.
+    """
+    # each node uses two parameters per field plus its pk
+    batch_size = batch_size_for(['pk'] + fields * 2, nodes, batch_size)
+    for i in range(0, len(nodes), batch_size):
+        batch = nodes[i:i + batch_size]
+        values = {
+            field: Case(*[When(pk=node.pk, then=Value(getattr(node, field)))
+                          for node in batch],
+                        output_field=Node._meta.get_field(field))
+            for field in fields
+        }
+        Node.objects.filter(pk__in=[node.pk for node in batch]).update(**values)
+
+
+def clear_categories(channel):
+    """
+    Remove all categories of a channel, the channel itself
+    is kept so its id and tree id do not change.
+    """
+    with transaction.atomic():
+        Node.objects.filter(tree_id=channel.tree_id, level__gt=0).delete()
+        Node.objects.filter(pk=channel.pk).update(rght=channel.lft + 1)
+        tree_changed.send(sender=Node, tree_id=channel.tree_id)
+    channel.rght = channel.lft + 1
+
+
+def check_new_nodes(nodes, existing_paths):
+    """
+    Validate new categories at once, with the field rules and the clean
+    of full_clean, and their uniqueness against the paths instead of
+    querying the database for each category as validate_unique does
+    nodes: new categories, their parents are unique by construction
+    existing_paths: set of the paths already stored in the tree
+    """
+    # the parents may not be saved yet, the MPTT fields are set by the rebuild
+    exclude = ['parent', 'tree_id', 'lft', 'rght', 'level']
+    paths = set(existing_paths)
+    for node in nodes:
+        node.clean_fields(exclude=exclude)
+        node.clean()
+        if node.path in paths:
+            raise ValidationError({'path': 'Category with the path {} '
+                                           'already exists.'.format(node.path)})
+        paths.add(node.path)
+
+
+def add_categories(channel, paths):
+    """
+    Add many categories to a channel that may already have categories,
+    the existing ones are kept. The new categories are checked in one
+    batch and saved without per node validation, and without MPTT
+    updates, the tree is rebuilt once at the end.
+    channel: saved channel
+    paths: iterable of lists containing the path to a category
+    returns: number of categories added
+    """
+    trie = CategoryTrie.from_paths(paths)
+    with transaction.atomic():
+        stored = Node.objects.filter(tree_id=channel.tree_id)
+        existing = {(node.parent_id, node.name): node for node in stored}
+        existing_paths = {node.path for node in existing.values()}
+
+        # new nodes in preorder, so parents are saved before their children
+        new_id = Node._meta.pk.create_uuid
+        nodes = []
+        stack = [(channel, trie)]
+        while stack:
+            parent, parent_trie = stack.pop()
+            for child in parent_trie.children.values():
+                node = existing.get((parent.pk, child.name))
+                if node is None:
+                    node = Category(id=new_id(), name=child.name, parent=parent,
+                                    path=join_path(parent.path, child.name))
+                    nodes.append(node)
+                stack.append((node, child))
+        check_new_nodes(nodes, existing_paths)
+
+        with Node.objects.disable_mptt_updates():
+            for node in nodes:
+                node.save(validate=False, notify=False)
+        Node.objects.partial_rebuild(channel.tree_id)
+        tree_changed.send(sender=Node, tree_id=channel.tree_id)
+    channel.refresh_from_db()
+    return len(nodes)
+
+
+def bulk_add_categories(channel, paths, batch_size=1000):
+    """
+    Add all categories to an empty channel
+    with a few bulk inserts in a single transaction.
+    channel: saved channel without categories
+    paths: iterable of lists containing the path to a category
+    returns: number of categories inserted
+    """
+    return bulk_add_tree(channel, CategoryTrie.from_paths(paths), batch_size)
+
+
+def bulk_add_tree(channel, trie, batch_size=1000):
+    """
+    Add all categories of a CategoryTrie to an empty channel
+    returns: number of categories inserted
+    """
+    with transaction.atomic():
+        nodes, rght = trie.build_nodes(channel)
+        batch_size = batch_size_for(Node._meta.concrete_fields, nodes, batch_size)
+        Node.objects.bulk_create(nodes, batch_size=batch_size)
+        Node.objects.filter(pk=channel.pk).update(rght=rght)
+        tree_changed.send(sender=Node, tree_id=channel.tree_id)
+    return len(nodes)
+
+
+def sync_categories(channel, paths, batch_size=1000):
+    """
+    Make the categories of a channel match the given paths.
+    Only new categories are inserted and only vanished ones are deleted,
+    the categories that are kept preserve their ids, and are updated
+    only if their position in the tree changed.
+    channel: saved channel, with or without categories
+    paths: iterable of lists containing the path to a category
+    returns: SyncResult with the number of categories added, removed and kept
+    """
+    return sync_tree(channel, CategoryTrie.from_paths(paths), batch_size)
+
+
+def sync_tree(channel, trie, batch_size=1000):
+    """
+    Make the categories of a channel match a CategoryTrie
+    returns: SyncResult with the number of categories added, removed and kept
+    """
+    tree_fields = ['lft', 'rght', 'level', 'path']
+    with transaction.atomic():
+        stored = Node.objects.filter(tree_id=channel.tree_id, level__gt=0)
+        existing = {(node.parent_id, node.name): node for node in stored}
+        before = {node.pk: [getattr(node, f) for f in tree_fields]
+                  for node in existing.values()}
+
+        nodes, rght = trie.build_nodes(channel, existing)
+        # nodes left in existing were not found in the paths
+        removed = [node.pk for node in existing.values()]
+        added = [node for node in nodes if node.pk not in before]
+        changed = [node for node in nodes if node.pk in before and
+                   before[node.pk] != [getattr(node, f) for f in tree_fields]]
+
+        delete_size = batch_size_for(['pk'], removed, batch_size)
+        for i in range(0, len(removed), delete_size):
+            Node.objects.filter(pk__in=removed[i:i + delete_size]).delete()
+        bulk_update_nodes(changed, tree_fields, batch_size)
+        insert_size = batch_size_for(Node._meta.concrete_fields, added, batch_size)
+        Node.objects.bulk_create(added, batch_size=insert_size)
+        Node.objects.filter(pk=channel.pk).update(rght=rght)
+        tree_changed.send(sender=Node, tree_id=channel.tree_id)
+    return SyncResult(added=len(added),
+                      removed=len(removed),
+                      kept=len(nodes) - len(added))
@@ -0,0 +1,157 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from channels.importer import CategoryTrie, bulk_add_tree, clear_categories, sync_tree
+from channels.models import Channel, ImportJob
+from channels.reader import CategoryReader
+
+
+logger = logging.getLogger(__name__)
+
+# SQLite allows one writer at a time, the files are parsed in
+# parallel but the jobs of this process write one after the other
+_sqlite_write_lock = threading.Lock()
+
+
+@contextmanager
+def write_lock(blocking=True):
+    """
+    Serialize the writes of the jobs, and of the requests creating
+    them, on databases with a single writer
+    yields: whether the lock was taken, always true on other databases
+    """
+    if connection.vendor != 'sqlite':
+        yield True
+        return
+    locked = _sqlite_write_lock.acquire(blocking)
+    try:
+        yield locked
+    finally:
+        if locked:
+            _sqlite_write_lock.release()
+
+
+def create_import_job(channel_name, upload, separator=';', sync=False):
+    """
+    Save an uploaded file of categories, and create the job
+    importing it into the channel, created if it does not exist
+    upload: file object or UploadedFile, read in binary chunks
+    returns: the queued job, not submitted yet
+    """
+    fd, file = tempfile.mkstemp(suffix='.csv', prefix='import-',
+                                dir=settings.IMPORT_UPLOAD_DIR)
+    with os.fdopen(fd, 'wb') as f:
+        chunks = upload.chunks() if hasattr(upload, 'chunks') else iter(
+            lambda: upload.read(64 * 1024), b''
+        )
+        for chunk in chunks:
+            f.write(chunk)
+    with write_lock():
+        channel = Channel.objects.filter(name__iexact=channel_name).first()
+        if channel is None:
+            channel = Channel.objects.create(name=channel_name)
+        return ImportJob.objects.create(channel=channel, file=file,
+                                        separator=separator, sync=sync)
+
+
+def read_job_tree(job, file, progress_rows=10000):
+    """
+    Parse the file of a job into a CategoryTrie, saving
+    the number of rows read every progress_rows rows, unless
+    another job is writing to a single writer database
+    returns: the tree and the number of rows read
+    """
+    trie = CategoryTrie()
+    reader = CategoryReader(file, job.separator)
+    for path in reader:
+        trie.insert(path)
+        if reader.rows % progress_rows == 0:
+            with write_lock(blocking=False) as locked:
+                if locked:
+                    ImportJob.objects.filter(pk=job.pk).update(rows=reader.rows)
+    return trie, reader.rows
+
+
+def run_import(pk):
+    """
+    Run an import job: parse its file, replace or sync the categories
+    of its channel in one transaction, and save the outcome in the job.
+    The uploaded file is removed once the job ran.
+    """
+    job = ImportJob.objects.get(pk=pk)
+    job.status, job.started_at = ImportJob.RUNNING, timezone.now()
+    with write_lock():
+        job.save(update_fields=['status', 'started_at'])
+    try:
+        with open(job.file, 'r', encoding='utf-8', newline='') as f:
+            trie, job.rows = read_job_tree(job, f, settings.IMPORT_PROGRESS_ROWS)
+        with write_lock(), transaction.atomic():
+            channel = Channel.objects.select_for_update().get(pk=job.channel_id)
+            if job.sync:
+                result = sync_tree(channel, trie)
+                job.categories = result.added + result.kept
+            else:
+                clear_categories(channel)
+                job.categories = bulk_add_tree(channel, trie)
+        job.status = ImportJob.DONE
+    except ValidationError as e:
+        job.status, job.error = ImportJob.FAILED, '; '.join(e.messages)
+    except Exception as e:
+        logger.exception('Import job %s failed', pk)
+        job.status, job.error = ImportJob.FAILED, str(e) or e.__class__.__name__
+    finally:
+        job.finished_at = timezone.now()
+        with write_lock():
+            job.save(update_fields=['status', 'rows', 'categories', 'error',
+                                    'finished_at'])
+        try:
+            os.remove(job.file)
+        except OSError:
+            pass
+    return job
+
+
+def run_import_in_thread(pk):
+    """Run an import job in a worker thread, closing its connections after"""
+    try:
+        return run_import(pk)
+    finally:
+        connections.close_all()
+
+
+class ImportQueue(object):
+    """
+    Pool of settings.IMPORT_WORKERS threads running the import jobs of
+    this process, so uploads return at once and at most that many
+    imports run at the same time. With 0 workers the jobs run when
+    they are submitted, as in the tests. The queue is not persisted,
+    the jobs queued by a process that stops are left queued.
+    """
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(settings.IMPORT_WORKERS)
+            return self._executor
+
+    def submit(self, job):
+        """Run the job in the pool, once the transaction that created it commits"""
+        if not settings.IMPORT_WORKERS:
+            run_import(job.pk)
+            return
+        executor = self.executor
+        transaction.on_commit(lambda: executor.submit(run_import_in_thread, job.pk))
+
+
+import_queue = ImportQueue()
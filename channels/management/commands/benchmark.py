@@ -0,0 +1,110 @@
+import glob
+import json
+from collections import OrderedDict
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from channels.benchmark import SHAPES, Benchmark, Dataset, environment
+
+
+class Command(BaseCommand):
+    help = ('Time the import of categories and the API requests reading them, '
+            'for category files and synthetic trees, and write the results as JSON.')
+
+    def add_arguments(self, parser):
+        """Add the arguments this command accepts"""
+        parser.add_argument('files',
+                            nargs='*',
+                            help='Category files or glob patterns, '
+                                 'default is test_data/*.csv.',
+                            type=str)
+
+        parser.add_argument('--synthetic',
+                            dest='sizes',
+                            action='append',
+                            default=[],
+                            help='Number of categories of the synthetic trees, '
+                                 'can be given many times.',
+                            type=int)
+
+        parser.add_argument('--shape',
+                            dest='shapes',
+                            action='append',
+                            choices=list(SHAPES),
+                            help='Shape of the synthetic trees, default is all shapes.',
+                            type=str)
+
+        parser.add_argument('--repeat',
+                            dest='repeat',
+                            default=5,
+                            help='Times each case is run, default is 5.',
+                            type=int)
+
+        parser.add_argument('--row-by-row',
+                            action='store_true',
+                            dest='row_by_row',
+                            default=False,
+                            help='Also time the import with add_category, '
+                                 'one query per category, slow on big trees.')
+
+        parser.add_argument('--backends',
+                            action='store_true',
+                            dest='backends',
+                            default=False,
+                            help='Also compare the tree backends: load, insert, '
+                                 'descendants, count and ancestors.')
+
+        parser.add_argument('--sep',
+                            dest='separator',
+                            default=';',
+                            help='Separator used in the input files default is (;).',
+                            type=str)
+
+        parser.add_argument('--output',
+                            dest='output',
+                            default=None,
+                            help='JSON results file, standard output if not given.',
+                            type=str)
+
+    def datasets(self, options):
+        """Iterate over the datasets, loaded one at a time"""
+        patterns = options['files']
+        if not patterns and not options['sizes']:
+            patterns = ['test_data/*.csv']
+        for pattern in patterns:
+            files = sorted(glob.glob(pattern))
+            if not files:
+                raise CommandError('No files match {}.'.format(pattern))
+            for file in files:
+                yield Dataset.from_file(file, options['separator'])
+        for size in options['sizes']:
+            for shape in options['shapes'] or SHAPES:
+                yield Dataset.synthetic(shape, size)
+
+    def handle(self, *args, **options):
+        """Do the commands work"""
+        benchmark = Benchmark(options['repeat'], options['row_by_row'],
+                              options['backends'])
+        runs = []
+        for dataset in self.datasets(options):
+            result = benchmark.run(dataset)
+            runs.append(result)
+            self.stderr.write('{}: {} categories, bulk import {:.0f}ms'.format(
+                result['name'], result['categories'],
+                result['cases']['import.bulk']['median']
+            ))
+
+        results = OrderedDict([
+            ('date', timezone.now().isoformat()),
+            ('environment', environment()),
+            ('repeat', options['repeat']),
+            ('datasets', runs),
+        ])
+        output = json.dumps(results, indent=2)
+        if options['output'] is None:
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(
+                'Results written to {}.'.format(options['output'])
+            ))
@@ -0,0 +1,115 @@
+import csv
+import os
+from functools import partial
+from django.core.management.base import BaseCommand
+from channels.models import Channel
+from channels.exporter import EXPORT_FORMATS, export_categories
+
+
+class Command(BaseCommand):
+    help = 'Export the categories of a channel, or of all channels.'
+
+    def add_arguments(self, parser):
+        """Add the arguments this command accepts"""
+        parser.add_argument('channel',
+                            nargs='?',
+                            default=None,
+                            type=str,
+                            help='Name for the channel, all channels if not given.')
+
+        parser.add_argument('--output',
+                            dest='output',
+                            default=None,
+                            help='Output file, or directory when exporting all '
+                                 'channels as csv, with a manifest.txt to load it '
+                                 'back with importchannels. Standard output if not given.',
+                            type=str)
+
+        parser.add_argument('--type',
+                            dest='type',
+                            default='csv',
+                            choices=list(EXPORT_FORMATS),
+                            help='Output type, csv lines in the format read by '
+                                 'importcategories or json lines, default is csv.',
+                            type=str)
+
+        parser.add_argument('--sep',
+                            dest='separator',
+                            default=';',
+                            help='Separator used in the csv output default is (;).',
+                            type=str)
+
+    def handle(self, *args, **options):
+        """Do the commands work"""
+        try:
+            count = self.export_channels(options)
+        except ValueError as e:
+            self.stderr.write(self.style.ERROR(str(e)))
+            return
+        if count is None:
+            return
+
+        ok_str = 'Exported {} categories.'
+        # keep standard output clean when the export is written there
+        out = self.stdout if options['output'] is not None else self.stderr
+        out.write(self.style.SUCCESS(ok_str.format(count)))
+
+    def export_channels(self, options):
+        """
+        Export the channel given, or all channels
+        returns: number of categories written, None if nothing was exported
+        """
+        if options['channel'] is not None:
+            try:
+                channel = Channel.objects.get(name__iexact=options['channel'])
+            except Channel.DoesNotExist:
+                self.stderr.write(self.style.ERROR(
+                    'Channel {} not found.'.format(options['channel'])
+                ))
+                return None
+            return self.export(export_categories(channel.tree_id),
+                               options['output'], options)
+        if options['type'] != 'csv':
+            return self.export(export_categories(), options['output'], options)
+
+        # one file per channel, named by its id since a name may not be
+        # a safe file name, and a manifest with the name of each file,
+        # so the directory can be loaded back with importchannels
+        if options['output'] is None or not os.path.isdir(options['output']):
+            self.stderr.write(self.style.ERROR(
+                'Exporting all channels as csv needs an output directory.'
+            ))
+            return None
+        count = 0
+        manifest = os.path.join(options['output'], 'manifest.txt')
+        with open(manifest, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';', lineterminator='\n')
+            for channel in Channel.objects.order_by('tree_id'):
+                file = os.path.join(options['output'], '{}.csv'.format(channel.pk))
+                count += self.export(export_categories(channel.tree_id), file, options)
+                writer.writerow([channel.name, file])
+        return count
+
+    def export(self, categories, file, options):
+        """
+        Write the categories to a file, or standard output if file is None
+        returns: number of categories written
+        """
+        lines, _ = EXPORT_FORMATS[options['type']]
+        if options['type'] == 'csv':
+            lines = lines(categories, options['separator'])
+        else:
+            lines = lines(categories)
+
+        if file is None:
+            return self.write_lines(lines, partial(self.stdout.write, ending=''))
+        with open(file, 'w', encoding='utf-8', newline='') as output:
+            return self.write_lines(lines, output.write)
+
+    def write_lines(self, lines, write):
+        """returns: number of lines written"""
+        count = 0
+        for line in lines:
+            write(line)
+            count += 1
+        return count
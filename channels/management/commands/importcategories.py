@@ -1,5 +1,9 @@
 from django.core.management.base import BaseCommand
-from channels.models import Channel
+from django.db import transaction
+from channels.models import Channel, bump_tree_versions_once
+from channels.importer import add_categories, bulk_add_categories, sync_categories
+from channels.reader import CategoryReader
+from channels.utils import QueryCounter, Timer
 
 
 class Command(BaseCommand):
@@ -21,10 +25,30 @@ class Command(BaseCommand):
                             help='Separator used in the input file default is (,).',
                             type=str)
 
+        parser.add_argument('--bulk',
+                            action='store_true',
+                            dest='bulk',
+                            default=False,
+                            help='Build the tree in memory and insert it with bulk inserts.')
+
+        parser.add_argument('--batch',
+                            action='store_true',
+                            dest='batch',
+                            default=False,
+                            help='Build the tree in memory, validate it in one batch and '
+                                 'rebuild the MPTT fields once, keeping the existing categories.')
+
+        parser.add_argument('--sync',
+                            action='store_true',
+                            dest='sync',
+                            default=False,
+                            help='Only insert new and delete vanished categories, '
+                                 'keeping the existing ones.')
+
     def handle(self, *args, **options):
         """Do the commands work"""
         try:
-            categories = self.parse_file(options['file'], options['separator'])
+            file = open(options['file'], 'r', encoding='utf-8', newline='')
         except FileNotFoundError:
             error_msg = self.style.ERROR(
                 'File {} not found.'.format(options['file'])
@@ -32,29 +56,45 @@ class Command(BaseCommand):
             self.stderr.write(error_msg)
             return
 
-        # get channel or insert new if it doesnt exist
-        # and remove all current categories
-        channel, _ = Channel.objects.get_or_create(name=options['channel'])
-        channel.delete()
-        channel.save()
+        # categories are read from the file while they are inserted
+        try:
+            with file, Timer() as timer, QueryCounter() as queries, transaction.atomic():
+                categories = CategoryReader(file, options['separator'])
+                # get channel or insert new if it doesnt exist
+                channel, _ = Channel.objects.get_or_create(name=options['channel'])
 
-        for category in categories:
-            channel.add_category(category)
+                if options['sync']:
+                    result = sync_categories(channel, categories)
+                else:
+                    # remove all current categories
+                    channel.delete()
+                    channel.save()
+                    if options['bulk']:
+                        bulk_add_categories(channel, categories)
+                    elif options['batch']:
+                        add_categories(channel, categories)
+                    else:
+                        # one row at a time, memory stays flat
+                        with bump_tree_versions_once():
+                            for category in categories:
+                                channel.add_category(category)
+        except ValueError as e:
+            error_msg = '{}: {}'.format(options['file'], e)
+            self.stderr.write(self.style.ERROR(error_msg))
+            return
 
         ok_str = 'Channel {} updated with {} categories from file: {}'
         ok_msg = self.style.SUCCESS(ok_str.format(options['channel'],
-                                                  len(categories),
+                                                  categories.rows,
                                                   options['file']))
         self.stdout.write(ok_msg)
+        if options['sync']:
+            sync_str = '{} categories added, {} removed and {} kept.'
+            self.stdout.write(sync_str.format(*result))
+        self.write_stats(categories.rows, timer.elapsed, queries.count)
 
-    def parse_file(self, file, separator):
-        """
-        Parse a file and returns a list of lists,
-        each list is the full path to a category.
-        """
-        try:
-            data = open(file, 'r').read().splitlines()
-            categories = [d.split(separator) for d in data if d != '']
-            return [[c.strip() for c in category] for category in categories]
-        except FileNotFoundError:
-            raise
+    def write_stats(self, rows, elapsed, queries):
+        """Write the import speed and number of queries executed"""
+        rate = rows / elapsed if elapsed else 0
+        stats_str = 'Imported {} rows in {:.2f}s ({:.0f} rows/sec) with {} queries.'
+        self.stdout.write(stats_str.format(rows, elapsed, rate, queries))
@@ -0,0 +1,196 @@
+import glob
+import os
+from concurrent.futures import (ProcessPoolExecutor,
+                                ThreadPoolExecutor,
+                                as_completed)
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from channels.models import Channel
+from channels.importer import (bulk_add_tree,
+                               clear_categories,
+                               read_tree,
+                               sync_tree)
+from channels.reader import CategoryReader
+from channels.utils import Timer
+
+
+def parse_channel(name, file, separator):
+    """
+    Parse the file of a channel, runs in a worker process
+    returns: channel name, tree of categories, rows read and time spent
+    """
+    with Timer() as timer:
+        try:
+            trie, rows = read_tree(file, separator)
+        except ValueError as e:
+            raise ValueError('{}: {}'.format(file, e))
+    return name, trie, rows, timer.elapsed
+
+
+def write_channel(pk, trie, sync):
+    """
+    Write the categories of a channel in a single transaction
+    returns: time spent
+    """
+    with Timer() as timer, transaction.atomic():
+        channel = Channel.objects.select_for_update().get(pk=pk)
+        if sync:
+            sync_tree(channel, trie)
+        else:
+            clear_categories(channel)
+            bulk_add_tree(channel, trie)
+    return timer.elapsed
+
+
+def write_channel_in_thread(pk, trie, sync):
+    """Write a channel in a worker thread, closing its connections after"""
+    try:
+        return write_channel(pk, trie, sync)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Add categories to many channels in parallel, one file per channel.'
+
+    def add_arguments(self, parser):
+        """Add the arguments this command accepts"""
+        parser.add_argument('files',
+                            nargs='*',
+                            type=str,
+                            help='Files or glob patterns, the channel name '
+                                 'is the file name without extension.')
+
+        parser.add_argument('--manifest',
+                            dest='manifest',
+                            default=None,
+                            help='File with one channel;file pair per line.',
+                            type=str)
+
+        parser.add_argument('--sep',
+                            dest='separator',
+                            default=';',
+                            help='Separator used in the input files default is (;).',
+                            type=str)
+
+        parser.add_argument('--sync',
+                            action='store_true',
+                            dest='sync',
+                            default=False,
+                            help='Only insert new and delete vanished categories, '
+                                 'keeping the existing ones.')
+
+        parser.add_argument('--workers',
+                            dest='workers',
+                            default=os.cpu_count(),
+                            help='Number of channels parsed and written at the same '
+                                 'time, on SQLite channels are written one at a time.',
+                            type=int)
+
+    def handle(self, *args, **options):
+        """Do the commands work"""
+        try:
+            sources = self.get_sources(options['files'], options['manifest'])
+        except ValueError as e:
+            self.stderr.write(self.style.ERROR(str(e)))
+            return
+
+        # channels are created one at a time, since creating a channel
+        # shifts the tree ids of the channels ordered after it
+        pks = {}
+        for name, _ in sources:
+            channel, _ = Channel.objects.get_or_create(name=name)
+            pks[name] = channel.pk
+
+        total_rows = 0
+        with Timer() as timer:
+            if options['workers'] > 1:
+                results = self.import_parallel(sources, pks, options)
+            else:
+                results = self.import_sequential(sources, pks, options)
+            try:
+                for name, rows, parse_time, write_time in results:
+                    channel_str = 'Channel {} updated with {} categories, ' \
+                                  'parsed in {:.2f}s and written in {:.2f}s.'
+                    self.stdout.write(channel_str.format(name, rows,
+                                                         parse_time, write_time))
+                    total_rows += rows
+            except ValueError as e:
+                self.stderr.write(self.style.ERROR(str(e)))
+                return
+
+        rate = total_rows / timer.elapsed if timer.elapsed else 0
+        ok_str = 'Imported {} channels with {} categories in {:.2f}s ({:.0f} rows/sec).'
+        self.stdout.write(self.style.SUCCESS(
+            ok_str.format(len(sources), total_rows, timer.elapsed, rate)
+        ))
+
+    def get_sources(self, files, manifest):
+        """
+        Get the channel names and files to import,
+        from the files and glob patterns and the manifest
+        returns: list of (channel name, file)
+        """
+        sources = []
+        for pattern in files:
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise ValueError('File {} not found.'.format(pattern))
+            for file in matches:
+                name = os.path.splitext(os.path.basename(file))[0]
+                sources.append((name, file))
+
+        if manifest is not None:
+            if not os.path.isfile(manifest):
+                raise ValueError('File {} not found.'.format(manifest))
+            with open(manifest, 'r', encoding='utf-8', newline='') as f:
+                for row in CategoryReader(f, ';'):
+                    if len(row) != 2:
+                        raise ValueError(
+                            'Invalid manifest line: {}'.format(';'.join(row))
+                        )
+                    sources.append(tuple(row))
+
+        if not sources:
+            raise ValueError('No channel files given.')
+
+        names = set()
+        for name, file in sources:
+            if name.lower() in names:
+                raise ValueError('Channel {} given more than once.'.format(name))
+            names.add(name.lower())
+            if not os.path.isfile(file):
+                raise ValueError('File {} not found.'.format(file))
+        return sources
+
+    def import_sequential(self, sources, pks, options):
+        """Parse and write the channels one after the other"""
+        for name, file in sources:
+            name, trie, rows, parse_time = parse_channel(name, file,
+                                                         options['separator'])
+            write_time = write_channel(pks[name], trie, options['sync'])
+            yield name, rows, parse_time, write_time
+
+    def import_parallel(self, sources, pks, options):
+        """
+        Parse the files in a process pool, each channel
+        is written by a thread as soon as its file is parsed.
+        """
+        workers = options['workers']
+        # each channel is its own tree, so writers do not touch
+        # the same rows, but SQLite only allows one writer at a time
+        write_workers = 1 if connection.vendor == 'sqlite' else workers
+        with ProcessPoolExecutor(workers) as parsers, \
+                ThreadPoolExecutor(write_workers) as writers:
+            parsing = [parsers.submit(parse_channel, name, file,
+                                      options['separator'])
+                       for name, file in sources]
+            writing = {}
+            for future in as_completed(parsing):
+                name, trie, rows, parse_time = future.result()
+                write = writers.submit(write_channel_in_thread,
+                                       pks[name], trie, options['sync'])
+                writing[write] = (name, rows, parse_time)
+            for future in as_completed(writing):
+                name, rows, parse_time = writing[future]
+                yield name, rows, parse_time, future.result()
@@ -0,0 +1,65 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from channels.models import Category, Node
+from channels.utils import normalize_path
+
+
+class Command(BaseCommand):
+    help = ('Move a category, with its subcategories, under another category '
+            'or channel, and/or rename it. The paths of the subcategories are '
+            'rewritten in the same transaction.')
+
+    def add_arguments(self, parser):
+        """Add the arguments this command accepts"""
+        parser.add_argument('path',
+                            help='Full path of the category, e.g. /walmart/Books.',
+                            type=str)
+
+        parser.add_argument('--to',
+                            dest='parent',
+                            default=None,
+                            help='Full path of the new parent, a category or a channel.',
+                            type=str)
+
+        parser.add_argument('--name',
+                            dest='name',
+                            default=None,
+                            help='New name of the category.',
+                            type=str)
+
+    def handle(self, *args, **options):
+        """Do the commands work"""
+        if options['parent'] is None and options['name'] is None:
+            self.stderr.write(self.style.ERROR('Give a new parent (--to) or name (--name).'))
+            return
+        try:
+            category = Category.objects.get(path=normalize_path(options['path']))
+        except Category.DoesNotExist:
+            self.stderr.write(self.style.ERROR(
+                'Category {} not found.'.format(options['path'])
+            ))
+            return
+        parent = None
+        if options['parent'] is not None:
+            try:
+                parent = Node.objects.get(path=normalize_path(options['parent']))
+            except Node.DoesNotExist:
+                self.stderr.write(self.style.ERROR(
+                    'Parent {} not found.'.format(options['parent'])
+                ))
+                return
+
+        old_path = category.path
+        try:
+            count = category.move(parent=parent, name=options['name'])
+        except ValidationError as e:
+            self.stderr.write(self.style.ERROR('; '.join(
+                '{}: {}'.format(field, ' '.join(errors))
+                for field, errors in e.message_dict.items()
+            )))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            'Category {} moved to {} with {} subcategories.'.format(
+                old_path, category.path, count
+            )
+        ))
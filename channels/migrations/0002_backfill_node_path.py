@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def backfill_path(apps, schema_editor):
+    """Compute the materialized path of every node, walking the trees in order"""
+    Node = apps.get_model('channels', 'Node')
+    paths = {}
+    nodes = (Node.objects
+             .order_by('tree_id', 'lft')
+             .values_list('id', 'parent_id', 'name', 'path')
+             .iterator())
+    for pk, parent_id, name, path in nodes:
+        parent_path = paths[parent_id] if parent_id else ''
+        paths[pk] = '{}/{}'.format(parent_path, name.strip())
+        if paths[pk] != path:
+            Node.objects.filter(pk=pk).update(path=paths[pk])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_path, migrations.RunPython.noop),
+    ]
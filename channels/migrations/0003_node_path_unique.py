@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-18 20:35
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0002_backfill_node_path'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='node',
+            name='path',
+            field=models.TextField(blank=True, null=True, unique=True),
+        ),
+    ]
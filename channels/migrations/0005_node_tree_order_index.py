@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-18 20:38
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0004_node_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='node',
+            index_together=set([('tree_id', 'lft')]),
+        ),
+    ]
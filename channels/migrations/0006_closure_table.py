@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    The closure table backend moved to the closuretree app, this
+    migration is kept so the databases that applied it and the new
+    ones have the same history, its tables are dropped by 0011
+    """
+
+    dependencies = [
+        ('channels', '0005_node_tree_order_index'),
+    ]
+
+    operations = []
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-18 21:52
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0007_import_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TreeVersion',
+            fields=[
+                ('key', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
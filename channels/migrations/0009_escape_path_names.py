@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def escape_name(name):
+    """
+    Escape a slash in a name with a backslash, and a backslash,
+    copied so this migration does not change with the app code
+    """
+    return name.replace('\\', '\\\\').replace('/', '\\/')
+
+
+def backfill_path(apps, schema_editor):
+    """
+    Compute the materialized path of every node again, the paths of the
+    nodes whose name has a slash were computed without escaping it
+    """
+    Node = apps.get_model('channels', 'Node')
+    paths = {}
+    nodes = (Node.objects
+             .order_by('tree_id', 'lft')
+             .values_list('id', 'parent_id', 'name', 'path')
+             .iterator())
+    for pk, parent_id, name, path in nodes:
+        parent_path = paths[parent_id] if parent_id else ''
+        paths[pk] = '{}/{}'.format(parent_path, escape_name(name.strip()))
+        if paths[pk] != path:
+            Node.objects.filter(pk=pk).update(path=paths[pk])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0008_tree_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_path, migrations.RunPython.noop),
+    ]
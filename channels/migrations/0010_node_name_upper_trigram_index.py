@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def create_upper_trigram_index(apps, schema_editor):
+    """
+    Trigram index on UPPER(name), the expression Django compiles
+    icontains to, only on Postgres
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX channels_node_name_upper_trgm '
+        'ON channels_node USING gin (UPPER(name::text) gin_trgm_ops)'
+    )
+
+
+def drop_upper_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS channels_node_name_upper_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0009_escape_path_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_upper_trigram_index, drop_upper_trigram_index),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Drop the tables of the closure table backend, left by the first 0006"""
+
+    dependencies = [
+        ('channels', '0010_node_name_upper_trigram_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(['DROP TABLE IF EXISTS channels_closurelink',
+                           'DROP TABLE IF EXISTS channels_closurenode'],
+                          migrations.RunSQL.noop),
+    ]
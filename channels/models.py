@@ -1,7 +1,15 @@
-from django.db import models
+import threading
+from contextlib import contextmanager
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Greatest, Substr
 from django.core.exceptions import ValidationError
+from django.dispatch import receiver
+from django.utils import timezone
 from mptt.models import MPTTModel, TreeForeignKey
 from django_extensions.db.fields import ShortUUIDField
+from channels.signals import tree_changed
+from channels.utils import join_path
 
 
 class CategoryManager(models.Manager):
@@ -10,6 +18,33 @@ class CategoryManager(models.Manager):
         """A category is a tree node with a parent"""
         return super(CategoryManager, self).get_queryset().exclude(parent=None)
 
+    def attach_channels(self, categories):
+        """
+        Fetch the channels of many categories with a single query,
+        so accessing their channel does not query the database again
+        categories: list of categories
+        """
+        tree_ids = {category.tree_id for category in categories}
+        channels = Channel.objects.filter(tree_id__in=tree_ids)
+        channels = {channel.tree_id: channel for channel in channels}
+        for category in categories:
+            category._channel = channels[category.tree_id]
+
+    def in_bulk_by(self, field, keys):
+        """
+        Get many categories by a unique field, like id or path,
+        with one query per batch of keys the database accepts.
+        returns: dict of the categories found, by key
+        """
+        keys = list(keys)
+        batch_size = max(connections[self.db].ops.bulk_batch_size([field], keys), 1)
+        found = {}
+        for i in range(0, len(keys), batch_size):
+            lookup = {'{}__in'.format(field): keys[i:i + batch_size]}
+            for category in self.filter(**lookup):
+                found[getattr(category, field)] = category
+        return found
+
 
 class ChannelManager(models.Manager):
     """Class for managing channels"""
@@ -21,7 +56,7 @@ class ChannelManager(models.Manager):
 class Node(MPTTModel):
     id = ShortUUIDField(primary_key=True, editable=False)
     name = models.CharField(max_length=255)
-    path = models.TextField(null=True, blank=True)
+    path = models.TextField(null=True, blank=True, unique=True)
     parent = TreeForeignKey(
         'self',
         null=True,
@@ -37,17 +72,39 @@ class Node(MPTTModel):
     class Meta:
         """
         Unique constraint to prevent duplicate
-        category in the same tree level
+        category in the same tree level, and index
+        to read the trees in order
         """
         unique_together = (('name', 'parent'),)
+        index_together = (('tree_id', 'lft'),)
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        """Override to call clean for manually created objects"""
-        self.full_clean()
+        """
+        Override to call clean for manually created objects.
+        Trusted bulk writes, checked beforehand, pass validate=False
+        and notify=False to skip the validation and the signal.
+        """
+        if kwargs.pop('validate', True):
+            self.full_clean()
+        notify = kwargs.pop('notify', True)
+        # channels are ordered by name, inserting or renaming
+        # one may change the tree ids of the others
+        shifts = self.parent_id is None and (
+            self._state.adding or self.name != self._mptt_cached_fields.get('name')
+        )
         super(Node, self).save(*args, **kwargs)
+        if notify:
+            tree_changed.send(sender=self.__class__,
+                              tree_id=None if shifts else self.tree_id)
+
+    def delete(self, *args, **kwargs):
+        """Override to notify that the tree changed"""
+        tree_id = self.tree_id
+        super(Node, self).delete(*args, **kwargs)
+        tree_changed.send(sender=self.__class__, tree_id=tree_id)
 
     @property
     def subcategories(self):
@@ -57,6 +114,37 @@ class Node(MPTTModel):
         """
         return self.get_descendants(include_self=False)
 
+    def get_subcategories(self, depth=None, limit=None):
+        """
+        Get the subcategories of this node down to a depth
+        depth: optional number of levels, 1 reads the children by parent_id
+        limit: optional maximum number of subcategories
+        returns: queryset of subcategories in tree order
+        """
+        if limit == 0:
+            return Node.objects.none()
+        if depth == 1:
+            nodes = Node.objects.filter(parent_id=self.pk).order_by('lft')
+        else:
+            nodes = self.get_descendants(include_self=False)
+            if depth is not None:
+                nodes = nodes.filter(level__lte=self.level + depth)
+        if limit is not None:
+            nodes = nodes[:limit]
+        return nodes
+
+    def get_breadcrumb(self, siblings=False):
+        """
+        Get this node and its ancestors with one range query on lft and rght
+        siblings: also get the siblings of this node and of its ancestors
+        returns: queryset of nodes in tree order, the channel first
+        """
+        nodes = Q(lft__lte=self.lft, rght__gte=self.rght)
+        if siblings:
+            # the children of the strict ancestors
+            nodes |= Q(parent__lft__lt=self.lft, parent__rght__gt=self.rght)
+        return Node.objects.filter(nodes, tree_id=self.tree_id).order_by('lft')
+
     @property
     def subcategories_count(self):
         """
@@ -66,13 +154,8 @@ class Node(MPTTModel):
         return self.get_descendant_count()
 
 
-class Category(Node):
-    objects = CategoryManager()
-
-    class Meta:
-        proxy = True
-        verbose_name_plural = 'Categories'
-
+class CategoryMixin(object):
+    """Validation of a category, shared by the tree backends"""
     def clean(self):
         """
         Strip leading and trailing empty spaces
@@ -84,22 +167,12 @@ class Category(Node):
                 {'parent': 'Parent cannot be empty.'}
             )
         self.name = self.name.strip()
-        self.path = self.parent.path + '/{}'.format(self.name)
-
-    @property
-    def channel(self):
-        """
-        Get the channel this category belongs to
-        returns: instance of channel
-        """
-        return Channel.objects.get(tree_id=self.tree_id)
+        self.path = join_path(self.parent.path, self.name)
 
 
-class Channel(Node):
-    objects = ChannelManager()
-
-    class Meta:
-        proxy = True
+class ChannelMixin(object):
+    """Validation and insertion of categories of a channel, shared by the tree backends"""
+    category_class = None
 
     def clean(self):
         """Strip trailing and leading empty spaces and validate empty parent"""
@@ -109,17 +182,100 @@ class Channel(Node):
             )
 
         self.name = self.name.strip()
-        self.path = '/{}'.format(self.name)
+        self.path = join_path('', self.name)
 
     def validate_unique(self, *args, **kwargs):
         """A channel name should be unique"""
-        super(Channel, self).validate_unique(*args, **kwargs)
+        super(ChannelMixin, self).validate_unique(*args, **kwargs)
         if not self.pk:
             if self.__class__.objects.filter(name__iexact=self.name).exists():
                 raise ValidationError(
                     {'name': 'Channel with this name already exists.'}
                 )
 
+    def add_category(self, path):
+        """
+        Add a new category to the channel
+        path: list containing the path to the category
+        returns: the category added
+        """
+        head, *tail = path
+        # a created category is saved, and validated, only once
+        with bump_tree_versions_once():
+            parent, _ = self.category_class.objects.get_or_create(name=head,
+                                                                  parent=self)
+            for element in tail:
+                parent, _ = self.category_class.objects.get_or_create(name=element,
+                                                                      parent=parent)
+        return parent
+
+
+class Category(CategoryMixin, Node):
+    objects = CategoryManager()
+
+    class Meta:
+        proxy = True
+        verbose_name_plural = 'Categories'
+
+    def move(self, parent=None, name=None):
+        """
+        Move this category under another parent and/or rename it, in one
+        transaction. MPTT moves the subtree with a few set based updates,
+        and the paths of all the subcategories are rewritten with a
+        single update, so the number of queries does not depend on the
+        size of the subtree.
+        parent: optional new parent, channel or category
+        name: optional new name
+        returns: number of subcategories whose path was rewritten
+        """
+        with transaction.atomic():
+            # lock the category, and read it and the new parent again,
+            # a concurrent move may have changed their positions
+            locked = Node.objects.select_for_update().get(pk=self.pk)
+            for field in ('name', 'path', 'parent_id', 'tree_id', 'lft', 'rght', 'level'):
+                setattr(self, field, getattr(locked, field))
+            self.__dict__.pop('_parent_cache', None)
+            self._mptt_meta.update_mptt_cached_fields(self)
+            old_path, old_tree_id = self.path, self.tree_id
+            if parent is not None:
+                parent = type(parent).objects.select_for_update().get(pk=parent.pk)
+                if parent.tree_id == self.tree_id and self.lft <= parent.lft <= self.rght:
+                    raise ValidationError({
+                        'parent': 'A category cannot be moved into itself or its subcategories.'
+                    })
+                self.parent = parent
+                self.__dict__.pop('_channel', None)
+            if name is not None:
+                self.name = name
+            # validates the new parent and name, and sets the new path
+            self.save(notify=False)
+            self.refresh_from_db(fields=['tree_id', 'lft', 'rght', 'level'])
+            count = Node.objects.filter(
+                tree_id=self.tree_id, lft__gt=self.lft, lft__lt=self.rght
+            ).update(path=Concat(Value(self.path), Substr('path', len(old_path) + 1),
+                                 output_field=models.TextField()))
+            for tree_id in {old_tree_id, self.tree_id}:
+                tree_changed.send(sender=self.__class__, tree_id=tree_id)
+        return count
+
+    @property
+    def channel(self):
+        """
+        Get the channel this category belongs to
+        returns: instance of channel
+        """
+        if not hasattr(self, '_channel'):
+            self._channel = Channel.objects.get(tree_id=self.tree_id)
+        return self._channel
+
+
+class Channel(ChannelMixin, Node):
+    objects = ChannelManager()
+    category_class = Category
+
+    class Meta:
+        proxy = True
+
     def get_category(self, name):
         """
         Get the category by the name in this channel
@@ -132,18 +288,152 @@ class Channel(Node):
         except Channel.DoesNotExist:
             raise
 
-    def add_category(self, path):
+
+class ImportJob(models.Model):
+    """
+    Import of an uploaded file of categories into a channel, queued
+    and run in the background by channels.jobs. The rows read so far
+    are saved while the file is parsed, so clients can poll the progress.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    id = ShortUUIDField(primary_key=True, editable=False)
+    channel = models.ForeignKey(Node, related_name='import_jobs',
+                                on_delete=models.CASCADE)
+    file = models.TextField()
+    separator = models.CharField(max_length=10, default=';')
+    sync = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    rows = models.PositiveIntegerField(default=0)
+    categories = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return '{} {}'.format(self.channel, self.status)
+
+    @property
+    def elapsed(self):
+        """Seconds the job has been running, or ran"""
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at or timezone.now()
+        return (end - self.started_at).total_seconds()
+
+    @property
+    def rows_per_second(self):
+        """Rows processed per second since the job started"""
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed else 0.0
+
+
+class TreeVersionManager(models.Manager):
+    """Versions of the trees, shared by all the processes using the database"""
+    def bump(self, tree_id=None):
         """
-        Add a new category to the channel
-        path: list containing the path to the category
-        returns: the category added
+        Increase the version of a tree, or the global one if tree_id is
+        None, in the transaction of the write that changed the tree
         """
-        head, *tail = path
-        parent, _ = Category.objects.get_or_create(name=head,
-                                                   parent=self)
-        parent.save()
-        for element in tail:
-            parent, _ = Category.objects.get_or_create(name=element,
-                                                       parent=parent)
-            parent.save()
-        return parent
+        key = TreeVersion.key_for(tree_id)
+        now = timezone.now()
+        # the time in microseconds, or the previous version plus one
+        # if the clock went back, so a version is not used twice
+        version = int(now.timestamp() * 1000000)
+        changes = {'version': Greatest(F('version') + 1, Value(version)), 'changed_at': now}
+        if self.filter(key=key).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                self.create(key=key, version=version, changed_at=now)
+        except IntegrityError:
+            # created meanwhile by another writer
+            self.filter(key=key).update(**changes)
+
+    def get_many(self, tree_ids=None):
+        """
+        Get the versions of some trees, with the global one
+        tree_ids: tree ids, all the versions stored if None
+        returns: dict of (version, time it changed) by key, a tree
+        that never changed has version 0 and no time
+        """
+        versions = self.all()
+        if tree_ids is not None:
+            keys = [TreeVersion.GLOBAL] + [TreeVersion.key_for(tree_id)
+                                           for tree_id in tree_ids]
+            versions = versions.filter(key__in=keys)
+        found = {key: (version, changed_at) for key, version, changed_at
+                 in versions.values_list('key', 'version', 'changed_at')}
+        if tree_ids is not None:
+            for key in keys:
+                found.setdefault(key, (0, None))
+        return found
+
+
+class TreeVersion(models.Model):
+    """
+    Version of a tree, increased by every change of the tree, read by
+    the caches, validators and snapshots of every process to know if
+    what they hold is stale. The global version changes when the tree
+    ids of all channels may have changed.
+    """
+    GLOBAL = 'all'
+
+    key = models.CharField(max_length=20, primary_key=True)
+    version = models.BigIntegerField()
+    changed_at = models.DateTimeField()
+
+    objects = TreeVersionManager()
+
+    @classmethod
+    def key_for(cls, tree_id):
+        return cls.GLOBAL if tree_id is None else str(tree_id)
+
+
+# tree ids changed inside bump_tree_versions_once, by thread
+_changed_trees = threading.local()
+
+
+@contextmanager
+def bump_tree_versions_once():
+    """
+    Increase the version of each tree changed inside once, at the end,
+    instead of once per write, e.g. when nodes are saved one by one.
+    The writes and the versions are committed in one transaction.
+    """
+    if getattr(_changed_trees, 'tree_ids', None) is not None:
+        # the outer block bumps them
+        yield
+        return
+    with transaction.atomic():
+        _changed_trees.tree_ids = set()
+        try:
+            yield
+            tree_ids = _changed_trees.tree_ids
+        finally:
+            _changed_trees.tree_ids = None
+        for tree_id in tree_ids:
+            TreeVersion.objects.bump(tree_id)
+
+
+@receiver(tree_changed)
+def bump_tree_version(sender, tree_id, **kwargs):
+    """Increase the version of the tree that changed, or collect it"""
+    tree_ids = getattr(_changed_trees, 'tree_ids', None)
+    if tree_ids is not None:
+        tree_ids.add(tree_id)
+    else:
+        TreeVersion.objects.bump(tree_id)
@@ -0,0 +1,37 @@
+import csv
+
+
+class CategoryReader(object):
+    """
+    Iterate over the category paths in a file, one row at a time,
+    so the whole file is never loaded in memory.
+    Blank lines are skipped and names are stripped. With a single
+    character separator fields can be quoted, e.g. "Food, Beverages",Food Items
+    a quote inside a name is kept, e.g. Music;12" Vinyl, and a quote
+    left open raises ValueError instead of joining the following lines.
+    """
+    def __init__(self, file, separator=';'):
+        """
+        file: file object open in text mode, preferably with newline=''
+        separator: string separating the names in a path
+        """
+        self.file = file
+        self.separator = separator
+        self.rows = 0
+
+    def __iter__(self):
+        if len(self.separator) == 1:
+            rows = csv.reader(self.file, delimiter=self.separator)
+        else:
+            rows = (line.rstrip('\r\n').split(self.separator)
+                    for line in self.file)
+
+        for row in rows:
+            if any('\n' in name for name in row):
+                raise ValueError('Unclosed quote in the row ending on line {}.'
+                                 .format(rows.line_num))
+            path = [name.strip() for name in row]
+            if not any(path):
+                continue
+            self.rows += 1
+            yield path
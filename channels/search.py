@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import defaultdict
+from django.db import connections, router
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+from django.dispatch import receiver
+from channels.models import Node
+from channels.signals import tree_changed
+
+
+def trigrams(text):
+    """Set of the three letter sequences in a lower case text"""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def trigram_search(queryset, term):
+    """
+    Search categories by name on Postgres. Django compiles icontains to
+    UPPER("name"::text) LIKE UPPER(%s), served by the trigram index on
+    UPPER(name), and trigram_similar to "name" % %s, served by the trigram
+    index on name, above pg_trgm.similarity_threshold (0.3 by default).
+    Only the matches are ranked by trigram similarity.
+    """
+    from django.contrib.postgres.search import TrigramSimilarity
+    return (queryset
+            .filter(Q(name__icontains=term) | Q(name__trigram_similar=term))
+            .annotate(similarity=TrigramSimilarity('name', term))
+            .order_by('-similarity', Length('name'), 'name'))
+
+
+class CategoryIndex(object):
+    """
+    In process trigram index of the category names, for databases
+    without trigram indexes like SQLite. The index is rebuilt on the next
+    search after a channel changes, or after max_age seconds, since
+    changes made by other processes are not notified.
+    """
+    max_age = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.built_at = None
+        self.names = {}
+        self.tree_ids = {}
+        self.postings = defaultdict(set)
+
+    def invalidate(self):
+        self.built_at = None
+
+    def build(self):
+        """Load the names of all categories and index their trigrams"""
+        names, tree_ids = {}, {}
+        postings = defaultdict(set)
+        categories = (Node.objects
+                      .filter(level__gt=0)
+                      .values_list('id', 'name', 'tree_id')
+                      .iterator())
+        for pk, name, tree_id in categories:
+            names[pk] = name.lower()
+            tree_ids[pk] = tree_id
+            for trigram in trigrams(name):
+                postings[trigram].add(pk)
+        self.names, self.tree_ids, self.postings = names, tree_ids, postings
+        self.built_at = time.monotonic()
+
+    def ensure_built(self):
+        with self._lock:
+            if self.built_at is None or \
+                    time.monotonic() - self.built_at > self.max_age:
+                self.build()
+
+    def rank(self, name, term):
+        """Lower is better, exact match, prefix, word prefix then substring"""
+        if name == term:
+            return 0
+        if name.startswith(term):
+            return 1
+        if ' ' + term in name:
+            return 2
+        return 3
+
+    def search(self, term, tree_id=None):
+        """
+        Get the ids of the categories whose name contains the term
+        returns: list of ids, best matches first
+        """
+        self.ensure_built()
+        term = term.lower()
+        names, tree_ids = self.names, self.tree_ids
+        grams = trigrams(term)
+        if grams:
+            postings = sorted((self.postings.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*postings)
+        else:
+            candidates = names
+        matches = [pk for pk in candidates
+                   if term in names[pk] and
+                   (tree_id is None or tree_ids[pk] == tree_id)]
+        matches.sort(key=lambda pk: (self.rank(names[pk], term),
+                                     len(names[pk]),
+                                     names[pk]))
+        return matches
+
+
+category_index = CategoryIndex()
+
+# largest page of the results ranked by the CASE of search_categories
+max_ranked = 1000
+
+
+@receiver(tree_changed)
+def invalidate_category_index(sender, **kwargs):
+    """Rebuild the index on the next search"""
+    category_index.invalidate()
+
+
+def search_categories(queryset, term, channel=None, offset=0, limit=None):
+    """
+    Search categories by name, best matches first
+    queryset: categories queryset to search in
+    term: text contained in the name
+    channel: optional channel to search in
+    offset, limit: page of the results that will be read. Without trigram
+    indexes only the page, at most max_ranked categories, is ranked with a
+    CASE branch per category, the matches before it sort first and the
+    ones after it last, by length and name.
+    """
+    if channel is not None:
+        queryset = queryset.filter(tree_id=channel.tree_id)
+    vendor = connections[router.db_for_read(Node)].vendor
+    if vendor == 'postgresql':
+        return trigram_search(queryset, term)
+    ids = category_index.search(term, channel.tree_id if channel else None)
+    if not ids:
+        return queryset.none()
+    size = min(limit or max_ranked, max_ranked)
+    page = ids[offset:offset + size]
+    ranks = [When(pk=pk, then=Value(i)) for i, pk in enumerate(page)]
+    if offset:
+        ranks.insert(0, When(pk__in=ids[:offset], then=Value(-1)))
+    ranking = Case(*ranks, default=Value(len(page)), output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(ranking, Length('name'), 'name')
@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+
+# Sent when the categories of a channel change. tree_id is None
+# when the tree ids of all channels may have changed, this happens
+# when a channel is inserted or renamed, since channels are ordered
+# by name.
+tree_changed = Signal(providing_args=['tree_id'])
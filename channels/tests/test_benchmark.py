@@ -0,0 +1,61 @@
+import json
+from django.test import TestCase
+from django.core.management import call_command
+from django.utils.six import StringIO
+from channels.models import Node
+from channels.benchmark import deep_paths, wide_paths
+from channels.importer import CategoryTrie
+from channels.trees import TREE_BACKENDS
+
+
+class SyntheticTreeTest(TestCase):
+    def test_wide_tree(self):
+        trie = CategoryTrie.from_paths(wide_paths(1111, fanout=10))
+        self.assertEqual(len(trie), 1111)
+        self.assertEqual(len(trie.children), 10)
+        self.assertEqual(max(len(path) for path in trie.leaf_paths()), 4)
+
+    def test_deep_tree(self):
+        trie = CategoryTrie.from_paths(deep_paths(250, depth=100))
+        self.assertEqual(len(trie), 250)
+        self.assertEqual(len(trie.children), 3)
+        self.assertEqual(sorted(len(path) for path in trie.leaf_paths()),
+                         [50, 100, 100])
+
+
+class BenchmarkCommandTest(TestCase):
+    def benchmark(self, *args, **options):
+        out = StringIO()
+        call_command('benchmark', *args, repeat=1, stdout=out, stderr=StringIO(),
+                     **options)
+        return json.loads(out.getvalue())
+
+    def test_file_and_synthetic_datasets(self):
+        results = self.benchmark('test_data/test_data_sample_0.csv',
+                                 sizes=[100], shapes=['deep'], row_by_row=True)
+        self.assertEqual(results['environment']['database'], 'sqlite')
+        names = [dataset['name'] for dataset in results['datasets']]
+        self.assertEqual(names, ['test_data_sample_0', 'deep-100'])
+
+        sample = results['datasets'][0]
+        self.assertEqual(sample['categories'], 38)
+        for case in ('parse', 'import.row_by_row', 'import.bulk', 'channel.detail',
+                     'category.detail', 'category.list.offset', 'category.search'):
+            self.assertIn(case, sample['cases'])
+        self.assertGreater(sample['cases']['channel.detail']['queries'], 0)
+        for mode in ('models', 'values'):
+            case = sample['cases']['serialize.category.list.{}'.format(mode)]
+            self.assertGreater(case['objects_per_second'], 0)
+
+    def test_database_is_left_unchanged(self):
+        self.benchmark(sizes=[100], shapes=['wide'])
+        self.assertFalse(Node.objects.exists())
+
+    def test_tree_backends(self):
+        results = self.benchmark(sizes=[100], shapes=['wide', 'deep'], backends=True)
+        for dataset in results['datasets']:
+            for backend in TREE_BACKENDS.values():
+                for case in ('load', 'insert', 'descendants', 'count', 'ancestors'):
+                    self.assertIn('backend.{}.{}'.format(backend.name, case), dataset['cases'])
+                self.assertFalse(backend.category_class.objects.exists())
+        self.assertFalse(Node.objects.exists())
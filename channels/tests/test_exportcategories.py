@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+from django.test import TestCase
+from django.core.management import call_command
+from django.utils.six import StringIO
+from channels.models import Channel, Category, Node
+
+
+class ExportCategoriesTest(TestCase):
+    def setUp(self):
+        call_command('importcategories', 'FooChannel',
+                     'test_data/test_data_sample_0.csv', stdout=StringIO())
+        self.channel = Channel.objects.get(name='FooChannel')
+        self.channel.add_category(['Food; Drinks', 'Coffee'])
+
+    def paths(self, channel):
+        return [path.split('/', 2)[2] for path in
+                Category.objects.filter(tree_id=channel.tree_id)
+                .order_by('lft').values_list('path', flat=True)]
+
+    def test_csv_round_trip(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            pass
+        self.addCleanup(os.remove, f.name)
+        call_command('exportcategories', 'foochannel', output=f.name, stdout=StringIO())
+        call_command('importcategories', 'BarChannel', f.name, stdout=StringIO())
+        bar = Channel.objects.get(name='BarChannel')
+        self.channel.refresh_from_db()
+        self.assertEqual(self.paths(bar), self.paths(self.channel))
+
+    def test_csv_to_stdout(self):
+        out, err = StringIO(), StringIO()
+        call_command('exportcategories', 'FooChannel', stdout=out, stderr=err)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 40)
+        self.assertIn('"Food; Drinks";Coffee', lines)
+        self.assertIn('Exported 40 categories.', err.getvalue())
+
+    def test_jsonl_all_channels(self):
+        Channel.objects.create(name='BarChannel').add_category(['Books'])
+        out = StringIO()
+        call_command('exportcategories', type='jsonl', stdout=out, stderr=StringIO())
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 41)
+        self.assertEqual({row['channel'] for row in rows}, {'FooChannel', 'BarChannel'})
+        books = [row for row in rows if row['name'] == 'Books']
+        self.assertEqual(books[0]['path'], '/BarChannel/Books')
+
+    def test_csv_all_channels_to_directory(self):
+        bar = Channel.objects.create(name='../Bar/Channel')
+        bar.add_category(['Books'])
+        self.channel.refresh_from_db()
+        paths = self.paths(self.channel)
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('exportcategories', output=directory, stdout=StringIO())
+            # the files are named by the channel ids, the names are in the manifest
+            self.assertEqual(sorted(os.listdir(directory)),
+                             sorted(['{}.csv'.format(bar.pk),
+                                     '{}.csv'.format(self.channel.pk),
+                                     'manifest.txt']))
+            Node.objects.all().delete()
+            call_command('importchannels', manifest=os.path.join(directory, 'manifest.txt'),
+                         workers=1, stdout=StringIO())
+        self.assertEqual(self.paths(Channel.objects.get(name='FooChannel')), paths)
+        self.assertEqual([category.name for category in
+                          Channel.objects.get(name='../Bar/Channel').subcategories], ['Books'])
+
+    def test_csv_separator_of_many_characters(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            pass
+        self.addCleanup(os.remove, f.name)
+        Channel.objects.create(name='BarChannel').add_category(['Books', 'Computers'])
+        call_command('exportcategories', 'BarChannel', output=f.name, separator=' > ',
+                     stdout=StringIO())
+        with open(f.name, encoding='utf-8') as exported:
+            self.assertEqual(exported.read(), 'Books\nBooks > Computers\n')
+        call_command('importcategories', 'BazChannel', f.name, separator=' > ',
+                     stdout=StringIO())
+        self.assertEqual(self.paths(Channel.objects.get(name='BazChannel')),
+                         ['Books', 'Books/Computers'])
+
+        # a name cannot contain it
+        err = StringIO()
+        call_command('exportcategories', 'FooChannel', separator='; ',
+                     stdout=StringIO(), stderr=err)
+        self.assertIn('contains the separator', err.getvalue())
+
+    def test_channel_not_found(self):
+        err = StringIO()
+        call_command('exportcategories', 'BazChannel', stderr=err)
+        self.assertIn('Channel BazChannel not found.', err.getvalue())
@@ -1,8 +1,10 @@
+import os
+import tempfile
 from django.test import TestCase
 from django.core.management import call_command
 from django.core.management.base import CommandError
 from django.utils.six import StringIO
-from channels.models import Channel
+from channels.models import Channel, Category
 
 
 class ImportCategoriesTest(TestCase):
@@ -11,6 +13,15 @@ class ImportCategoriesTest(TestCase):
         call_command('importcategories', 'FooChannel', 'bar', stderr=out)
         self.assertIn('File bar not found.', out.getvalue())
 
+    def test_unclosed_quote(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('Music;"Vinyl\nMusic;CDs\n')
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('importcategories', 'FooChannel', f.name, stderr=out)
+        self.assertIn('Unclosed quote in the row ending on line 2.', out.getvalue())
+        self.assertFalse(Channel.objects.filter(name='FooChannel').exists())
+
     def test_required_args(self):
         with self.assertRaises(CommandError):
             call_command('importcategories')
@@ -40,3 +51,36 @@ class ImportCategoriesTest(TestCase):
         call_command('importcategories', 'FooChannel', file)
         channel = Channel.objects.get(name='FooChannel')
         self.assertEqual(channel.subcategories_count, 11)
+
+    def test_bulk_import(self):
+        out = StringIO()
+        file = 'test_data/test_data_sample_0.csv'
+        call_command('importcategories', '--bulk', 'FooChannel', file, stdout=out)
+        channel = Channel.objects.get(name='FooChannel')
+        self.assertEqual(channel.subcategories_count, 38)
+        self.assertIn('rows/sec', out.getvalue())
+
+    def test_batch_import(self):
+        file = 'test_data/test_data_sample_0.csv'
+        call_command('importcategories', 'FooChannel', file, stdout=StringIO())
+        rows = list(Category.objects.order_by('lft').values_list('path', 'lft', 'rght'))
+        call_command('importcategories', '--batch', 'FooChannel', file, stdout=StringIO())
+        self.assertEqual(list(Category.objects.order_by('lft').values_list('path', 'lft', 'rght')),
+                         rows)
+
+    def test_bulk_import_replaces_categories(self):
+        call_command('importcategories', 'FooChannel', 'test_data/test_data_sample_0.csv')
+        call_command('importcategories', '--bulk', 'FooChannel',
+                     'test_data/test_data_sample_empty_lines.csv')
+        channel = Channel.objects.get(name='FooChannel')
+        self.assertEqual(channel.subcategories_count, 11)
+        self.assertEqual(channel.rght, 24)
+
+    def test_sync_import(self):
+        file = 'test_data/test_data_sample_0.csv'
+        call_command('importcategories', 'FooChannel', file)
+        ids = set(Category.objects.values_list('id', flat=True))
+        out = StringIO()
+        call_command('importcategories', '--sync', 'FooChannel', file, stdout=out)
+        self.assertIn('0 categories added, 0 removed and 38 kept.', out.getvalue())
+        self.assertEqual(set(Category.objects.values_list('id', flat=True)), ids)
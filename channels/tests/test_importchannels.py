@@ -0,0 +1,81 @@
+import os
+import tempfile
+from django.test import TestCase, TransactionTestCase
+from django.core.management import call_command
+from django.utils.six import StringIO
+from channels.models import Channel, Category
+
+
+class ImportChannelsTest(TestCase):
+    def test_import_files(self):
+        out = StringIO()
+        call_command('importchannels',
+                     'test_data/test_data_sample_0.csv',
+                     'test_data/test_data_sample_empty_lines.csv',
+                     workers=1, stdout=out)
+        self.assertEqual(
+            Channel.objects.get(name='test_data_sample_0').subcategories_count, 38
+        )
+        self.assertEqual(
+            Channel.objects.get(name='test_data_sample_empty_lines').subcategories_count, 11
+        )
+        self.assertIn('Channel test_data_sample_0 updated with 10 categories', out.getvalue())
+        self.assertIn('Imported 2 channels with 13 categories', out.getvalue())
+
+    def test_import_glob(self):
+        call_command('importchannels', 'test_data/test_data_sample_[0-2].csv',
+                     workers=1, stdout=StringIO())
+        self.assertEqual(Channel.objects.count(), 3)
+
+    def test_import_manifest(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('FooChannel;test_data/test_data_sample_0.csv\n')
+            f.write('BarChannel;test_data/test_data_sample_1.csv\n')
+        self.addCleanup(os.remove, f.name)
+        call_command('importchannels', manifest=f.name, workers=1, stdout=StringIO())
+        self.assertEqual(Channel.objects.get(name='FooChannel').subcategories_count, 38)
+        self.assertTrue(Channel.objects.filter(name='BarChannel').exists())
+
+    def test_reimport_replaces_categories(self):
+        file = 'test_data/test_data_sample_0.csv'
+        call_command('importchannels', file, workers=1, stdout=StringIO())
+        channel = Channel.objects.get(name='test_data_sample_0')
+        call_command('importchannels', file, workers=1, stdout=StringIO())
+        self.assertEqual(Channel.objects.get(pk=channel.pk).subcategories_count, 38)
+        self.assertEqual(Category.objects.count(), 38)
+
+    def test_non_existing_file(self):
+        out = StringIO()
+        call_command('importchannels', 'bar', stderr=out)
+        self.assertIn('File bar not found.', out.getvalue())
+        self.assertFalse(Channel.objects.exists())
+
+    def test_no_files(self):
+        out = StringIO()
+        call_command('importchannels', stderr=out)
+        self.assertIn('No channel files given.', out.getvalue())
+
+
+class ImportChannelsParallelTest(TransactionTestCase):
+    """
+    Parse in a process pool and write in a thread pool, the writer
+    threads use their own connections so the data must be committed
+    """
+    def tree(self, name):
+        channel = Channel.objects.get(name=name)
+        return list(Category.objects.filter(tree_id=channel.tree_id)
+                    .order_by('lft').values_list('path', 'lft', 'rght', 'level'))
+
+    def test_parallel_import_matches_sequential(self):
+        files = ['test_data/test_data_sample_0.csv', 'test_data/test_data_sample_1.csv',
+                 'test_data/test_data_sample_empty_lines.csv']
+        out = StringIO()
+        call_command('importchannels', *files, workers=2, stdout=out)
+        self.assertIn('Imported 3 channels', out.getvalue())
+        names = [os.path.splitext(os.path.basename(file))[0] for file in files]
+        parallel = {name: self.tree(name) for name in names}
+
+        call_command('importchannels', *files, workers=1, stdout=StringIO())
+        for name in names:
+            self.assertTrue(parallel[name])
+            self.assertEqual(self.tree(name), parallel[name])
@@ -0,0 +1,180 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.exceptions import ValidationError
+from django.db import connection
+from channels.models import Channel, Category, TreeVersion
+from channels.importer import (CategoryTrie,
+                               add_categories,
+                               bulk_add_categories,
+                               sync_categories)
+
+
+CATEGORIES = [
+    ['Home & Garden',
+     'Kitchen & Dining',
+     'Kitchen Tools & Utensils',
+     'Food Graters & Zesters'],
+    ['Home & Garden',
+     'Household Appliances',
+     'Laundry Appliances',
+     'Dryers'],
+    ['  Books ', 'Computers'],
+    ['Books'],
+]
+
+
+def tree_fields(channel):
+    """MPTT fields and paths of a channel tree, independent of the ids"""
+    return list(Category.objects
+                .filter(tree_id=channel.tree_id)
+                .order_by('lft')
+                .values_list('name', 'path', 'level', 'lft', 'rght'))
+
+
+class CategoryTrieTestCase(TestCase):
+    def test_segments_are_deduplicated(self):
+        trie = CategoryTrie.from_paths(CATEGORIES)
+        self.assertEqual(len(trie), 9)
+        self.assertEqual(set(trie.children), {'Home & Garden', 'Books'})
+
+    def test_empty_name_is_invalid(self):
+        with self.assertRaises(ValidationError):
+            CategoryTrie.from_paths([['Books', ' ']])
+
+
+class BulkAddCategoriesTestCase(TestCase):
+    def test_same_tree_as_add_category(self):
+        expected_channel = Channel.objects.create(name='FooChannel')
+        for category in CATEGORIES:
+            expected_channel.add_category(category)
+
+        channel = Channel.objects.create(name='BarChannel')
+        count = bulk_add_categories(channel, CATEGORIES)
+        # creating a channel may shift the tree ids of the others
+        expected_channel.refresh_from_db()
+        channel.refresh_from_db()
+
+        self.assertEqual(count, 9)
+        self.assertEqual(channel.subcategories_count, 9)
+        self.assertEqual(channel.rght, expected_channel.rght)
+        expected = [(n, p.replace('/FooChannel', '/BarChannel'), lv, l, r)
+                    for n, p, lv, l, r in tree_fields(expected_channel)]
+        self.assertEqual(tree_fields(channel), expected)
+
+    def test_inserted_with_few_queries(self):
+        channel = Channel.objects.create(name='FooChannel')
+        # savepoint, insert, update, version of the tree, release
+        TreeVersion.objects.bump(channel.tree_id)
+        with self.assertNumQueries(5):
+            bulk_add_categories(channel, CATEGORIES)
+
+
+class SyncCategoriesTestCase(TestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='FooChannel')
+        bulk_add_categories(self.channel, CATEGORIES)
+        self.channel.refresh_from_db()
+
+    def test_unchanged_tree_keeps_ids(self):
+        ids = set(Category.objects.values_list('id', flat=True))
+        result = sync_categories(self.channel, CATEGORIES)
+        self.assertEqual(tuple(result), (0, 0, 9))
+        self.assertEqual(set(Category.objects.values_list('id', flat=True)), ids)
+
+    def test_add_and_remove_categories(self):
+        dryers = Category.objects.get(name='Dryers')
+        categories = [
+            ['Home & Garden',
+             'Household Appliances',
+             'Laundry Appliances',
+             'Dryers'],
+            ['Books', 'Computers', 'Database'],
+            ['Animals'],
+        ]
+        result = sync_categories(self.channel, categories)
+        self.assertEqual(tuple(result), (2, 3, 6))
+        self.assertEqual(Category.objects.get(name='Dryers').pk, dryers.pk)
+        self.assertFalse(Category.objects.filter(name='Kitchen & Dining').exists())
+
+        # the tree must be the same as a fresh import
+        expected_channel = Channel.objects.create(name='BarChannel')
+        bulk_add_categories(expected_channel, categories)
+        expected_channel.refresh_from_db()
+        self.channel.refresh_from_db()
+        self.assertEqual(self.channel.rght, expected_channel.rght)
+        expected = [(n, p.replace('/BarChannel', '/FooChannel'), lv, l, r)
+                    for n, p, lv, l, r in tree_fields(expected_channel)]
+        self.assertEqual(tree_fields(self.channel), expected)
+
+
+class AddCategoriesTestCase(TestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='FooChannel')
+        self.channel.add_category(CATEGORIES[0])
+        self.channel.refresh_from_db()
+
+    def test_same_tree_as_add_category(self):
+        expected_channel = Channel.objects.create(name='BarChannel')
+        for category in CATEGORIES:
+            expected_channel.add_category(category)
+        kept = set(Category.objects.filter(tree_id=self.channel.tree_id)
+                   .values_list('id', flat=True))
+
+        self.channel.refresh_from_db()
+        count = add_categories(self.channel, CATEGORIES)
+        expected_channel.refresh_from_db()
+
+        self.assertEqual(count, 5)
+        self.assertEqual(self.channel.rght, expected_channel.rght)
+        expected = [(n, p.replace('/BarChannel', '/FooChannel'), lv, l, r)
+                    for n, p, lv, l, r in tree_fields(expected_channel)]
+        self.assertEqual(tree_fields(self.channel), expected)
+        # the existing categories are kept
+        self.assertLessEqual(kept, set(Category.objects.values_list('id', flat=True)))
+
+    def test_other_channels_are_untouched(self):
+        other = Channel.objects.create(name='BarChannel')
+        other.add_category(CATEGORIES[1])
+        other.refresh_from_db()
+        before = tree_fields(other)
+        self.channel.refresh_from_db()
+        add_categories(self.channel, CATEGORIES)
+        other.refresh_from_db()
+        self.assertEqual(tree_fields(other), before)
+
+    def test_invalid_batch_is_not_written(self):
+        before = tree_fields(self.channel)
+        for paths in ([['Books'], ['Music', ' ']],
+                      [['Books'], ['x' * 256]]):
+            with self.assertRaises(ValidationError):
+                add_categories(self.channel, paths)
+            self.assertEqual(tree_fields(self.channel), before)
+
+    def test_same_rules_as_full_clean(self):
+        # the names are stripped, and compared with the case they have
+        self.assertEqual(add_categories(self.channel, [['Books', ' Music '], ['books']]), 3)
+        self.assertTrue(Category.objects.filter(path='/FooChannel/Books/Music').exists())
+        self.assertTrue(Category.objects.filter(path='/FooChannel/books').exists())
+        for paths in ([['Books', 'x' * 256]], [['x' * 256]]):
+            with self.assertRaises(ValidationError) as batch:
+                add_categories(self.channel, paths)
+            with self.assertRaises(ValidationError) as single:
+                self.channel.add_category(paths[0])
+            self.assertEqual(list(batch.exception.message_dict),
+                             list(single.exception.message_dict))
+
+    def test_slash_in_name_is_not_a_separator(self):
+        self.assertEqual(add_categories(self.channel, [['Books', 'Computers'],
+                                                        ['Books/Computers']]), 3)
+        self.assertTrue(Category.objects.filter(path='/FooChannel/Books\\/Computers').exists())
+
+    def test_fewer_queries_than_add_category(self):
+        def queries(add):
+            channel = Channel.objects.create(name='Channel{}'.format(Channel.objects.count()))
+            with CaptureQueriesContext(connection) as captured:
+                add(channel)
+            return len(captured)
+
+        one_by_one = queries(lambda c: [c.add_category(p) for p in CATEGORIES])
+        batch = queries(lambda c: add_categories(c, CATEGORIES))
+        self.assertLess(batch, one_by_one)
@@ -1,6 +1,12 @@
+from importlib import import_module
+from django.apps import apps
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.core.exceptions import ValidationError
-from channels.models import Channel, Category
+from django.db import IntegrityError, connection, transaction
+from channels.models import Channel, Category, Node, TreeVersion
+from channels.importer import bulk_add_tree, read_tree
+from channels.utils import join_path
 
 
 class ChannelCategoriesInsertionTestCase(TestCase):
@@ -115,3 +121,191 @@ class ChannelCategoriesRetrievalTestCase(TestCase):
         expected = '/FooChannel/Home & Garden'
         path = self.channel.get_category('Home & Garden').path
         self.assertEqual(path, expected)
+
+    def test_get_category_by_path(self):
+        path = '/FooChannel/Home & Garden/Household Appliances'
+        category = Category.objects.get(path=path)
+        self.assertEqual(category.name, 'Household Appliances')
+
+    def test_path_is_unique(self):
+        category = Category(name='Other', parent=self.channel,
+                            path='/FooChannel/Home & Garden')
+        with self.assertRaises(IntegrityError):
+            Category.objects.bulk_create([category])
+
+    def test_slash_in_name_is_escaped(self):
+        io = self.channel.add_category(['I/O Cards'])
+        nested = self.channel.add_category(['I', 'O Cards'])
+        self.assertEqual(io.path, '/FooChannel/I\\/O Cards')
+        self.assertEqual(nested.path, '/FooChannel/I/O Cards')
+        back = self.channel.add_category(['A\\', 'B'])
+        self.assertEqual(back.path, '/FooChannel/A\\\\/B')
+
+    def test_backfill_escapes_existing_paths(self):
+        backfill_path = import_module('channels.migrations.0009_escape_path_names').backfill_path
+        io = self.channel.add_category(['I/O Cards', 'Riser Cards'])
+        Node.objects.filter(pk=io.pk).update(path='/FooChannel/I/O Cards/Riser Cards')
+        backfill_path(apps, None)
+        io.refresh_from_db()
+        self.assertEqual(io.path, '/FooChannel/I\\/O Cards/Riser Cards')
+
+    def test_in_bulk_by_path(self):
+        paths = ['/FooChannel/Home & Garden', '/FooChannel/Missing']
+        found = Category.objects.in_bulk_by('path', paths)
+        self.assertEqual(list(found), ['/FooChannel/Home & Garden'])
+
+    def test_in_bulk_by_batches_keys(self):
+        # the SQLite backend looks up 500 keys per query
+        keys = ['key {}'.format(i) for i in range(1200)]
+        with self.assertNumQueries(3):
+            self.assertEqual(Category.objects.in_bulk_by('id', keys), {})
+
+
+class CategoryMoveTestCase(TestCase):
+    """Moves and renames on the deep trees of the full data file"""
+    @classmethod
+    def setUpTestData(cls):
+        trie, _ = read_tree('test_data/test_data_full.csv')
+        for name in ('foo', 'bar'):
+            bulk_add_tree(Channel.objects.create(name=name), trie)
+
+    def category(self, path):
+        return Category.objects.get(path=path)
+
+    def assert_tree_is_consistent(self, tree_id):
+        """The paths follow the parents and the MPTT fields are the rebuilt ones"""
+        nodes = {row[0]: row for row in Node.objects.filter(tree_id=tree_id)
+                 .values_list('id', 'parent_id', 'name', 'path', 'lft', 'rght', 'level')}
+        for pk, parent_id, name, path, lft, rght, level in nodes.values():
+            if parent_id is not None:
+                parent = nodes[parent_id]
+                self.assertEqual(path, join_path(parent[3], name))
+                self.assertEqual(level, parent[6] + 1)
+                self.assertTrue(parent[4] < lft < rght < parent[5])
+        # lft and rght numbered again, with the children ordered by name
+        children = {}
+        for pk, parent_id, name, *_ in sorted(nodes.values(), key=lambda row: row[2]):
+            children.setdefault(parent_id, []).append(pk)
+        expected, counter = {}, iter(range(1, 2 * len(nodes) + 1))
+
+        def number(pk):
+            lft = next(counter)
+            for child in children.get(pk, []):
+                number(child)
+            expected[pk] = (lft, next(counter))
+
+        number(children[None][0])
+        self.assertEqual(expected, {pk: (row[4], row[5]) for pk, row in nodes.items()})
+
+    def test_move_subtree(self):
+        kitchen = self.category('/foo/Home & Garden/Kitchen & Dining')
+        descendants = kitchen.get_descendant_count()
+        count = kitchen.move(parent=self.category('/foo/Sporting Goods'))
+        self.assertEqual(count, descendants)
+        self.assertEqual(kitchen.path, '/foo/Sporting Goods/Kitchen & Dining')
+        self.assertEqual(Category.objects.filter(
+            path__startswith='/foo/Sporting Goods/Kitchen & Dining/').count(), descendants)
+        self.assertFalse(Category.objects.filter(
+            path__startswith='/foo/Home & Garden/Kitchen & Dining').exists())
+        self.assert_tree_is_consistent(kitchen.tree_id)
+
+    def test_rename_changes_order(self):
+        home = self.category('/foo/Home & Garden')
+        home.move(name='Abode & Garden')
+        home.refresh_from_db()
+        self.assertEqual(home.get_previous_sibling(), None)
+        self.assertTrue(Category.objects.filter(
+            path='/foo/Abode & Garden/Kitchen & Dining').exists())
+        self.assert_tree_is_consistent(home.tree_id)
+
+    def test_move_to_another_channel(self):
+        hardware = self.category('/foo/Hardware')
+        old_tree_id = hardware.tree_id
+        bar = Channel.objects.get(name='bar')
+        hardware.move(parent=self.category('/bar/Electronics'), name='Tools')
+        self.assertEqual(hardware.channel, bar)
+        self.assertTrue(Category.objects.filter(
+            path__startswith='/bar/Electronics/Tools/').exists())
+        self.assert_tree_is_consistent(old_tree_id)
+        self.assert_tree_is_consistent(bar.tree_id)
+
+    def test_queries_do_not_depend_on_subtree_size(self):
+        def queries(path):
+            category = self.category(path)
+            # the version of the tree is created by its first change
+            TreeVersion.objects.bump(category.tree_id)
+            with CaptureQueriesContext(connection) as captured:
+                category.move(parent=self.category('/foo/Sporting Goods'))
+            return len(captured)
+
+        self.assertEqual(queries('/foo/Home & Garden/Kitchen & Dining'),
+                         queries('/foo/Home & Garden/Smoking Accessories/Ashtrays'))
+
+    def test_invalid_moves(self):
+        home = self.category('/foo/Home & Garden')
+        with self.assertRaises(ValidationError):
+            home.move(parent=self.category('/foo/Home & Garden/Kitchen & Dining'))
+        with self.assertRaises(ValidationError):
+            self.category('/foo/Hardware').move(name='Home & Garden')
+        self.assertEqual(self.category('/foo/Hardware').name, 'Hardware')
+        self.assert_tree_is_consistent(home.tree_id)
+
+    def test_moves_read_the_locked_rows(self):
+        """The instances may be stale, moved since they were read"""
+        home = self.category('/foo/Home & Garden')
+        hardware = self.category('/foo/Hardware')
+        self.category('/foo/Hardware').move(parent=self.category('/foo/Home & Garden'))
+        with self.assertRaises(ValidationError):
+            home.move(parent=hardware)
+        hardware.move(name='Tools')
+        self.assertTrue(Node.objects.filter(path='/foo/Home & Garden/Tools').exists())
+        self.assert_tree_is_consistent(home.tree_id)
+
+
+class TreeVersionTestCase(TestCase):
+    def test_changes_increase_the_version(self):
+        channel = Channel.objects.create(name='foo')
+        versions = TreeVersion.objects.get_many([channel.tree_id])
+        self.assertEqual(versions[str(channel.tree_id)], (0, None))
+        global_version = versions[TreeVersion.GLOBAL][0]
+        self.assertGreater(global_version, 0)
+
+        channel.add_category(['Books'])
+        first = TreeVersion.objects.get_many([channel.tree_id])[str(channel.tree_id)]
+        channel.add_category(['Games'])
+        second = TreeVersion.objects.get_many([channel.tree_id])[str(channel.tree_id)]
+        self.assertGreater(second[0], first[0])
+        self.assertGreaterEqual(second[1], first[1])
+        # only inserting a channel changes the global version
+        self.assertEqual(TreeVersion.objects.get_many()[TreeVersion.GLOBAL][0],
+                         global_version)
+
+    def test_rolled_back_change(self):
+        channel = Channel.objects.create(name='foo')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            channel.add_category(['Books'])
+            raise RuntimeError
+        self.assertEqual(TreeVersion.objects.get_many([channel.tree_id])[str(channel.tree_id)],
+                         (0, None))
+
+    def test_saving_a_channel(self):
+        channel = Channel.objects.create(name='foo')
+        global_version = TreeVersion.objects.get_many()[TreeVersion.GLOBAL][0]
+        channel.save()
+        versions = TreeVersion.objects.get_many([channel.tree_id])
+        self.assertEqual(versions[TreeVersion.GLOBAL][0], global_version)
+        self.assertGreater(versions[str(channel.tree_id)][0], 0)
+        # renaming it may change the order of the channels
+        channel.name = 'bar'
+        channel.save()
+        self.assertGreater(TreeVersion.objects.get_many()[TreeVersion.GLOBAL][0],
+                           global_version)
+
+    def test_bumped_once(self):
+        channel = Channel.objects.create(name='foo')
+        channel.add_category(['Books'])
+        with CaptureQueriesContext(connection) as queries:
+            channel.add_category(['Books', 'Computers', 'Databases'])
+        versions = [query for query in queries.captured_queries
+                    if 'channels_treeversion' in query['sql']]
+        self.assertEqual(len(versions), 1)
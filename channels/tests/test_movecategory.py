@@ -0,0 +1,39 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.utils.six import StringIO
+from channels.models import Channel, Category
+
+
+class MoveCategoryTest(TestCase):
+    def setUp(self):
+        self.channel = Channel.objects.create(name='foo')
+        self.channel.add_category(['Books', 'Computers', 'Databases'])
+        self.channel.add_category(['Games'])
+
+    def call(self, *args, **options):
+        out, err = StringIO(), StringIO()
+        call_command('movecategory', *args, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_move_and_rename(self):
+        out, _ = self.call('/foo/Books/Computers', to='/foo/Games', name='Software')
+        self.assertIn('1 subcategories', out)
+        self.assertTrue(Category.objects.filter(path='/foo/Games/Software/Databases').exists())
+
+    def test_move_to_channel(self):
+        self.call('foo/Books/Computers/', to='/foo')
+        self.assertTrue(Category.objects.filter(path='/foo/Computers/Databases').exists())
+
+    def test_slash_in_name(self):
+        self.channel.add_category(['I/O Cards'])
+        self.call('/foo/I\\/O Cards', to='/foo/Games/')
+        self.assertTrue(Category.objects.filter(path='/foo/Games/I\\/O Cards').exists())
+
+    def test_errors(self):
+        _, err = self.call('/foo/Music', to='/foo')
+        self.assertIn('not found', err)
+        _, err = self.call('/foo/Books', to='/foo/Books/Computers')
+        self.assertIn('parent', err)
+        _, err = self.call('/foo/Books')
+        self.assertIn('--to', err)
+        self.assertTrue(Category.objects.filter(path='/foo/Books/Computers/Databases').exists())
@@ -0,0 +1,42 @@
+from io import StringIO
+from django.test import SimpleTestCase
+from channels.reader import CategoryReader
+
+
+class CategoryReaderTestCase(SimpleTestCase):
+    def test_read_paths(self):
+        file = StringIO('Books;Computers\n Books ; Database \n')
+        expected = [['Books', 'Computers'], ['Books', 'Database']]
+        self.assertEqual(list(CategoryReader(file)), expected)
+
+    def test_skip_blank_lines(self):
+        file = StringIO('Books\n\n   \nGames\n')
+        reader = CategoryReader(file)
+        self.assertEqual(list(reader), [['Books'], ['Games']])
+        self.assertEqual(reader.rows, 2)
+
+    def test_quoted_fields(self):
+        file = StringIO('"Food, Beverages & Tobacco",Food Items\n')
+        expected = [['Food, Beverages & Tobacco', 'Food Items']]
+        self.assertEqual(list(CategoryReader(file, ',')), expected)
+
+    def test_quotes_with_the_default_separator(self):
+        file = StringIO('"Books;Comics";Manga\nMusic;12" Vinyl\n')
+        expected = [['Books;Comics', 'Manga'], ['Music', '12" Vinyl']]
+        self.assertEqual(list(CategoryReader(file)), expected)
+
+    def test_unclosed_quote(self):
+        file = StringIO('Music;"Vinyl\nMusic;CDs\n')
+        with self.assertRaisesMessage(ValueError, 'line 2'):
+            list(CategoryReader(file))
+
+    def test_multiple_characters_separator(self):
+        file = StringIO('Books / National Literature\n')
+        expected = [['Books', 'National Literature']]
+        self.assertEqual(list(CategoryReader(file, ' / ')), expected)
+
+    def test_read_lazily(self):
+        file = StringIO('Books\nGames\n')
+        paths = iter(CategoryReader(file))
+        self.assertEqual(next(paths), ['Books'])
+        self.assertEqual(file.readline(), 'Games\n')
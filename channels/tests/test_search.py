@@ -0,0 +1,85 @@
+from django.db.backends.postgresql.base import DatabaseWrapper
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from channels.importer import CategoryTrie, bulk_add_tree
+from channels.models import Channel, Category
+from channels.search import search_categories, trigram_search, trigrams
+
+
+class CategorySearchTestCase(TestCase):
+    def setUp(self):
+        self.foo = Channel.objects.create(name='foo')
+        self.foo.add_category(['Home & Garden', 'Household Appliances', 'Laundry Appliances'])
+        self.foo.add_category(['Home & Garden', 'Kitchen & Dining', 'Kitchen Appliances'])
+        self.foo.add_category(['Appliances'])
+        self.bar = Channel.objects.create(name='bar')
+        self.bar.add_category(['Appliances'])
+        self.foo.refresh_from_db()
+
+    def names(self, term, channel=None):
+        categories = search_categories(Category.objects.all(), term, channel)
+        return [category.name for category in categories]
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams('Dryer'), {'dry', 'rye', 'yer'})
+
+    def test_best_matches_first(self):
+        names = self.names('appliances')
+        self.assertEqual(names[:2], ['Appliances', 'Appliances'])
+        self.assertEqual(set(names[2:]), {'Household Appliances',
+                                          'Laundry Appliances',
+                                          'Kitchen Appliances'})
+
+    def test_case_insensitive_substring(self):
+        self.assertEqual(self.names('ITCHEN &'), ['Kitchen & Dining'])
+
+    def test_short_terms(self):
+        self.assertEqual(self.names('&'), ['Home & Garden', 'Kitchen & Dining'])
+
+    def test_search_in_channel(self):
+        names = self.names('appliances', self.foo)
+        self.assertEqual(len(names), 4)
+
+    def test_no_match(self):
+        self.assertEqual(self.names('books'), [])
+
+    def test_new_categories_are_found(self):
+        self.assertEqual(self.names('books'), [])
+        self.foo.add_category(['Books'])
+        self.assertEqual(self.names('books'), ['Books'])
+
+    def test_every_match_is_returned(self):
+        bulk_add_tree(self.bar, CategoryTrie.from_paths(
+            [['Books {}'.format(i)] for i in range(250)]
+        ))
+        self.assertEqual(len(self.names('books')), 250)
+
+    def test_only_the_page_is_ranked(self):
+        bulk_add_tree(self.bar, CategoryTrie.from_paths(
+            [['Books {}'.format(i)] for i in range(250)]
+        ))
+        ranked = self.names('books')
+        categories = search_categories(Category.objects.all(), 'books',
+                                       offset=100, limit=10)
+        with CaptureQueriesContext(connection) as queries:
+            page = [category.name for category in categories[100:110]]
+        self.assertEqual(page, ranked[100:110])
+        self.assertEqual(queries[0]['sql'].count('WHEN'), 11)
+        self.assertEqual(categories.count(), 250)
+
+
+class TrigramSearchTestCase(SimpleTestCase):
+    def test_filters_match_the_trigram_indexes(self):
+        """The filters compile to the expressions of the indexes of the migrations"""
+        connection = DatabaseWrapper({
+            'NAME': 'olist', 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '',
+            'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'AUTOCOMMIT': True,
+            'ATOMIC_REQUESTS': False, 'TIME_ZONE': None,
+        }, 'postgresql')
+        queryset = trigram_search(Category.objects.all(), 'laundry')
+        sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+        where = sql.split(' WHERE ')[1].split(' ORDER BY ')[0]
+        self.assertIn('UPPER("channels_node"."name"::text) LIKE UPPER(%s)', where)
+        self.assertIn('"channels_node"."name" %% %s', where)
+        self.assertNotIn('SIMILARITY', where)
@@ -0,0 +1,80 @@
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from channels.importer import CategoryTrie
+from channels.trees import TREE_BACKENDS
+from channels.utils import split_path
+
+
+CATEGORIES = [
+    ['Books', 'Computers', 'Databases'],
+    ['Books', 'Computers', 'Networks'],
+    ['Books', 'Computers & Tablets'],
+    ['Books', 'Music'],
+    ['Games'],
+]
+
+
+class TreeBackendsTestCase(TestCase):
+    """Both backends give the same answers through the same API"""
+    def build(self, backend, bulk=False):
+        channel = backend.channel_class.objects.create(name='foo')
+        if bulk:
+            backend.bulk_add_tree(channel, CategoryTrie.from_paths(CATEGORIES))
+        else:
+            for path in CATEGORIES:
+                channel.add_category(path)
+        return channel
+
+    def describe(self, backend, channel):
+        books = backend.category_class.objects.get(path='/foo/Books')
+        databases = backend.category_class.objects.get(path='/foo/Books/Computers/Databases')
+        return {
+            'channel': [node.path for node in channel.subcategories],
+            'count': channel.subcategories_count,
+            'books': [node.path for node in books.subcategories],
+            'books_count': books.subcategories_count,
+            'ancestors': [node.path for node in databases.get_ancestors()],
+            'databases_channel': databases.channel.name,
+        }
+
+    def test_same_api_and_answers(self):
+        answers = []
+        for name, backend in TREE_BACKENDS.items():
+            for bulk in (False, True):
+                with self.subTest(backend=name, bulk=bulk):
+                    channel = self.build(backend, bulk)
+                    answers.append(self.describe(backend, channel))
+                    channel.delete()
+        self.assertEqual(answers[0], {
+            # in tree order, a category is followed by its subcategories
+            'channel': ['/foo/Books', '/foo/Books/Computers',
+                        '/foo/Books/Computers/Databases', '/foo/Books/Computers/Networks',
+                        '/foo/Books/Computers & Tablets', '/foo/Books/Music', '/foo/Games'],
+            'count': 7,
+            'books': ['/foo/Books/Computers', '/foo/Books/Computers/Databases',
+                      '/foo/Books/Computers/Networks', '/foo/Books/Computers & Tablets',
+                      '/foo/Books/Music'],
+            'books_count': 5,
+            'ancestors': ['/foo', '/foo/Books', '/foo/Books/Computers'],
+            'databases_channel': 'foo',
+        })
+        # the closure table backend sorts the names by code point,
+        # the MPTT backend with the collation of the database
+        for answer in answers[1:]:
+            self.assertEqual(self.by_code_point(answer), self.by_code_point(answers[0]))
+
+    def by_code_point(self, answer):
+        """The answer with the subcategories in code point order"""
+        answer = dict(answer)
+        for key in ('channel', 'books'):
+            answer[key] = sorted(answer[key], key=split_path)
+        return answer
+
+    def test_validation(self):
+        for name, backend in TREE_BACKENDS.items():
+            with self.subTest(backend=name):
+                self.build(backend)
+                with self.assertRaises(ValidationError):
+                    backend.channel_class.objects.create(name='FOO')
+                with self.assertRaises(ValidationError):
+                    backend.category_class.objects.create(name='Orphan')
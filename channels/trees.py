@@ -0,0 +1,18 @@
+from collections import OrderedDict, namedtuple
+from channels.importer import bulk_add_tree
+from channels.models import Category, Channel
+
+
+# Storage of the trees of categories, with the same Channel and Category
+# API: subcategories, subcategories_count, channel and add_category.
+# bulk_add_tree adds the categories of a CategoryTrie to an empty channel.
+TreeBackend = namedtuple('TreeBackend',
+                         ['name', 'channel_class', 'category_class', 'bulk_add_tree'])
+
+# The backends are compared by the benchmark, others are added by the
+# apps providing them, like the closure table of closuretree in development
+TREE_BACKENDS = OrderedDict([
+    # nested sets, descendants and counts are ranges of lft and rght,
+    # inserts renumber the nodes after the new one
+    ('mptt', TreeBackend('mptt', Channel, Category, bulk_add_tree)),
+])
@@ -0,0 +1,133 @@
+import time
+from django.db import connections
+
+
+def escape_name(name):
+    """
+    Escape a name to be a segment of a materialized path, a slash
+    in a name, e.g. I/O Cards, is escaped with a backslash so it is
+    not taken for a separator, and so is a backslash
+    """
+    return name.replace('\\', '\\\\').replace('/', '\\/')
+
+
+def join_path(parent_path, name):
+    """
+    Materialized path of a node
+    parent_path: path of the parent, empty for a channel
+    """
+    return '{}/{}'.format(parent_path, escape_name(name))
+
+
+def split_path(path):
+    """
+    Names of the nodes of a materialized path, the inverse of join_path
+    path: path of a node, with a leading slash
+    """
+    names, name, escaped = [], [], False
+    for char in path[1:]:
+        if escaped:
+            name.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '/':
+            names.append(''.join(name))
+            name = []
+        else:
+            name.append(char)
+    names.append(''.join(name))
+    return names
+
+
+def normalize_path(path):
+    """
+    Materialized path with a leading and without a trailing slash,
+    a trailing slash escaped by a backslash is part of the last name
+    """
+    path = path.strip().lstrip('/')
+    while path.endswith('/'):
+        escapes = len(path[:-1]) - len(path[:-1].rstrip('\\'))
+        if escapes % 2:
+            break
+        path = path[:-1]
+    return '/' + path
+
+
+class QueryLog(object):
+    """
+    Queries log of a connection while a QueryCounter is used,
+    queries are counted and forwarded to the previous log,
+    which is read through it by connection.queries
+    """
+    def __init__(self, counter, previous):
+        self.counter = counter
+        self.previous = previous
+
+    def append(self, query):
+        """Called by the debug cursor for every executed query"""
+        self.counter.count += 1
+        self.counter.time += float(query['time'])
+        self.previous.append(query)
+
+    def clear(self):
+        """Called when a request starts, the counters are kept"""
+        self.previous.clear()
+
+    @property
+    def maxlen(self):
+        return self.previous.maxlen
+
+    def __len__(self):
+        return len(self.previous)
+
+    def __iter__(self):
+        return iter(self.previous)
+
+    def __getitem__(self, index):
+        return self.previous[index]
+
+
+class QueryCounter(object):
+    """
+    Context manager counting the queries executed on the database
+    connections, and the time spent running them, across all the
+    databases, e.g. the default one and its replicas, unless using
+    names some of them. Works without DEBUG, queries are forwarded
+    to the previous logs so counters can be nested.
+    """
+    def __init__(self, using=None):
+        if isinstance(using, str):
+            using = [using]
+        self.using = using
+        self.count = 0
+        self.time = 0.0
+
+    def __enter__(self):
+        aliases = self.using if self.using is not None else list(connections)
+        self._previous = []
+        for alias in aliases:
+            db = connections[alias]
+            self._previous.append((db, db.queries_log, db.force_debug_cursor))
+            db.queries_log = QueryLog(self, db.queries_log)
+            db.force_debug_cursor = True
+        return self
+
+    def __exit__(self, *exc_info):
+        for db, queries_log, force_debug_cursor in self._previous:
+            db.queries_log = queries_log
+            db.force_debug_cursor = force_debug_cursor
+
+
+class Timer(object):
+    """Context manager measuring the elapsed wall time"""
+    def __init__(self):
+        self.start = None
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
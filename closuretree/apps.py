@@ -0,0 +1,19 @@
+from django.apps import AppConfig
+
+
+class ClosureTreeConfig(AppConfig):
+    """
+    Closure table tree backend, compared with MPTT by the benchmark.
+    Only installed in development, the API keeps using MPTT.
+    """
+    name = 'closuretree'
+
+    def ready(self):
+        """Add the backend to the ones compared by the benchmark"""
+        from channels.trees import TREE_BACKENDS, TreeBackend
+        from closuretree.importer import bulk_add_closure_tree
+        from closuretree.models import ClosureCategory, ClosureChannel
+        # closure table, a row per ancestor of each node, inserts only
+        # write the rows of the new node
+        TREE_BACKENDS['closure'] = TreeBackend('closure', ClosureChannel, ClosureCategory,
+                                               bulk_add_closure_tree)
@@ -0,0 +1,34 @@
+from django.db import transaction
+from channels.importer import batch_size_for
+from channels.utils import join_path
+from closuretree.models import ClosureLink, ClosureNode
+
+
+def bulk_add_closure_tree(channel, trie, batch_size=1000):
+    """
+    Add all categories of a CategoryTrie to an empty channel
+    of the closure table backend, with their links to their ancestors
+    returns: number of categories inserted
+    """
+    new_id = ClosureNode._meta.pk.create_uuid
+    nodes = []
+    links = []
+    # each stack entry is (trie, django node, (id, depth) of its ancestors and itself)
+    stack = [(trie, channel, [(channel.pk, 0)])]
+    while stack:
+        parent_trie, parent, ancestors = stack.pop()
+        for child in parent_trie.children.values():
+            node = ClosureNode(id=new_id(), name=child.name, parent_id=parent.pk,
+                               path=join_path(parent.path, child.name))
+            nodes.append(node)
+            links.extend(node.build_links(ancestors))
+            stack.append((child, node, [(node.pk, 0)] +
+                          [(pk, depth + 1) for pk, depth in ancestors]))
+    with transaction.atomic():
+        ClosureNode.objects.bulk_create(
+            nodes, batch_size=batch_size_for(ClosureNode._meta.concrete_fields,
+                                             nodes, batch_size))
+        ClosureLink.objects.bulk_create(
+            links, batch_size=batch_size_for(ClosureLink._meta.concrete_fields,
+                                             links, batch_size))
+    return len(nodes)
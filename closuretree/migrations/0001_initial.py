@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.7 on 2026-10-18 22:09
+from __future__ import unicode_literals
+
+import channels.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosureLink',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ClosureNode',
+            fields=[
+                ('id', django_extensions.db.fields.ShortUUIDField(blank=True, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('path', models.TextField(blank=True, null=True, unique=True)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='closuretree.ClosureNode')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='closurelink',
+            name='ancestor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='closuretree.ClosureNode'),
+        ),
+        migrations.AddField(
+            model_name='closurelink',
+            name='descendant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='closuretree.ClosureNode'),
+        ),
+        migrations.CreateModel(
+            name='ClosureCategory',
+            fields=[
+            ],
+            options={
+                'verbose_name_plural': 'Closure categories',
+                'proxy': True,
+                'indexes': [],
+            },
+            bases=(channels.models.CategoryMixin, 'closuretree.closurenode'),
+        ),
+        migrations.CreateModel(
+            name='ClosureChannel',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+            },
+            bases=(channels.models.ChannelMixin, 'closuretree.closurenode'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='closurenode',
+            unique_together=set([('name', 'parent')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='closurelink',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='closurelink',
+            index_together=set([('descendant', 'depth')]),
+        ),
+    ]
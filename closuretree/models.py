@@ -0,0 +1,157 @@
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django_extensions.db.fields import ShortUUIDField
+from channels.models import CategoryMixin, ChannelMixin
+from channels.utils import split_path
+
+
+class ClosureNode(models.Model):
+    """
+    Node of the closure table tree backend, an alternative to MPTT.
+    Nodes only know their parent, and ClosureLink has a row for every
+    ancestor of every node, so inserting a node writes one row per
+    ancestor instead of renumbering the rest of the tree. Nodes
+    cannot be moved or renamed, their links and the paths of their
+    subcategories would not follow.
+    """
+    id = ShortUUIDField(primary_key=True, editable=False)
+    name = models.CharField(max_length=255)
+    path = models.TextField(null=True, blank=True, unique=True)
+    parent = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        related_name='children',
+        db_index=True,
+        on_delete=models.CASCADE
+    )
+
+    class Meta:
+        unique_together = (('name', 'parent'),)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        node = super(ClosureNode, cls).from_db(db, field_names, values)
+        node._saved = (node.__dict__.get('parent_id'), node.__dict__.get('name'))
+        return node
+
+    def save(self, *args, **kwargs):
+        """
+        Validate, and link a new node to its ancestors
+        raises: ValidationError if a saved node was moved or renamed
+        """
+        self.full_clean()
+        created = self._state.adding
+        if not created and (self.parent_id, self.name) != getattr(self, '_saved', None):
+            raise ValidationError('The nodes of the closure table backend '
+                                  'cannot be moved or renamed.')
+        with transaction.atomic():
+            super(ClosureNode, self).save(*args, **kwargs)
+            if created:
+                ClosureLink.objects.bulk_create(self.build_links())
+        self._saved = (self.parent_id, self.name)
+
+    def build_links(self, ancestors=None):
+        """
+        Links of a new node to itself and to its ancestors
+        ancestors: optional (id, depth) of the ancestors of the parent,
+        itself included, read from the database if not given
+        """
+        if ancestors is None and self.parent_id is not None:
+            ancestors = (ClosureLink.objects.filter(descendant_id=self.parent_id)
+                         .values_list('ancestor_id', 'depth'))
+        links = [ClosureLink(ancestor_id=self.pk, descendant_id=self.pk, depth=0)]
+        for ancestor_id, depth in ancestors or ():
+            links.append(ClosureLink(ancestor_id=ancestor_id,
+                                     descendant_id=self.pk,
+                                     depth=depth + 1))
+        return links
+
+    @property
+    def subcategories(self):
+        """
+        Get all the subcategories of this node
+        returns: list of subcategories, each category followed by its
+        subcategories, sorted by name in Python, in code point order.
+        It is the order of the MPTT backend on databases comparing
+        names by code point, like SQLite, with another collation the
+        siblings may be in another order.
+        """
+        categories = (ClosureCategory.objects
+                      .filter(ancestor_links__ancestor_id=self.pk,
+                              ancestor_links__depth__gt=0))
+        return sorted(categories, key=lambda category: split_path(category.path))
+
+    @property
+    def subcategories_count(self):
+        """
+        Get the number of subcategories in this node
+        returns: count of subcategories that belongs to this node
+        """
+        return ClosureLink.objects.filter(ancestor_id=self.pk, depth__gt=0).count()
+
+    def get_ancestors(self):
+        """
+        Get the ancestors of this node
+        returns: queryset of the ancestors, the channel first
+        """
+        return (ClosureNode.objects
+                .filter(descendant_links__descendant_id=self.pk,
+                        descendant_links__depth__gt=0)
+                .order_by('-descendant_links__depth'))
+
+
+class ClosureLink(models.Model):
+    """An ancestor of a node of the closure table backend, depth levels above it"""
+    ancestor = models.ForeignKey(ClosureNode, related_name='descendant_links',
+                                 on_delete=models.CASCADE)
+    descendant = models.ForeignKey(ClosureNode, related_name='ancestor_links',
+                                   on_delete=models.CASCADE)
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = (('ancestor', 'descendant'),)
+        index_together = (('descendant', 'depth'),)
+
+
+class ClosureCategoryManager(models.Manager):
+    """A category of the closure table backend is a node with a parent"""
+    def get_queryset(self):
+        return super(ClosureCategoryManager, self).get_queryset().exclude(parent=None)
+
+
+class ClosureChannelManager(models.Manager):
+    """A channel of the closure table backend is a node without a parent"""
+    def get_queryset(self):
+        return super(ClosureChannelManager, self).get_queryset().filter(parent=None)
+
+
+class ClosureCategory(CategoryMixin, ClosureNode):
+    objects = ClosureCategoryManager()
+
+    class Meta:
+        proxy = True
+        verbose_name_plural = 'Closure categories'
+
+    @property
+    def channel(self):
+        """
+        Get the channel this category belongs to
+        returns: instance of channel
+        """
+        if not hasattr(self, '_channel'):
+            self._channel = ClosureChannel.objects.get(
+                descendant_links__descendant_id=self.pk
+            )
+        return self._channel
+
+
+class ClosureChannel(ChannelMixin, ClosureNode):
+    objects = ClosureChannelManager()
+    category_class = ClosureCategory
+
+    class Meta:
+        proxy = True
@@ -0,0 +1,68 @@
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from channels.importer import CategoryTrie
+from channels.models import Channel
+from channels.trees import TREE_BACKENDS
+from closuretree.models import ClosureLink, ClosureNode
+
+
+class ClosureTableTestCase(TestCase):
+    def setUp(self):
+        self.backend = TREE_BACKENDS['closure']
+        self.channel = self.backend.channel_class.objects.create(name='foo')
+
+    def test_links(self):
+        self.channel.add_category(['Books', 'Computers', 'Databases'])
+        # each node is linked to itself and to each of its ancestors
+        self.assertEqual(ClosureLink.objects.count(), 1 + 2 + 3 + 4)
+        self.assertEqual(
+            list(ClosureLink.objects.filter(descendant__name='Databases')
+                 .order_by('depth').values_list('ancestor__name', 'depth')),
+            [('Databases', 0), ('Computers', 1), ('Books', 2), ('foo', 3)]
+        )
+
+    def test_subcategories_in_mptt_order(self):
+        paths = [['B c'], ['B', 'x'], ['B/x'], ['A', 'z']]
+        for path in paths:
+            self.channel.add_category(path)
+        mptt = Channel.objects.create(name='foo')
+        for path in paths:
+            mptt.add_category(path)
+        mptt.refresh_from_db()
+        expected = [node.path for node in mptt.subcategories]
+        self.assertEqual(expected, ['/foo/A', '/foo/A/z', '/foo/B', '/foo/B/x',
+                                    '/foo/B c', '/foo/B\\/x'])
+        self.assertEqual([node.path for node in self.channel.subcategories], expected)
+
+    def test_insert_queries_do_not_depend_on_tree_size(self):
+        def queries(name):
+            with CaptureQueriesContext(connection) as captured:
+                self.channel.add_category(['Books', name])
+            return len(captured)
+
+        self.channel.add_category(['Books', 'First'])
+        before = queries('Second')
+        self.backend.bulk_add_tree(self.channel, CategoryTrie.from_paths(
+            [['Other {}'.format(i), 'Leaf'] for i in range(200)]
+        ))
+        self.assertEqual(queries('Third'), before)
+
+    def test_nodes_are_not_moved_or_renamed(self):
+        books = self.channel.add_category(['Books'])
+        games = self.channel.add_category(['Games'])
+        books.save()
+        for field, value in (('parent', games), ('name', 'Novels')):
+            with self.subTest(field=field):
+                node = ClosureNode.objects.get(pk=books.pk)
+                setattr(node, field, value)
+                with self.assertRaises(ValidationError):
+                    node.save()
+        self.assertEqual(ClosureLink.objects.filter(descendant=books).count(), 2)
+
+    def test_delete_removes_links(self):
+        self.channel.add_category(['Books', 'Computers'])
+        self.channel.delete()
+        self.assertFalse(ClosureNode.objects.exists())
+        self.assertFalse(ClosureLink.objects.exists())
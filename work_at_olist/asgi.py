@@ -0,0 +1,130 @@
+"""
+ASGI config for work_at_olist project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+run it with any ASGI server, e.g. ``uvicorn work_at_olist.asgi:application``.
+
+Django 1.11 only speaks WSGI, so the requests are handled by the WSGI
+application in a bounded pool of threads, settings.ASGI_THREADS, while
+the event loop keeps accepting connections. Each request runs in a
+single thread, its database connection included.
+"""
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "work_at_olist.settings.dev")
+
+
+class ASGIHandler(object):
+    """Serve a WSGI application to an ASGI server, one thread per request"""
+    def __init__(self, wsgi_application, max_threads):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers=max_threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            body = await self.read_body(receive)
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(self.executor, self.run,
+                                       self.environ(scope, body), loop, send)
+        else:
+            raise ValueError('Unsupported scope type: {}'.format(scope['type']))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    def environ(self, scope, body):
+        """WSGI environ of an ASGI http scope"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI strings are bytes decoded as latin-1
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'REMOTE_ADDR': client[0],
+            'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_' + name
+            if name in environ:
+                # repeated headers are joined as a list, except the cookies
+                separator = '; ' if name == 'HTTP_COOKIE' else ','
+                value = environ[name] + separator + value
+            environ[name] = value
+        return environ
+
+    def run(self, environ, loop, send):
+        """
+        Call the WSGI application and send its response, in a thread of the pool.
+        The body is sent chunk by chunk, waiting for the server to take each one.
+        """
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        chunks = self.wsgi_application(environ, start_response)
+        try:
+            send_message({
+                'type': 'http.response.start',
+                'status': response['status'],
+                'headers': response['headers'],
+            })
+            for chunk in chunks:
+                if chunk:
+                    send_message({'type': 'http.response.body',
+                                  'body': chunk, 'more_body': True})
+            send_message({'type': 'http.response.body', 'body': b''})
+        finally:
+            # sends request_finished, which closes the database connection
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+
+application = ASGIHandler(get_wsgi_application(), settings.ASGI_THREADS)
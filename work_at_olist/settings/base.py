@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_extensions',
     'mptt',
     'rest_framework',
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.InstrumentationMiddleware',
+    'api.db.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -119,5 +122,61 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # DjangoREST
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
-    'PAGE_SIZE': 200
+    'PAGE_SIZE': 200,
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
+
+# Serialize the lists of channels, categories and subcategories from
+# .values() rows instead of model instances, the output is the same
+API_FAST_SERIALIZATION = True
+
+# Maximum number of categories of a batch lookup
+API_BATCH_MAX_SIZE = 1000
+
+# Cache for channel and category detail responses, set the alias
+# to None to disable it. The responses are keyed by the versions of
+# the trees stored in the database, so changes made by any process
+# are seen. The local memory cache is per process, each web worker
+# fills its own, use a shared backend to share them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = 300
+
+# Answer conditional requests with the ETag and Last-Modified of the
+# channels, derived from the versions of the trees in the database.
+API_CONDITIONAL_REQUESTS = True
+
+# Serve the channel and category detail from in process snapshots of
+# the trees instead of the database. The snapshots are reloaded when
+# the versions of their trees in the database change.
+API_SNAPSHOT = False
+
+# Measure the time, queries and response size of every request,
+# sent in the Server-Timing header and served by /api/v1/stats/requests/
+API_INSTRUMENTATION = False
+
+# Threads handling the requests of each process served with the ASGI
+# application, work_at_olist.asgi, also the most database connections it opens.
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
+# Aliases in DATABASES of the read replicas of the default database,
+# the read only API endpoints read from them. A client that wrote is
+# pinned to the default database for DATABASE_REPLICA_PIN_SECONDS.
+DATABASE_ROUTERS = ['api.db.ReplicaRouter']
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_PIN_SECONDS = 10
+
+# Threads of each process running the import jobs uploaded to
+# /api/v1/imports/, the most channels imported at the same time, 0 runs
+# the jobs in the request. The uploaded files are kept in
+# IMPORT_UPLOAD_DIR, the temporary directory if None, until imported.
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 2))
+IMPORT_UPLOAD_DIR = None
+IMPORT_PROGRESS_ROWS = 10000
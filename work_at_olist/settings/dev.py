@@ -3,6 +3,9 @@ from .base import *
 
 DEBUG = True
 
+# the closure table tree backend compared by the benchmark
+INSTALLED_APPS += ['closuretree']
+
 ALLOWED_HOSTS += '*'
 
 SECRET_KEY = 'jwztgcq*!q55q^l8hfd5%rc0bz+!llp+c#u!z2hry_-m+mt5sv'
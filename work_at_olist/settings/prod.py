@@ -12,5 +12,22 @@ DATABASES = {
         'USER': environ['DB_USER'],
         'PORT': environ['DB_PORT'],
         'PASSWORD': environ['DB_PASSWORD'],
+        # keep the connections open between requests, they are
+        # checked when a request first uses them by api.db
+        'CONN_MAX_AGE': int(environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
+
+# read replicas, comma separated hosts with the same credentials
+for number, host in enumerate(filter(None, environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = 'replica_{}'.format(number)
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host.strip(),
+                            TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+# responses cache shared by the web workers, comma separated memcached servers
+if environ.get('MEMCACHED_LOCATION'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': environ['MEMCACHED_LOCATION'].split(','),
+    }